@@ -1,5 +1,10 @@
 from typing import Dict, Optional
 
+import numpy as np
+
+from boss_dps_prediction.dps_grid import DpsGrid, solve_dps_grid
+from boss_dps_prediction.kill_time_prediction import KillTimePrediction, PlayerLogStats, predict_kill_times
+
 
 class Boss:
     def __init__(self, name: str, hp: int):
@@ -18,6 +23,15 @@ class DpsCalculator:
         self.bosses: list[Boss] = [Boss(name, hp) for name, hp in bosses.items()]
         self.players: list[Player] = [Player(name, dps) for name, dps in players.items()]
 
+    def solve_grid(self, parties: Dict[str, list[str]] | None = None, times: np.ndarray = np.arange(1, 901), max_player_dps: float = np.inf) -> DpsGrid:
+        # Every boss x time x party at once, returned instead of printed
+        return solve_dps_grid({boss.name: boss.hp for boss in self.bosses}, {player.name: player.dps for player in self.players}, parties, times, max_player_dps)
+
+    def predict_from_logs(self, player_stats: Dict[str, PlayerLogStats], time_limit_s: float, pulls: int = 20_000) -> list[KillTimePrediction]:
+        # Unknown DPS comes from the players' fight logs, typed in DPS is used as it is
+        fixed_dps = {player.name: player.dps for player in self.players if player.dps is not None}
+        return predict_kill_times({boss.name: boss.hp for boss in self.bosses}, [player.name for player in self.players], player_stats, time_limit_s, fixed_dps, pulls)
+
     def calculate_for_all_bosses(self, desired_completion_time: int):
         for boss in self.bosses:
             print(f"Boss: {boss.name}")
@@ -53,16 +67,17 @@ class DpsCalculator:
             print(f"{players.name}: {share_per_player:.1f} DPS required")
 
 
-if __name__ == '__main__':
-    boss_name_hp_map = {
-        "Garub": 140_000,
-        "Inachaus": 170_000,
-        "Black'ist": 210_000,
-        "Trenun": 260_000,
-        "Sedulus Rane": 415_000,
-        "Serezith Brakrud": 515_000,
-    }
+boss_name_hp_map = {
+    "Garub": 140_000,
+    "Inachaus": 170_000,
+    "Black'ist": 210_000,
+    "Trenun": 260_000,
+    "Sedulus Rane": 415_000,
+    "Serezith Brakrud": 515_000,
+}
 
+
+if __name__ == '__main__':
     # None means dps will be calculated and split evenly after the known dps is computed.
     player_dps_dict = {
         "Player1": 0,
@@ -0,0 +1,154 @@
+import math
+import random
+import time
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import Dict, Optional
+
+import numpy as np
+
+# A player's DPS: None when unknown, a number when known, (mean, standard deviation) when it varies fight to fight
+PlayerDps = Optional[float | tuple[float, float]]
+
+
+def _normal_cdf(x: np.ndarray) -> np.ndarray:
+    # numpy has no vectorized erf, Abramowitz & Stegun 7.1.26 is within 1.5e-7 of it
+    z = np.abs(x) / math.sqrt(2)
+    t = 1 / (1 + 0.3275911 * z)
+    erf = 1 - t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429)))) * np.exp(-z * z)
+    return 0.5 * (1 + np.sign(x) * erf)
+
+
+@dataclass
+class DpsGrid:
+    """
+        Every boss x completion time x party at once. Arrays are indexed [party, boss, time] (required_total_dps has
+        no party axis), the names/times lists give the labels.
+
+    """
+    boss_names: list[str]
+    boss_hp: np.ndarray  # (bosses,)
+    times: np.ndarray  # (times,) seconds
+    party_names: list[str]
+    fixed_dps: np.ndarray  # (parties,) sum of the known and mean DPS
+    dps_std: np.ndarray  # (parties,) spread of the party DPS from the players with a distribution
+    unknown_count: np.ndarray  # (parties,) players with unknown DPS
+    required_total_dps: np.ndarray  # (bosses, times)
+    remaining_dps: np.ndarray  # (parties, bosses, times) what the unknown players have to bring, <= 0 when the known players are enough
+    required_dps_per_unknown: np.ndarray  # (parties, bosses, times) remaining split evenly, nan for parties without unknown players
+    feasible: np.ndarray  # (parties, bosses, times) bool
+
+    def fastest_times(self, unknown_player_dps: float = 0.0, confidence: float = 0.5) -> np.ndarray:
+        """
+            (parties, bosses) fastest completion time in seconds, assuming every unknown player brings
+            unknown_player_dps. With confidence above 0.5 the party DPS is taken from the low side of its distribution,
+            so the time is reached in that share of the fights. inf when the party can't damage the boss.
+
+        """
+        party_dps = self.fixed_dps + self.unknown_count * unknown_player_dps - NormalDist().inv_cdf(confidence) * self.dps_std
+        with np.errstate(divide="ignore"):
+            fastest = self.boss_hp[np.newaxis, :] / party_dps[:, np.newaxis]
+        return np.where(party_dps[:, np.newaxis] > 0, fastest, np.inf)
+
+    def completion_probability(self, unknown_player_dps: float = 0.0) -> np.ndarray:
+        # (parties, bosses, times) chance the party DPS is at least the required DPS, from the players' distributions
+        party_dps = (self.fixed_dps + self.unknown_count * unknown_player_dps)[:, np.newaxis, np.newaxis]
+        shortfall = self.required_total_dps[np.newaxis] - party_dps
+        std = self.dps_std[:, np.newaxis, np.newaxis]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            probability = 1 - _normal_cdf(shortfall / std)
+        # Parties without any spread either make it or not
+        return np.where(std > 0, probability, (shortfall <= 0).astype(float))
+
+    def first_feasible_time(self) -> np.ndarray:
+        # (parties, bosses) shortest time on the grid that is still feasible, nan when none is
+        any_feasible = self.feasible.any(axis=2)
+        first = self.times[np.argmax(self.feasible, axis=2)].astype(float)
+        return np.where(any_feasible, first, np.nan)
+
+
+def solve_dps_grid(bosses: Dict[str, int], players: Dict[str, PlayerDps], parties: Dict[str, list[str]] | None = None,
+                   times: np.ndarray = np.arange(1, 901), max_player_dps: float = np.inf) -> DpsGrid:
+    """
+        DpsCalculator.calculate_single_boss for every boss, completion time and party in one go. Without parties the
+        whole roster is one party. A time is feasible when the known players already cover it, or when the DPS every
+        unknown player has to bring stays within max_player_dps.
+
+    """
+    parties = {"Everyone": list(players)} if parties is None else parties
+    player_names = list(players)
+    player_index = {name: i for i, name in enumerate(player_names)}
+
+    # Per player columns: mean, variance, unknown flag
+    means = np.zeros(len(player_names))
+    variances = np.zeros(len(player_names))
+    unknown = np.zeros(len(player_names), dtype=bool)
+    for i, dps in enumerate(players.values()):
+        if dps is None:
+            unknown[i] = True
+        elif isinstance(dps, tuple):
+            means[i], variances[i] = dps[0], dps[1] ** 2
+        else:
+            means[i] = dps
+
+    # Party membership matrix (parties, players), a party's sums are one matrix product
+    membership = np.zeros((len(parties), len(player_names)))
+    for row, members in enumerate(parties.values()):
+        membership[row, [player_index[name] for name in members]] = 1
+
+    fixed_dps = membership @ means
+    dps_std = np.sqrt(membership @ variances)
+    unknown_count = membership @ unknown
+
+    boss_hp = np.array(list(bosses.values()), dtype=float)
+    times = np.asarray(times, dtype=float)
+    required_total_dps = boss_hp[:, np.newaxis] / times[np.newaxis, :]
+    remaining_dps = required_total_dps[np.newaxis] - fixed_dps[:, np.newaxis, np.newaxis]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        required_dps_per_unknown = np.where(unknown_count[:, np.newaxis, np.newaxis] > 0, remaining_dps / unknown_count[:, np.newaxis, np.newaxis], np.nan)
+    feasible = (remaining_dps <= 0) | (required_dps_per_unknown <= max_player_dps)
+
+    return DpsGrid(list(bosses), boss_hp, times, list(parties), fixed_dps, dps_std, unknown_count, required_total_dps, remaining_dps,
+                   required_dps_per_unknown, feasible)
+
+
+def benchmark_dps_grid(bosses: Dict[str, int], player_count: int = 50, party_count: int = 1000, party_size: int = 5, repeats: int = 5):
+    """
+        A 50 player roster with known, unknown and varying DPS, party_count random parties, every boss and a 1-900s
+        grid. Checks one cell against DpsCalculator's formula.
+
+    """
+    rng = random.Random(0)
+    players: Dict[str, PlayerDps] = {}
+    for i in range(player_count):
+        kind = i % 3
+        players[f"Player{i + 1}"] = None if kind == 0 else float(rng.randint(100, 600)) if kind == 1 else (float(rng.randint(100, 600)), float(rng.randint(10, 120)))
+    parties = {f"Party{i + 1}": rng.sample(list(players), party_size) for i in range(party_count)}
+
+    best_s = {"solve": math.inf, "fastest times": math.inf, "completion probability": math.inf}
+    for _ in range(repeats):
+        start = time.perf_counter()
+        grid = solve_dps_grid(bosses, players, parties, max_player_dps=800)
+        best_s["solve"] = min(best_s["solve"], time.perf_counter() - start)
+        start = time.perf_counter()
+        grid.fastest_times(unknown_player_dps=300, confidence=0.9)
+        best_s["fastest times"] = min(best_s["fastest times"], time.perf_counter() - start)
+        start = time.perf_counter()
+        grid.completion_probability(unknown_player_dps=300)
+        best_s["completion probability"] = min(best_s["completion probability"], time.perf_counter() - start)
+
+    # Same numbers as calculate_single_boss for party 0, the last boss at 300s
+    members = parties["Party1"]
+    expected_remaining = list(bosses.values())[-1] / 300 - sum(players[name] if not isinstance(players[name], tuple) else players[name][0]
+                                                               for name in members if players[name] is not None)
+    assert math.isclose(grid.remaining_dps[0, -1, 299], expected_remaining), "grid differs from calculate_single_boss"
+
+    print(f"{player_count} players, {party_count} parties x {len(bosses)} bosses x {len(grid.times)} times = {grid.remaining_dps.size:,} cells")
+    for name, seconds in best_s.items():
+        print(f"{name:<23} {seconds * 1000:8.1f}ms")
+
+
+if __name__ == '__main__':
+    from boss_dps_prediction.boss_dps_prediction import boss_name_hp_map
+
+    benchmark_dps_grid(boss_name_hp_map)
@@ -0,0 +1,204 @@
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable
+
+import numpy as np
+
+from boss_dps_prediction.kill_time_prediction import PlayerLogStats, sample_kill_times, sample_party_dps
+
+
+@dataclass(frozen=True)
+class DungeonAction:
+    """
+        One row of dungeon_time_calculator.html. Trash packs and bosses have HP and take as long as the party needs to
+        kill it, travel and waits have a fixed duration (with an optional spread). Both can be combined.
+
+    """
+    name: str
+    hp: float = 0.0
+    duration_s: float = 0.0
+    duration_std_s: float = 0.0
+    after: tuple[str, ...] | None = None  # actions that have to be finished first, None for the action listed before it
+
+
+@dataclass
+class DungeonRunResult:
+    action_names: list[str]
+    finish_s: np.ndarray  # (runs, actions) time every action was finished
+    completion_s: np.ndarray  # (runs,)
+    on_critical_path: np.ndarray  # (runs, actions) bool
+
+    def percentile(self, percent: float) -> float:
+        return float(np.percentile(self.completion_s, percent))
+
+    def success_probability(self, time_limit_s: float) -> float:
+        return float(np.mean(self.completion_s <= time_limit_s))
+
+    def criticality(self) -> dict[str, float]:
+        # Share of the runs every action was on the critical path in
+        return dict(zip(self.action_names, self.on_critical_path.mean(axis=0).tolist()))
+
+    def critical_path(self) -> tuple[list[str], float]:
+        # Most common critical path and the share of the runs it was the critical path in
+        paths, counts = np.unique(np.packbits(self.on_critical_path, axis=1), axis=0, return_counts=True)
+        path = np.unpackbits(paths[np.argmax(counts)])[:len(self.action_names)].astype(bool)
+        return [name for name, on_path in zip(self.action_names, path) if on_path], float(counts.max() / len(self.completion_s))
+
+
+class DungeonTimeline:
+    """
+        A dungeon run as actions with dependencies. An action starts once everything in its after list is finished, so
+        a sequence of pulls is a chain and things that run next to each other (a door timer, a respawn) are branches.
+        Every run of the Monte Carlo is a column over all runs at once: the party DPS of the run, the kill time of
+        every action and the finish times are (runs,) arrays.
+
+        Results are cached per party configuration (LRU, like the dashboard's ReportCache), asking for the same party
+        again doesn't rerun anything.
+
+    """
+    def __init__(self, actions: Iterable[DungeonAction], max_cached_results: int = 16):
+        self.actions: list[DungeonAction] = list(actions)
+        self.action_names: list[str] = [action.name for action in self.actions]
+        if len(set(self.action_names)) != len(self.action_names):
+            raise ValueError("Dungeon action names have to be unique")
+
+        # Actions only depend on actions listed before them, so the list order is a topological order
+        index = {}
+        self.predecessors: list[list[int]] = []
+        for action_index, action in enumerate(self.actions):
+            after = action.after if action.after is not None else self.action_names[action_index - 1:action_index]
+            unknown = [name for name in after if name not in index]
+            if unknown:
+                raise ValueError(f"{action.name} comes after {', '.join(unknown)}, which isn't listed before it")
+            self.predecessors.append([index[name] for name in after])
+            index[action.name] = action_index
+
+        self.max_cached_results: int = max_cached_results
+        self._results: OrderedDict[tuple, DungeonRunResult] = OrderedDict()
+
+    def simulate(self, party_mean: np.ndarray, party_variance: np.ndarray, rng: np.random.Generator) -> DungeonRunResult:
+        # One run per entry of party_mean/party_variance (party DPS and its variance per second, see sample_party_dps)
+        runs, action_count = len(party_mean), len(self.actions)
+        rows = np.arange(runs)
+        finish_s = np.empty((runs, action_count))
+        critical_predecessor = np.full((runs, action_count), -1, dtype=np.int32)
+        for action_index, (action, predecessors) in enumerate(zip(self.actions, self.predecessors)):
+            duration_s = np.full(runs, action.duration_s)
+            if action.duration_std_s:
+                duration_s = np.maximum(duration_s + rng.normal(0, action.duration_std_s, runs), 0)
+            if action.hp:
+                duration_s += sample_kill_times(action.hp, party_mean, party_variance, rng)
+
+            start_s = np.zeros(runs)
+            if predecessors:
+                # The predecessor finishing last is the one this action waited for
+                latest = np.argmax(finish_s[:, predecessors], axis=1)
+                critical_predecessor[:, action_index] = np.asarray(predecessors)[latest]
+                start_s = finish_s[rows, critical_predecessor[:, action_index]]
+            finish_s[:, action_index] = start_s + duration_s
+
+        # Walks back from the action that finished last through the predecessors every action waited for
+        on_critical_path = np.zeros((runs, action_count), dtype=bool)
+        node = np.argmax(finish_s, axis=1)
+        walking = np.ones(runs, dtype=bool)
+        while walking.any():
+            on_critical_path[rows[walking], node[walking]] = True
+            node = np.where(walking, critical_predecessor[rows, np.maximum(node, 0)], -1)
+            walking = node >= 0
+
+        return DungeonRunResult(self.action_names, finish_s, finish_s.max(axis=1), on_critical_path)
+
+    def _cached(self, key: tuple, simulate) -> DungeonRunResult:
+        if key in self._results:
+            self._results.move_to_end(key)
+            return self._results[key]
+        result = self._results[key] = simulate()
+        if len(self._results) > self.max_cached_results:
+            self._results.popitem(last=False)
+        return result
+
+    def run_party(self, party: Iterable[str], player_stats: Dict[str, PlayerLogStats], fixed_dps: Dict[str, float] | None = None,
+                  runs: int = 100_000, seed: int = 0) -> DungeonRunResult:
+        # Party DPS from the players' fight logs, see kill_time_prediction
+        party = sorted(party)
+        stats_key = tuple((name, player_stats[name].fight_dps.tobytes(), player_stats[name].second_variance.tobytes()) for name in party if name in player_stats)
+        key = ("logs", tuple(party), tuple(sorted((fixed_dps or {}).items())), stats_key, runs, seed)
+
+        def simulate() -> DungeonRunResult:
+            rng = np.random.default_rng(seed)
+            return self.simulate(*sample_party_dps(party, player_stats, runs, rng, fixed_dps), rng)
+        return self._cached(key, simulate)
+
+    def run_dps(self, mean_dps: float, std_dps: float = 0.0, runs: int = 100_000, seed: int = 0) -> DungeonRunResult:
+        # Hand typed party DPS, normally distributed run to run with no spread inside a fight
+        def simulate() -> DungeonRunResult:
+            rng = np.random.default_rng(seed)
+            party_mean = np.maximum(rng.normal(mean_dps, std_dps, runs), 0) if std_dps else np.full(runs, float(mean_dps))
+            return self.simulate(party_mean, np.zeros(runs), rng)
+        return self._cached(("dps", mean_dps, std_dps, runs, seed), simulate)
+
+
+def dungeon_from_bosses(bosses: Dict[str, int], trash_pack_hp: float, trash_packs_per_boss: int, travel_s: float, travel_std_s: float = 0.0) -> list[DungeonAction]:
+    # Every boss in order, each after its trash packs and the travel to it
+    actions = []
+    for boss_name, boss_hp in bosses.items():
+        actions += [DungeonAction(f"{boss_name} trash {pack + 1}", hp=trash_pack_hp) for pack in range(trash_packs_per_boss)]
+        actions.append(DungeonAction(f"Travel to {boss_name}", duration_s=travel_s, duration_std_s=travel_std_s))
+        actions.append(DungeonAction(boss_name, hp=boss_hp))
+    return actions
+
+
+def print_dungeon_run(result: DungeonRunResult, time_limit_s: float | None = None):
+    print(f"Completion time: median {result.percentile(50):.0f}s, 10-90% {result.percentile(10):.0f}-{result.percentile(90):.0f}s "
+          f"({result.percentile(50) / 60:.2f} min)")
+    if time_limit_s is not None:
+        print(f"Chance to finish within {time_limit_s:g}s: {result.success_probability(time_limit_s) * 100:.1f}%")
+    path, share = result.critical_path()
+    print(f"Critical path in {share * 100:.0f}% of the runs: {' -> '.join(path)}")
+
+
+def benchmark_dungeon_timeline(bosses: Dict[str, int], runs: int = 100_000, party_dps: float = 2000, party_dps_std: float = 250):
+    """
+        runs runs of every boss with two trash packs and travel before each, plus a door that opens on a timer before
+        the third boss, so the critical path changes from run to run. Checks a run without any spread against the
+        hand sum dungeon_time_calculator.html would do.
+
+    """
+    actions = dungeon_from_bosses(bosses, trash_pack_hp=30_000, trash_packs_per_boss=2, travel_s=25, travel_std_s=5)
+    third_boss = list(bosses)[2]
+    door = DungeonAction("Door timer", duration_s=300, after=())
+    boss_index = next(i for i, action in enumerate(actions) if action.name == third_boss)
+    actions = actions[:boss_index] + [door, DungeonAction(third_boss, hp=bosses[third_boss], after=(actions[boss_index - 1].name, door.name))] + actions[boss_index + 1:]
+    timeline = DungeonTimeline(actions)
+
+    start = time.perf_counter()
+    result = timeline.run_dps(party_dps, party_dps_std, runs)
+    simulate_s = time.perf_counter() - start
+    start = time.perf_counter()
+    timeline.run_dps(party_dps, party_dps_std, runs)
+    cached_s = time.perf_counter() - start
+
+    exact = DungeonTimeline(dungeon_from_bosses(bosses, 30_000, 2, 25)).run_dps(party_dps, runs=1)
+    hand_sum = sum(hp / party_dps + 2 * 30_000 / party_dps + 25 for hp in bosses.values())
+    assert math.isclose(exact.completion_s[0], hand_sum), "timeline differs from the summed action times"
+
+    print(f"{runs:,} runs x {len(actions)} actions in {simulate_s:.3f}s, cached {cached_s * 1e6:.0f}us")
+    print_dungeon_run(result, time_limit_s=1800)
+    print(f"Door timer on the critical path in {result.criticality()[door.name] * 100:.1f}% of the runs")
+
+
+if __name__ == '__main__':
+    from boss_dps_prediction.boss_dps_prediction import boss_name_hp_map
+
+    pack_hp = float(input("Enter the HP of a trash pack or press ENTER for 30000: ") or 30_000)
+    packs_per_boss = int(input("Enter the number of trash packs before every boss or press ENTER for 2: ") or 2)
+    travel_time = float(input("Enter the travel time to every boss in seconds or press ENTER for 25: ") or 25)
+    mean_party_dps = float(input("Enter the party DPS: "))
+    party_dps_spread = float(input("Enter the run to run spread (standard deviation) of the party DPS or press ENTER for none: ") or 0)
+    desired_time = float(input("Enter desired completion time in seconds: "))
+    print()
+
+    dungeon = DungeonTimeline(dungeon_from_bosses(boss_name_hp_map, pack_hp, packs_per_boss, travel_time))
+    print_dungeon_run(dungeon.run_dps(mean_party_dps, party_dps_spread), desired_time)
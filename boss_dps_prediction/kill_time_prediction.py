@@ -0,0 +1,276 @@
+import json
+import math
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable
+
+import numpy as np
+
+from combat_report.fight_log_columns import find_fight_logs, read_fight_log_columns
+
+# Kept in the logs directory's .report_cache next to the dashboard's reports, out of the way of find_fight_logs
+LOG_STATS_FILE = Path(".report_cache") / "player_log_stats.json"
+
+
+@dataclass
+class FightDps:
+    """One player's damage on the bosses in one fight log."""
+    damage: float
+    duration_s: float
+    active_s: float  # seconds the player did damage in
+    active_second_std: float  # spread of the damage done in those seconds
+
+    @property
+    def dps(self) -> float:
+        return self.damage / self.duration_s
+
+    @property
+    def active_dps(self) -> float:
+        return self.damage / self.active_s if self.active_s else 0.0
+
+    @property
+    def uptime(self) -> float:
+        return min(self.active_s / self.duration_s, 1.0)
+
+
+@dataclass
+class PlayerLogStats:
+    """
+        Every fight of a player as columns, one entry per fight log. The fight to fight spread of the DPS comes from the
+        columns, the spread inside a fight from active_second_std and uptime.
+
+    """
+    name: str
+    active_dps: np.ndarray
+    uptime: np.ndarray
+    active_second_std: np.ndarray
+
+    @property
+    def fight_dps(self) -> np.ndarray:
+        return self.active_dps * self.uptime
+
+    @property
+    def second_variance(self) -> np.ndarray:
+        # Damage in one second of the fight is a mixture of the idle seconds (0 damage) and the active ones
+        return self.uptime * (self.active_second_std ** 2 + self.active_dps ** 2) - self.fight_dps ** 2
+
+
+def fight_dps_from_log(fight_log_json: Path, bosses: Iterable[str]) -> Dict[str, FightDps]:
+    # Damage every non boss attacker did to the bosses, bucketed per second of the fight
+    columns = read_fight_log_columns(fight_log_json)
+    boss_names = set(bosses)
+    boss_codes = [code for code, name in enumerate(columns.names) if name in boss_names]
+    damage_code = columns.effect_types.index("Damage") if "Damage" in columns.effect_types else -1
+    on_boss = (columns.effect_type == damage_code) & np.isin(columns.defender, boss_codes) & ~np.isin(columns.attacker, boss_codes)
+
+    duration_s = max(float(columns.metadata.durationSec), 1.0)
+    seconds = np.clip(columns.time_s[on_boss], 0, None).astype(np.int64)
+    attackers = columns.attacker[on_boss].astype(np.int64)
+    values = columns.value[on_boss].astype(np.float64)
+
+    fights = {}
+    for code in np.unique(attackers):
+        per_second = np.bincount(seconds[attackers == code], weights=values[attackers == code])
+        active = per_second[per_second > 0]
+        fights[columns.names[code]] = FightDps(float(active.sum()), duration_s, float(len(active)), float(active.std()) if len(active) else 0.0)
+    return fights
+
+
+class PlayerLogStatsCache:
+    """
+        Per player, per fight DPS pulled out of every fight log in logs_dir. The extracted numbers are kept in a json
+        file in the logs directory's .report_cache, keyed on each log's name, size and mtime like the dashboard's
+        ReportCache, so refresh() only reads logs that are new or changed since the last call.
+
+    """
+    def __init__(self, logs_dir: Path, bosses: Iterable[str], stats_file: Path | None = None):
+        self.logs_dir: Path = Path(logs_dir)
+        self.bosses: list[str] = list(bosses)
+        self.stats_file: Path = Path(stats_file) if stats_file is not None else self.logs_dir / LOG_STATS_FILE
+        self._logs: dict[str, dict] = {}  # log name -> {"fingerprint": [...], "players": {name: FightDps fields}}
+        if self.stats_file.is_file():
+            cached = json.loads(self.stats_file.read_text())
+            # Stats extracted for a different boss list aren't comparable
+            if cached.get("bosses") == sorted(self.bosses):
+                self._logs = cached["logs"]
+
+    @staticmethod
+    def _fingerprint(fight_log_json: Path) -> list:
+        stat = fight_log_json.stat()
+        return [fight_log_json.name, stat.st_size, stat.st_mtime_ns]
+
+    def refresh(self) -> list[Path]:
+        # Returns the logs that had to be read
+        fight_logs = sorted(find_fight_logs(self.logs_dir)) if self.logs_dir.is_dir() else []
+        read_logs = []
+        for fight_log in fight_logs:
+            fingerprint = self._fingerprint(fight_log)
+            cached = self._logs.get(fight_log.name)
+            if cached is not None and cached["fingerprint"] == fingerprint:
+                continue
+            fights = fight_dps_from_log(fight_log, self.bosses)
+            self._logs[fight_log.name] = {"fingerprint": fingerprint, "players": {name: vars(fight) for name, fight in fights.items()}}
+            read_logs.append(fight_log)
+
+        # Logs that were deleted drop out of the stats
+        present = {fight_log.name for fight_log in fight_logs}
+        removed = [name for name in self._logs if name not in present]
+        for name in removed:
+            del self._logs[name]
+
+        if read_logs or removed:
+            self.stats_file.parent.mkdir(parents=True, exist_ok=True)
+            self.stats_file.write_text(json.dumps({"bosses": sorted(self.bosses), "logs": self._logs}))
+        return read_logs
+
+    def player_stats(self) -> Dict[str, PlayerLogStats]:
+        fights: dict[str, list[FightDps]] = {}
+        for log in self._logs.values():
+            for name, fight in log["players"].items():
+                fights.setdefault(name, []).append(FightDps(**fight))
+        return {name: PlayerLogStats(name, np.array([fight.active_dps for fight in player_fights]), np.array([fight.uptime for fight in player_fights]),
+                                     np.array([fight.active_second_std for fight in player_fights]))
+                for name, player_fights in fights.items()}
+
+
+@dataclass
+class KillTimePrediction:
+    boss_name: str
+    boss_hp: float
+    time_limit_s: float
+    kill_times: np.ndarray  # (pulls,) seconds, inf when the party never kills the boss
+
+    @property
+    def success_probability(self) -> float:
+        return float(np.mean(self.kill_times <= self.time_limit_s))
+
+    def percentile(self, percent: float) -> float:
+        return float(np.percentile(self.kill_times, percent))
+
+
+def sample_party_dps(party: Iterable[str], player_stats: Dict[str, PlayerLogStats], pulls: int, rng: np.random.Generator,
+                     fixed_dps: Dict[str, float] | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+        (pulls,) party DPS and (pulls,) variance of the party's damage per second. Every pull draws one of each
+        player's logged fights, so the fight to fight spread is in the pulls and the uptime and second to second
+        spread in the variance. Players can be given a fixed DPS in fixed_dps, the hand typed numbers player_dps_dict
+        used to hold, it takes precedence over their logs.
+
+    """
+    fixed_dps = fixed_dps or {}
+    party = list(party)
+    missing = [name for name in party if name not in player_stats and name not in fixed_dps]
+    if missing:
+        raise ValueError(f"No fight logs or fixed DPS for {', '.join(missing)}")
+
+    party_mean = np.full(pulls, float(sum(fixed_dps.get(name, 0) for name in party)))
+    party_variance = np.zeros(pulls)
+    for name in party:
+        stats = player_stats.get(name)
+        if stats is None or name in fixed_dps:
+            continue
+        fight = rng.integers(0, len(stats.active_dps), pulls)
+        party_mean += stats.fight_dps[fight]
+        party_variance += stats.second_variance[fight]
+    return party_mean, party_variance
+
+
+def sample_kill_times(hp: float, party_mean: np.ndarray, party_variance: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+        Inside a pull the party's damage is a random walk with the pull's mean and variance per second, the time it
+        reaches hp is inverse Gaussian and numpy samples it directly as Generator.wald. inf when the pull does no damage.
+
+    """
+    kill_times = np.full(len(party_mean), np.inf)
+    damaging = party_mean > 0
+    noisy = damaging & (party_variance > 0)
+    kill_times[damaging] = hp / party_mean[damaging]
+    kill_times[noisy] = rng.wald(hp / party_mean[noisy], hp ** 2 / party_variance[noisy])
+    return kill_times
+
+
+def predict_kill_times(bosses: Dict[str, int], party: Iterable[str], player_stats: Dict[str, PlayerLogStats], time_limit_s: float,
+                       fixed_dps: Dict[str, float] | None = None, pulls: int = 20_000, seed: int | None = None) -> list[KillTimePrediction]:
+    # Monte Carlo kill time for every boss, pulls sampled pulls at once
+    rng = np.random.default_rng(seed)
+    party_mean, party_variance = sample_party_dps(party, player_stats, pulls, rng, fixed_dps)
+    return [KillTimePrediction(boss_name, float(boss_hp), float(time_limit_s), sample_kill_times(boss_hp, party_mean, party_variance, rng))
+            for boss_name, boss_hp in bosses.items()]
+
+
+def print_kill_time_predictions(predictions: list[KillTimePrediction]):
+    for prediction in predictions:
+        print(f"Boss: {prediction.boss_name}")
+        print(f"Kill time: median {prediction.percentile(50):.0f}s, 10-90% {prediction.percentile(10):.0f}-{prediction.percentile(90):.0f}s")
+        print(f"Chance to kill within {prediction.time_limit_s:g}s: {prediction.success_probability * 100:.1f}%")
+        print()
+
+
+def benchmark_kill_time_prediction(bosses: Dict[str, int], log_count: int = 20, events_per_log: int = 20_000, pulls: int = 20_000):
+    """
+        log_count generated fight logs: cold stats extraction, a refresh after one more log lands, a refresh with
+        nothing new, and the Monte Carlo over every boss. Checks the Monte Carlo mean against boss HP / party DPS.
+
+    """
+    from combat_report.fight_log_generator import SyntheticFightSpec, write_synthetic_fight_log
+
+    spec_bosses = ("Serezith Brakrud", "Sedulus Rane")
+    with tempfile.TemporaryDirectory() as logs_dir:
+        for i in range(log_count + 1):
+            spec = SyntheticFightSpec.for_event_count(events_per_log, bosses=spec_bosses, seed=i)
+            write_synthetic_fight_log(Path(logs_dir) / f"fight-log-{i}.json", spec)
+        latest_log = Path(logs_dir) / f"fight-log-{log_count}.json"
+        latest_log.rename(latest_log.with_suffix(".pending"))
+
+        start = time.perf_counter()
+        cache = PlayerLogStatsCache(Path(logs_dir), bosses)
+        cache.refresh()
+        cold_s = time.perf_counter() - start
+
+        latest_log.with_suffix(".pending").rename(latest_log)
+        start = time.perf_counter()
+        cache = PlayerLogStatsCache(Path(logs_dir), bosses)
+        read_logs = cache.refresh()
+        new_log_s = time.perf_counter() - start
+        assert read_logs == [latest_log], "refresh re-read logs that were already cached"
+
+        start = time.perf_counter()
+        cache.refresh()
+        player_stats = cache.player_stats()
+        warm_s = time.perf_counter() - start
+
+    party = list(SyntheticFightSpec.players)
+    start = time.perf_counter()
+    predictions = predict_kill_times(bosses, party, player_stats, time_limit_s=600, pulls=pulls, seed=0)
+    monte_carlo_s = time.perf_counter() - start
+
+    # The median kill time is close to boss HP / average party DPS
+    expected = bosses[predictions[-1].boss_name] / sum(player_stats[name].fight_dps.mean() for name in party)
+    assert math.isclose(predictions[-1].percentile(50), expected, rel_tol=0.05), "Monte Carlo kill times are off"
+
+    print(f"{log_count + 1} logs x {events_per_log:,} events")
+    print(f"stats from every log {cold_s:.3f}s, after one new log {new_log_s:.3f}s, nothing new {warm_s * 1000:.1f}ms")
+    print(f"{len(bosses)} bosses x {pulls:,} pulls in {monte_carlo_s * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    from boss_dps_prediction.boss_dps_prediction import boss_name_hp_map
+
+    logs_directory: str | Path = input("Enter the directory holding the fight logs or press ENTER to use the combat_report directory: ")
+    if not logs_directory:
+        logs_directory: Path = Path(__file__).parent.parent / "combat_report"
+
+    log_stats = PlayerLogStatsCache(Path(logs_directory), boss_name_hp_map)
+    print(f"Read {len(log_stats.refresh())} new fight logs")
+    stats_by_player = log_stats.player_stats()
+    for player_name, player_log_stats in stats_by_player.items():
+        print(f"{player_name}: {player_log_stats.fight_dps.mean():.1f} DPS over {len(player_log_stats.fight_dps)} fights, "
+              f"uptime {player_log_stats.uptime.mean() * 100:.0f}%")
+
+    party_input = input("Enter the party (comma separated) or press ENTER for every player in the logs: ")
+    party_names = [name.strip() for name in party_input.split(",")] if party_input else list(stats_by_player)
+    desired_time = int(input("Enter desired completion time in seconds: "))
+    print()
+    print_kill_time_predictions(predict_kill_times(boss_name_hp_map, party_names, stats_by_player, desired_time))
@@ -0,0 +1,303 @@
+import heapq
+import itertools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict
+
+# Roles of party_randomizer.html plus the shaman
+ROLES = ["tank", "healer", "fighter", "mage", "warlock", "hunter", "shaman"]
+
+
+@dataclass(frozen=True)
+class RoleOutput:
+    dps: float
+    hps: float = 0.0
+    tps: float = 0.0  # threat per second
+
+
+@dataclass
+class RosterPlayer:
+    # Every role the player can bring, with their measured (fight logs) or simulated numbers on it
+    name: str
+    roles: Dict[str, RoleOutput]
+
+
+@dataclass
+class PartyRules:
+    size: int = 5
+    min_roles: Dict[str, int] = field(default_factory=lambda: {"tank": 1, "healer": 1})
+    max_roles: Dict[str, int] = field(default_factory=dict)  # roles missing here are only limited by size
+    min_hps: float = 0.0
+    tank_holds_threat: bool = True  # the best tank's TPS has to be at least every other member's
+
+    def max_of(self, role: str) -> int:
+        return self.max_roles.get(role, self.size)
+
+
+@dataclass
+class PartyAssignment:
+    members: tuple[tuple[str, str], ...]  # (player, role)
+    dps: float
+    hps: float
+    clear_time_s: float  # every boss back to back at the party's DPS
+
+
+class _PartySearch:
+    """
+        Branch and bound over (player, role) candidates sorted by DPS, highest first. A branch is dropped when the roles
+        it still needs can't be filled from the candidates left, when the best HPS of the players left can't reach
+        min_hps, or when its DPS plus the best DPS it could still add can't beat the k-th best party found so far.
+
+        The DPS bound doesn't know about min_hps, so a floor that takes several healers leaves the high DPS branches
+        to be searched down to the healers: about 2s for 60 players and min_hps=1500 against milliseconds without it.
+
+        Picklable, so the first member of the party can be split over worker processes.
+
+    """
+    def __init__(self, roster: list[RosterPlayer], rules: PartyRules):
+        self.rules = rules
+        self.player_names = [player.name for player in roster]
+        candidates = sorted(((player_index, ROLES.index(role), output) for player_index, player in enumerate(roster) for role, output in player.roles.items()),
+                            key=lambda candidate: candidate[2].dps, reverse=True)
+        self.player = [candidate[0] for candidate in candidates]
+        self.role = [candidate[1] for candidate in candidates]
+        self.dps = [candidate[2].dps for candidate in candidates]
+        self.hps = [candidate[2].hps for candidate in candidates]
+        self.tps = [candidate[2].tps for candidate in candidates]
+        self.min_roles = [rules.min_roles.get(role, 0) for role in ROLES]
+        self.max_roles = [rules.max_of(role) for role in ROLES]
+
+        # Suffix tables from candidate i on: candidates of every role, DPS of the best s candidates of every role and
+        # the healing candidates by HPS, highest first
+        count, size = len(candidates), rules.size
+        self.role_suffix = [[0] * len(ROLES) for _ in range(count + 1)]
+        self.role_dps_suffix = [[[0.0] for _ in ROLES] for _ in range(count + 1)]
+        self.hps_order: list[list[int]] = [[] for _ in range(count + 1)]
+        for i in range(count - 1, -1, -1):
+            self.role_suffix[i] = list(self.role_suffix[i + 1])
+            self.role_suffix[i][self.role[i]] += 1
+            # Sorted by DPS, so candidate i is the best of its role from i on
+            self.role_dps_suffix[i] = list(self.role_dps_suffix[i + 1])
+            previous = self.role_dps_suffix[i + 1][self.role[i]]
+            self.role_dps_suffix[i][self.role[i]] = [0.0] + [self.dps[i] + previous[s - 1] for s in range(1, min(len(previous), size) + 1)]
+            self.hps_order[i] = sorted(self.hps_order[i + 1] + [i], key=self.hps.__getitem__, reverse=True) if self.hps[i] > 0 else self.hps_order[i + 1]
+
+    def _dps_bound(self, i: int, slots: int, used: set[int], missing: list[int]) -> float:
+        # Best DPS the open slots could add: the best candidates of every missing role in the slots they have to
+        # take, the best distinct players left in the others
+        added = sum(self.role_dps_suffix[i][role][need] for role, need in enumerate(missing) if need)
+        slots -= sum(missing)
+        picked = set()
+        for j in range(i, len(self.dps)):
+            if slots == 0:
+                break
+            if self.player[j] in used or self.player[j] in picked:
+                continue
+            picked.add(self.player[j])
+            added += self.dps[j]
+            slots -= 1
+        return added
+
+    def _hps_bound(self, i: int, slots: int, used: set[int], role_counts: list[int]) -> float:
+        # Best HPS the open slots could add: the best healing candidates left of distinct players not in the party
+        # yet, in roles that aren't full
+        added = 0.0
+        picked = set()
+        for j in self.hps_order[i]:
+            if slots == 0:
+                break
+            if self.player[j] in used or self.player[j] in picked or role_counts[self.role[j]] >= self.max_roles[self.role[j]]:
+                continue
+            picked.add(self.player[j])
+            added += self.hps[j]
+            slots -= 1
+        return added
+
+    def _is_valid(self, chosen: list[int], hps: float) -> bool:
+        if hps < self.rules.min_hps:
+            return False
+        if self.rules.tank_holds_threat:
+            tank = ROLES.index("tank")
+            tank_tps = [self.tps[j] for j in chosen if self.role[j] == tank]
+            other_tps = [self.tps[j] for j in chosen if self.role[j] != tank]
+            if tank_tps and other_tps and max(tank_tps) < max(other_tps):
+                return False
+        return True
+
+    def _search(self, i: int, chosen: list[int], used: set[int], role_counts: list[int], dps: float, hps: float, best: list, k: int):
+        slots = self.rules.size - len(chosen)
+        if slots == 0:
+            if all(have >= minimum for have, minimum in zip(role_counts, self.min_roles)) and self._is_valid(chosen, hps):
+                entry = (dps, hps, tuple(chosen))
+                if len(best) < k:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+            return
+        if i == len(self.dps):
+            return
+
+        missing = [max(0, minimum - have) for minimum, have in zip(self.min_roles, role_counts)]
+        if sum(missing) > slots or any(need > left for need, left in zip(missing, self.role_suffix[i])):
+            return
+        if hps < self.rules.min_hps and hps + self._hps_bound(i, slots, used, role_counts) < self.rules.min_hps:
+            return
+        if len(best) == k and dps + self._dps_bound(i, slots, used, missing) <= best[0][0]:
+            return
+
+        role = self.role[i]
+        if self.player[i] not in used and role_counts[role] < self.max_roles[role]:
+            role_counts[role] += 1
+            used.add(self.player[i])
+            chosen.append(i)
+            self._search(i + 1, chosen, used, role_counts, dps + self.dps[i], hps + self.hps[i], best, k)
+            chosen.pop()
+            used.discard(self.player[i])
+            role_counts[role] -= 1
+        self._search(i + 1, chosen, used, role_counts, dps, hps, best, k)
+
+    def best_parties(self, k: int, first_members: list[int] | None = None) -> list[tuple[float, float, tuple[int, ...]]]:
+        # Without first_members the whole tree, otherwise only the parties whose highest DPS member is one of them
+        best = []
+        if first_members is None:
+            self._search(0, [], set(), [0] * len(ROLES), 0.0, 0.0, best, k)
+        for first in first_members or ():
+            if self.max_roles[self.role[first]] > 0:
+                role_counts = [0] * len(ROLES)
+                role_counts[self.role[first]] = 1
+                self._search(first + 1, [first], {self.player[first]}, role_counts, self.dps[first], self.hps[first], best, k)
+        return best
+
+    def assignment(self, entry: tuple[float, float, tuple[int, ...]], total_hp: float) -> PartyAssignment:
+        dps, hps, chosen = entry
+        members = tuple((self.player_names[self.player[j]], ROLES[self.role[j]]) for j in chosen)
+        return PartyAssignment(members, dps, hps, total_hp / dps if dps > 0 else math.inf)
+
+
+def _best_parties_for_first_members(search: _PartySearch, first_members: list[int], k: int) -> list:
+    return search.best_parties(k, first_members)
+
+
+def optimize_parties(roster: list[RosterPlayer], bosses: Dict[str, int], rules: PartyRules = PartyRules(), k: int = 5,
+                     workers: int | None = None) -> list[PartyAssignment]:
+    """
+        The k parties with the shortest expected clear time over bosses, where every player plays one of their roles.
+        The clear time is the bosses' total HP over the party DPS, so the search maximizes DPS under the role, HPS and
+        threat rules.
+
+        With workers > 1 the candidates that can lead a party are dealt out round robin to worker processes, every
+        process prunes against its own k best and the results are merged. Starting the processes costs tens of
+        milliseconds and every process prunes less than the serial search, so workers only pay off on a machine with
+        that many free CPUs and a search that takes seconds serially, like a hard min_hps on a large roster.
+
+    """
+    search = _PartySearch(roster, rules)
+    total_hp = float(sum(bosses.values()))
+    if workers is None or workers <= 1:
+        best = search.best_parties(k)
+    else:
+        first_members = list(range(len(search.dps)))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_best_parties_for_first_members, itertools.repeat(search, workers),
+                                   [first_members[worker::workers] for worker in range(workers)], itertools.repeat(k, workers))
+            best = heapq.nlargest(k, itertools.chain.from_iterable(results))
+    return [search.assignment(entry, total_hp) for entry in sorted(best, reverse=True)]
+
+
+def brute_force_parties(roster: list[RosterPlayer], bosses: Dict[str, int], rules: PartyRules = PartyRules(), k: int = 5) -> list[PartyAssignment]:
+    # Every player combination x every role choice, only usable on small rosters. Kept to check optimize_parties
+    search = _PartySearch(roster, rules)
+    by_player = {}
+    for j, player_index in enumerate(search.player):
+        by_player.setdefault(player_index, []).append(j)
+
+    best = []
+    for players in itertools.combinations(by_player, rules.size):
+        for chosen in itertools.product(*(by_player[player_index] for player_index in players)):
+            role_counts = [sum(1 for j in chosen if search.role[j] == role) for role in range(len(ROLES))]
+            if any(count < minimum or count > maximum for count, minimum, maximum in zip(role_counts, search.min_roles, search.max_roles)):
+                continue
+            hps = sum(search.hps[j] for j in chosen)
+            if search._is_valid(list(chosen), hps):
+                best.append((sum(search.dps[j] for j in chosen), hps, tuple(sorted(chosen))))
+    return [search.assignment(entry, float(sum(bosses.values()))) for entry in heapq.nlargest(k, best)]
+
+
+def load_roster(roster_json: Path) -> list[RosterPlayer]:
+    # {"player": {"tank": {"dps": 250, "hps": 0, "tps": 900}, "fighter": {"dps": 520}}, ...}
+    with open(roster_json) as json_file:
+        roster = json.load(json_file)
+    return [RosterPlayer(name, {role.casefold(): RoleOutput(**output) for role, output in roles.items()}) for name, roles in roster.items()]
+
+
+def random_roster(player_count: int, seed: int = 0) -> list[RosterPlayer]:
+    # Every player has one to three roles. Tanks bring threat, healers HPS, everyone else DPS
+    rng = random.Random(seed)
+    roster = []
+    for i in range(player_count):
+        roles = {}
+        for role in rng.sample(ROLES, rng.randint(1, 3)):
+            if role == "tank":
+                roles[role] = RoleOutput(rng.uniform(150, 300), 0, rng.uniform(600, 1200))
+            elif role == "healer":
+                roles[role] = RoleOutput(rng.uniform(50, 150), rng.uniform(300, 700), rng.uniform(100, 300))
+            else:
+                roles[role] = RoleOutput(rng.uniform(300, 650), rng.uniform(0, 50), rng.uniform(300, 700))
+        roster.append(RosterPlayer(f"Player{i + 1}", roles))
+    return roster
+
+
+def print_party_assignments(assignments: list[PartyAssignment]):
+    for rank, assignment in enumerate(assignments, start=1):
+        print(f"#{rank}: {assignment.dps:.1f} DPS, {assignment.hps:.1f} HPS, clear time {assignment.clear_time_s:.0f}s")
+        for player_name, role in assignment.members:
+            print(f"    {player_name} -> {role}")
+
+
+def benchmark_party_optimizer(bosses: Dict[str, int], player_count: int = 32, k: int = 5, min_hps: float = 500):
+    """
+        Best k parties for a player_count roster serially and over worker processes, and the number of role
+        assignments brute force would have to go through. Checks the search against brute force on a 12 player roster.
+
+    """
+    rules = PartyRules(min_hps=min_hps)
+
+    small_roster = random_roster(12, seed=1)
+    searched = [(party.members, round(party.dps, 6)) for party in optimize_parties(small_roster, bosses, rules, k)]
+    brute_forced = [(party.members, round(party.dps, 6)) for party in brute_force_parties(small_roster, bosses, rules, k)]
+    assert [dps for _, dps in searched] == [dps for _, dps in brute_forced], "search differs from brute force"
+
+    roster = random_roster(player_count)
+    start = time.perf_counter()
+    serial = optimize_parties(roster, bosses, rules, k)
+    serial_s = time.perf_counter() - start
+
+    workers = os.cpu_count() or 1
+    start = time.perf_counter()
+    parallel = optimize_parties(roster, bosses, rules, k, workers=max(workers, 2))
+    parallel_s = time.perf_counter() - start
+    assert [party.dps for party in serial] == [party.dps for party in parallel], "parallel search differs from the serial one"
+
+    role_choices = [len(player.roles) for player in roster]
+    brute_force_count = sum(math.prod(choice) for choice in itertools.combinations(role_choices, rules.size))
+    print(f"{player_count} players, {sum(role_choices)} (player, role) candidates, {brute_force_count:,} role assignments for brute force")
+    print(f"best {k}: serial {serial_s * 1000:.1f}ms, {max(workers, 2)} processes {parallel_s * 1000:.1f}ms")
+    print_party_assignments(serial[:1])
+
+
+if __name__ == '__main__':
+    from boss_dps_prediction.boss_dps_prediction import boss_name_hp_map
+
+    roster_location = input("Enter Path to the roster json file or press ENTER to benchmark a random roster: ")
+    if not roster_location:
+        benchmark_party_optimizer(boss_name_hp_map)
+        exit()
+
+    required_hps = float(input("Enter the minimum party HPS or press ENTER for none: ") or 0)
+    print_party_assignments(optimize_parties(load_roster(Path(roster_location)), boss_name_hp_map, PartyRules(min_hps=required_hps)))
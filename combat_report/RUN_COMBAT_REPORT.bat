@@ -2,5 +2,6 @@
 REM
 call "C:\Users\user\PycharmProjects\SteinScripts\.venv\Scripts\activate.bat"
 
-python "%~dp0combat_report.py"
+cd /d "%~dp0.."
+python -m combat_report.combat_report
 pause
\ No newline at end of file
@@ -0,0 +1,7 @@
+@echo off
+REM
+call "C:\Users\user\PycharmProjects\SteinScripts\.venv\Scripts\activate.bat"
+
+cd /d "%~dp0.."
+python -m combat_report.fight_diff
+pause
\ No newline at end of file
@@ -1,58 +1,25 @@
-# TODO LIST
-# Duration tank was fully healed
-# How many times players had near death events (Defined by %HP drops)
 from pathlib import Path
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Optional
 import numpy as np
-import json
 import pandas as pd
 import plotly.express as px
 
-
-class Metadata(BaseModel):
-    startTime: int
-    endTime: int
-    durationSec: int
-    totalDamageDone: int
-    totalDamageTaken: int
-    eventCount: int
-
-
-class Resources(BaseModel):
-    HP: int
-    HPmax: int
-    Shield: float
-    Mana: Optional[int]
-    Energy: Optional[int]
-
-
-class Event(BaseModel):
-    timestamp: int
-    direction: str
-    attacker: str
-    defender: str
-    attack: Optional[str]  # sometimes null
-    value: int
-    effectType: str
-    result: str
-    crit: bool
-    resources: Resources
-
-
-class FightLog(BaseModel):
-    metadata: Metadata
-    events: List[Event]
+from combat_report.event_store import FightEventStore
+from combat_report.fight_log_columns import FightEventColumns, is_fight_log, read_fight_log_columns
+from combat_report.fight_log_models import Metadata
+from combat_report.hp_analysis import HpIntervalAnalysis, HpThreshold, HpTimeline, default_hp_thresholds
+from combat_report.live_combat_report import LiveCombatMetrics, follow_fight_log
+from combat_report.window_metrics import CombatWindowMetrics
 
 
 class CombatReporter:
-    def __init__(self, fight_log_json: Path):
-        # Opens and reads json
-        with open(fight_log_json) as f:
-            data = json.load(f)
-
-        # Puts json data info pydantic base model schema
-        fight_log = FightLog(**data)
+    def __init__(self, fight_log_json: Path | FightEventColumns, show_plots: bool = True):
+        # Streams the json into interned columns (strings as small int codes, narrow dtypes). Already loaded columns
+        # (benchmarks, generated logs) are used as they are
+        if isinstance(fight_log_json, FightEventColumns):
+            fight_log_columns: FightEventColumns = fight_log_json
+        else:
+            fight_log_columns: FightEventColumns = read_fight_log_columns(fight_log_json)
 
         # Holds metric info
         self.player_total_heal_in_combat: dict[str, float] = {}
@@ -63,90 +30,98 @@ class CombatReporter:
         self.player_dps_in_combat: dict[str, float] = {}
         self.player_tps_in_combat: dict[str, float] = {}
         self.player_overheal_in_combat: dict[str, float] = {}
+        self.player_effective_heal_in_combat: dict[str, float] = {}
+        self.heal_breakdown_in_combat: pd.DataFrame = pd.DataFrame()
         self.player_total_damage_taken_in_combat: dict[str, float] = {}
         self.player_time_below_20_in_combat: dict[str, float] = {}
+        self.player_time_at_full_hp_in_combat: dict[str, float] = {}
+        self.player_near_death_events_in_combat: dict[str, int] = {}
+        self.player_deaths_in_combat: dict[str, int] = {}
+        self.hp_state_summary_in_combat: pd.DataFrame = pd.DataFrame()
+        self.player_peak_rolling_dps_in_combat: dict[float, dict[str, float]] = {}
+        self.player_peak_rolling_hps_in_combat: dict[float, dict[str, float]] = {}
+        self.ability_breakdown_in_combat: pd.DataFrame = pd.DataFrame()
+        self.rolling_dps_in_combat: pd.DataFrame = pd.DataFrame()
+        self.rolling_hps_in_combat: pd.DataFrame = pd.DataFrame()
 
-        # Used to calculate some metrics
-        self.last_hp_below_critical_threshold: dict[str, float] = {}
         self.player_current_hp_in_combat: dict[str, float] = {}
 
         # Constants
+        self.show_plots: bool = show_plots
         self.critical_hp_threshold: float = 1100
+        self.near_death_hp_percent: float = 20
+        # First threshold is the critical one used for player_time_below_20_in_combat
+        self.hp_thresholds: list[HpThreshold] = default_hp_thresholds(self.critical_hp_threshold)
+        self.rolling_windows_s: tuple[float, ...] = (5, 10, 30)
 
-        # Holds json data
-        self._fight_metadata: Metadata = fight_log.metadata
-        self._fight_events: list[Event] = fight_log.events
+        # Holds json data. The categorical events df is the only copy of the events kept alive
+        self._fight_metadata: Metadata = fight_log_columns.metadata
+        self._events_df: pd.DataFrame = fight_log_columns.to_frame()
 
-        # Setting up events df and adding Time (s) col
-        self._events_df = pd.DataFrame(data["events"])
-        start_time = self._fight_metadata.startTime
-        self._events_df["Time (s)"] = (self._events_df["timestamp"] - start_time) / 1000
+        # Indexed columns for ad-hoc queries
+        self.event_store: FightEventStore = FightEventStore.from_events_df(self._events_df)
 
         # Gets all the metrics
         self._setup_metrics()
 
-    def _setup_metrics(self):
-        for event in self._fight_events:
-            self._set_highest_damage_in_combat(event)
-            self._set_highest_heal_in_combat(event)
-            self._set_total_damage_in_combat(event)
-            self._set_total_damage_taken_in_combat(event)
-            self._set_total_heal_in_combat(event)
-            self._set_overheal_in_combat(event)
-            self._set_time_below_critical_hp_in_combat(event)
+    @staticmethod
+    def follow(fight_log_json: Path, refresh_rate_s: float = 1.0, critical_hp_threshold: float = 1100) -> LiveCombatMetrics:
+        # Live mode for a fight log that is still being written. Never re-reads the file from the start
+        return follow_fight_log(fight_log_json, refresh_rate_s, critical_hp_threshold)
 
-        self._set_dps_in_combat()
-        self._set_hps_in_combat()
-        self._set_tps_in_combat()
-        self._plot_hp_over_time_in_combat()
-        self._plot_damage_over_time_in_combat()
-        self._plot_tps_over_time_in_combat()
+    def query_events(self, start_s: Optional[float] = None, end_s: Optional[float] = None, group_by: Optional[str] = None, **filters) -> pd.DataFrame:
+        """
+            Filters events through the event store indexes, e.g.
+            query_events(attacker="poolgoes", defender="Garub", crit=True, start_s=30, end_s=60)
+            Passing group_by (attacker, defender, effectType, result, attack or crit) returns count/total/average/max instead.
 
-    def _set_highest_damage_in_combat(self, event: Event):
-        if event.effectType == "Damage":
-            if event.attacker not in self.player_highest_damage_in_combat:
-                self.player_highest_damage_in_combat[event.attacker] = event.value
-            if self.player_highest_damage_in_combat[event.attacker] < event.value:
-                self.player_highest_damage_in_combat[event.attacker] = event.value
+        """
+        return self.event_store.query(start_s, end_s, group_by, **filters)
+
+    def _setup_metrics(self):
+        self._is_damage: np.ndarray = (self._events_df["effectType"] == "Damage").to_numpy()
+        self._is_heal: np.ndarray = (self._events_df["effectType"] == "Heal").to_numpy()
 
-        self.player_highest_damage_in_combat = dict(sorted(self.player_highest_damage_in_combat.items(), key=lambda item: item[1], reverse=True))
+        self._set_highest_damage_in_combat()
+        self._set_highest_heal_in_combat()
+        self._set_total_damage_in_combat()
+        self._set_total_damage_taken_in_combat()
+        self._set_total_heal_in_combat()
 
-    def _set_highest_heal_in_combat(self, event: Event):
-        if event.effectType == "Heal":
-            if event.attacker not in self.player_highest_heal_in_combat:
-                self.player_highest_heal_in_combat[event.attacker] = event.value
+        # HP timeline is rebuilt once and shared by the overheal and HP state metrics
+        self._hp_timeline = HpTimeline(self._events_df)
+        self._set_overheal_in_combat()
+        self._set_hp_states_in_combat()
 
-            if self.player_highest_heal_in_combat[event.attacker] < event.value:
-                self.player_highest_heal_in_combat[event.attacker] = event.value
+        self._set_dps_in_combat()
+        self._set_hps_in_combat()
+        self._set_tps_in_combat()
+        self._set_window_metrics_in_combat()
 
-        self.player_highest_heal_in_combat = dict(sorted(self.player_highest_heal_in_combat.items(), key=lambda item: item[1], reverse=True))
+        # Batch tools (dashboard, benchmarks) only need the metrics
+        if self.show_plots:
+            for fig in self.build_figures():
+                fig.show()
 
-    def _set_total_damage_in_combat(self, event: Event):
-        if event.effectType == "Damage":
-            if event.attacker not in self.player_total_damage_in_combat:
-                self.player_total_damage_in_combat[event.attacker] = event.value
-            else:
-                self.player_total_damage_in_combat[event.attacker] += event.value
+    def _per_player_value(self, rows: np.ndarray, player_column: str, aggregation: str) -> dict[str, int]:
+        # Groups the value column of the selected rows on the categorical player codes
+        grouped = self._events_df.loc[rows].groupby(player_column, observed=True, sort=False)["value"].agg(aggregation)
+        return dict(sorted(((name, int(value)) for name, value in grouped.items()), key=lambda item: item[1], reverse=True))
 
-        self.player_total_damage_in_combat = dict(sorted(self.player_total_damage_in_combat.items(), key=lambda item: item[1], reverse=True))
+    def _set_highest_damage_in_combat(self):
+        self.player_highest_damage_in_combat = self._per_player_value(self._is_damage, "attacker", "max")
 
-    def _set_total_damage_taken_in_combat(self, event: Event):
-        if event.effectType == "Damage":
-            if event.defender not in self.player_total_damage_taken_in_combat:
-                self.player_total_damage_taken_in_combat[event.defender] = event.value
-            else:
-                self.player_total_damage_taken_in_combat[event.defender] += event.value
+    def _set_highest_heal_in_combat(self):
+        self.player_highest_heal_in_combat = self._per_player_value(self._is_heal, "attacker", "max")
 
-        self.player_total_damage_taken_in_combat = dict(sorted(self.player_total_damage_taken_in_combat.items(), key=lambda item: item[1], reverse=True))
+    def _set_total_damage_in_combat(self):
+        self.player_total_damage_in_combat = self._per_player_value(self._is_damage, "attacker", "sum")
 
-    def _set_total_heal_in_combat(self, event: Event):
-        if event.effectType == "Heal":
-            if event.attacker not in self.player_total_heal_in_combat:
-                self.player_total_heal_in_combat[event.attacker] = event.value
-            else:
-                self.player_total_heal_in_combat[event.attacker] += event.value
+    def _set_total_damage_taken_in_combat(self):
+        self.player_total_damage_taken_in_combat = self._per_player_value(self._is_damage, "defender", "sum")
 
-        self.player_total_heal_in_combat = dict(sorted(self.player_total_heal_in_combat.items(), key=lambda item: item[1], reverse=True))
+    def _set_total_heal_in_combat(self):
+        self.player_total_heal_in_combat = self._per_player_value(self._is_heal, "attacker", "sum")
 
     def _set_dps_in_combat(self):
         if self.player_total_damage_in_combat:
@@ -176,86 +151,82 @@ class CombatReporter:
 
         self.player_tps_in_combat = dict(sorted(self.player_tps_in_combat.items(), key=lambda item: item[1], reverse=True))
 
-    def _set_overheal_in_combat(self, event: Event):
-        if event.effectType == "Heal":
-            # First heal in combat
-            if event.defender not in self.player_current_hp_in_combat:
-                self.player_current_hp_in_combat[event.defender] = event.resources.HPmax
-                self.player_overheal_in_combat[event.attacker] = event.value
-                return
-            # Any heal done on player after they already have their initial hp in the current hp map
-            if (over_heal := event.value - (event.resources.HPmax - self.player_current_hp_in_combat[event.defender])) > 0:
-                self.player_overheal_in_combat[event.attacker] = over_heal
-
-            # Updates current hp value after heal incase it wasnt overhealed
-            self.player_current_hp_in_combat[event.defender] = event.resources.HP
-
-        if event.effectType == "Damage":
-            # Updates player hp whenever its attacked
-            self.player_current_hp_in_combat[event.defender] = event.resources.HP
-
-        self.player_current_hp_in_combat = dict(sorted(self.player_current_hp_in_combat.items(), key=lambda item: item[1], reverse=True))
-        self.player_overheal_in_combat = dict(sorted(self.player_overheal_in_combat.items(), key=lambda item: item[1], reverse=True))
-
-    def _set_time_below_critical_hp_in_combat(self, event: Event):
-        """
-            Will not work if players starts with critical hp. Can only work after an event logs the player at critical hp
-
-        """
-        defender: str = event.defender
-        hp: float = event.resources.HP
-        hpmax: float = event.resources.HPmax
-        time_s: float = round((event.timestamp - self._fight_metadata.startTime) / 1000, 3)
-
-        if hpmax == 0:
-            return
-
-        # If player drops below threshold and wasn't already tracked
-        if hp < self.critical_hp_threshold and defender not in self.last_hp_below_critical_threshold:
-            self.last_hp_below_critical_threshold[defender] = time_s
-
-        # If player recovers above 20% and was tracked
-        elif defender in self.last_hp_below_critical_threshold and (hp >= self.critical_hp_threshold or hp == 0):
-            duration = time_s - self.last_hp_below_critical_threshold[defender]
-            self.player_time_below_20_in_combat[defender] = round(self.player_time_below_20_in_combat.get(defender, 0) + duration, 3)
-            del self.last_hp_below_critical_threshold[defender]
-
-        if event == self._fight_events[-1] and self.last_hp_below_critical_threshold:
-            # If someone ended the fight still below 20% → close out with fight end time
-            for defender, start_time in self.last_hp_below_critical_threshold.items():
-                duration = self._fight_metadata.durationSec - start_time
-                self.player_time_below_20_in_combat[defender] = round(self.player_time_below_20_in_combat.get(defender, 0) + duration, 3)
-
-        # Sort by longest survival under critical threshold%
-        self.player_time_below_20_in_combat = dict(
-            sorted(self.player_time_below_20_in_combat.items(), key=lambda x: x[1], reverse=True)
-        )
+    def _set_overheal_in_combat(self):
+        # Effective heal/overheal per healer and target from the reconstructed HP timeline
+        self.heal_breakdown_in_combat = self._hp_timeline.heal_breakdown()
+        per_healer = self.heal_breakdown_in_combat.groupby("healer")[["Effective Heal", "Overheal"]].sum()
+        self.player_effective_heal_in_combat = dict(sorted(per_healer["Effective Heal"].items(), key=lambda item: item[1], reverse=True))
+        self.player_overheal_in_combat = dict(sorted(per_healer["Overheal"].items(), key=lambda item: item[1], reverse=True))
+        self.player_current_hp_in_combat = self._hp_timeline.hp_at_end()
+
+    def _set_hp_states_in_combat(self):
+        # All HP thresholds, full HP and dead intervals come out of one vectorized pass
+        self._hp_intervals = HpIntervalAnalysis(self._hp_timeline, self._fight_metadata.durationSec, self.hp_thresholds, self.near_death_hp_percent)
+        self.player_time_below_20_in_combat = self._hp_intervals.time_in_state(self.hp_thresholds[0].name)
+        self.player_time_at_full_hp_in_combat = self._hp_intervals.time_in_state(HpIntervalAnalysis.full_hp_state)
+        self.player_near_death_events_in_combat = self._hp_intervals.player_near_death_events_in_combat
+        self.player_deaths_in_combat = self._hp_intervals.player_deaths_in_combat
+        self.hp_state_summary_in_combat = self._hp_intervals.hp_state_summary
+
+    def _set_window_metrics_in_combat(self):
+        self._window_metrics = CombatWindowMetrics(self._events_df, self.rolling_windows_s)
+        self.player_peak_rolling_dps_in_combat = self._window_metrics.peak_rolling_dps_in_combat
+        self.player_peak_rolling_hps_in_combat = self._window_metrics.peak_rolling_hps_in_combat
+        self.ability_breakdown_in_combat = self._window_metrics.ability_breakdown_in_combat
+        self.rolling_dps_in_combat = self._window_metrics.rolling_dps_in_combat
+        self.rolling_hps_in_combat = self._window_metrics.rolling_hps_in_combat
+
+    def export_metric_tables(self, output_dir: Path) -> list[Path]:
+        # Rolling DPS/HPS, ability breakdown and HP state tables as csv
+        written = self._window_metrics.export_tables(output_dir)
+        hp_tables = {
+            "hp_state_intervals.csv": self._hp_intervals.hp_state_intervals,
+            "hp_state_summary.csv": self._hp_intervals.hp_state_summary,
+            "heal_breakdown.csv": self.heal_breakdown_in_combat,
+        }
+        for file_name, table in hp_tables.items():
+            table.to_csv(Path(output_dir) / file_name, index=False)
+            written.append(Path(output_dir) / file_name)
+        return written
+
+    def build_figures(self) -> list:
+        return [
+            self._plot_hp_over_time_in_combat(),
+            self._plot_damage_over_time_in_combat(),
+            self._plot_tps_over_time_in_combat(),
+            self._plot_rolling_dps_in_combat(),
+        ]
 
     def _plot_hp_over_time_in_combat(self):
-        fig = px.line(self._events_df, x="Time (s)", y=[event.resources.HP for event in self._fight_events], color="defender", title="HP Over Time in Combat", labels={"y": "HP"})
-        fig.show()
+        fig = px.line(self._events_df, x="Time (s)", y="HP", color="defender", title="HP Over Time in Combat")
+        return fig
 
     def _plot_damage_over_time_in_combat(self):
-        df = self._events_df.copy()
-        df["Damage"] = [event.value if event.effectType == "Damage" else 0 for event in self._fight_events]
-        df["Running Total Damage"] = df.groupby("attacker")["Damage"].cumsum()
+        df = self._events_df[["Time (s)", "attacker"]].copy()
+        df["Damage"] = np.where(self._is_damage, self._events_df["value"], 0)
+        df["Running Total Damage"] = df.groupby("attacker", observed=True)["Damage"].cumsum()
         fig = px.line(df, x="Time (s)", y="Running Total Damage", color="attacker", title="Running Total Damage in Combat")
-        fig.show()
+        return fig
 
     def _plot_tps_over_time_in_combat(self):
-        df = self._events_df.copy()
+        df = self._events_df[["Time (s)", "attacker"]].copy()
 
-        df["Damage"] = [event.value if event.effectType == "Damage" else 0 for event in self._fight_events]
-        df["Running Total Damage"] = df.groupby("attacker")["Damage"].cumsum()
+        df["Damage"] = np.where(self._is_damage, self._events_df["value"], 0)
+        df["Running Total Damage"] = df.groupby("attacker", observed=True)["Damage"].cumsum()
 
-        df["Heal"] = [event.value if event.effectType == "Heal" else 0 for event in self._fight_events]
-        df["Running Total Heal"] = df.groupby("attacker")["Heal"].cumsum()
+        df["Heal"] = np.where(self._is_heal, self._events_df["value"], 0)
+        df["Running Total Heal"] = df.groupby("attacker", observed=True)["Heal"].cumsum()
 
         df['Total Running Total Threat'] = df['Running Total Damage'] + df['Running Total Heal']
         df['Threat/s'] = np.where(df['Time (s)'] == 0, 0, df['Total Running Total Threat'] / df['Time (s)'])
         fig = px.line(df, x="Time (s)", y="Threat/s", color="attacker", title="TPS in Combat")
+        return fig
 
-        fig.show()
+    def _plot_rolling_dps_in_combat(self):
+        df = self.rolling_dps_in_combat
+        df = df[df["attacker"].isin(self.player_total_damage_in_combat.keys())]
+        fig = px.line(df, x="Time (s)", y="DPS", color="attacker", facet_row="Window (s)", title="Rolling Window DPS in Combat")
+        return fig
 
 
 if __name__ == '__main__':
@@ -263,10 +234,14 @@ if __name__ == '__main__':
     if not json_file_location:
         json_file_location: Path = Path(__file__).parent / "fight-log-1758484168170.json"
 
-    if not Path(json_file_location).is_file() or not Path(json_file_location).suffix == ".json":
+    if not Path(json_file_location).is_file() or not is_fight_log(Path(json_file_location)):
         print(f"Invalid file: {json_file_location}")
         exit()
 
+    if input("Press 1 to follow the fight log live while it is being written. Press anything else for the full report: ") == "1":
+        CombatReporter.follow(Path(json_file_location))
+        exit()
+
     report = CombatReporter(Path(json_file_location))
     print("COMBAT REPORT")
     print("```````````````````````````````````````````````````````````````````````````````````````````````````````````")
@@ -284,7 +259,38 @@ if __name__ == '__main__':
     print(f"Total Heal Map = {report.player_total_heal_in_combat}")
     print(f"HPS Map = {report.player_hps_in_combat}")
     print(f"Total Duration player below {report.critical_hp_threshold}HP= {report.player_time_below_20_in_combat}")
-    print(f"Over Heal Map (Broken) = {report.player_overheal_in_combat}")
-    print(f"HP At Fight End Map (Only players that were attacked or healed)= {report.player_current_hp_in_combat}")
+    print(f"Time At Full HP Map = {report.player_time_at_full_hp_in_combat}")
+    print(f"Near Death Events Map (Survived a drop below {report.near_death_hp_percent}%HP) = {report.player_near_death_events_in_combat}")
+    print(f"Deaths Map = {report.player_deaths_in_combat}")
+    print(f"Effective Heal Map = {report.player_effective_heal_in_combat}")
+    print(f"Over Heal Map = {report.player_overheal_in_combat}")
+    print(f"HP At Fight End Map = {report.player_current_hp_in_combat}")
+
+    print("\n")
+    print("```````````````````````````````````````````````````````````````````````````````````````````````````````````")
+    print("Heal Breakdown (Healer -> Target)")
+    print(report.heal_breakdown_in_combat.to_string(index=False))
+
+    print("\n")
+    print("```````````````````````````````````````````````````````````````````````````````````````````````````````````")
+    print("HP State Summary")
+    print(report.hp_state_summary_in_combat.to_string(index=False))
+
+    print("\n")
+    print("```````````````````````````````````````````````````````````````````````````````````````````````````````````")
+    print("Rolling Window Metrics")
+    for window_s in report.rolling_windows_s:
+        print(f"Peak {window_s}s DPS Map = {report.player_peak_rolling_dps_in_combat[window_s]}")
+        print(f"Peak {window_s}s HPS Map = {report.player_peak_rolling_hps_in_combat[window_s]}")
+
+    print("\n")
+    print("```````````````````````````````````````````````````````````````````````````````````````````````````````````")
+    print("Ability Breakdown")
+    print(report.ability_breakdown_in_combat.to_string(index=False))
+
+    if input("\nPress 1 to export the metric tables as csv. Press anything else to exit: ") == "1":
+        tables_dir = Path(json_file_location).parent / f"{Path(json_file_location).stem}_tables"
+        for table_path in report.export_metric_tables(tables_dir):
+            print(f"Wrote {table_path}")
 
 
@@ -0,0 +1,250 @@
+import hashlib
+import json
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from flask import Flask, Response, abort, jsonify, render_template_string
+from plotly.offline import get_plotlyjs
+
+from combat_report.combat_report import CombatReporter
+from combat_report.fight_log_columns import find_fight_logs, is_fight_log
+
+INDEX_TEMPLATE = """
+<!doctype html>
+<title>Combat Reports</title>
+<h1>Combat Reports</h1>
+<p>{{ logs_dir }}</p>
+<ul>
+{% for log in logs %}
+  <li><a href="/report/{{ log.name }}">{{ log.name }}</a> ({{ "%.1f" % (log.stat().st_size / 1024) }} KB)</li>
+{% else %}
+  <li>No fight logs found</li>
+{% endfor %}
+</ul>
+"""
+
+REPORT_TEMPLATE = """
+<!doctype html>
+<title>{{ name }}</title>
+<script src="/plotly.min.js"></script>
+<style>
+  body { font-family: sans-serif; margin: 2em; }
+  table { border-collapse: collapse; margin-bottom: 1.5em; }
+  td, th { border: 1px solid #ccc; padding: 2px 8px; text-align: right; }
+  th { background: #eee; }
+</style>
+<a href="/">&larr; All fight logs</a>
+<h1>{{ name }}</h1>
+<p>{{ report.metadata.durationSec }}s fight, {{ report.metadata.eventCount }} events</p>
+<div id="tables"></div>
+<div id="charts"></div>
+<script>
+  const report = {{ report_json | safe }};
+
+  // Player and ability names come from the log, so every cell is set as text, never parsed as HTML
+  function addRow(table, cellTag, values) {
+    const tr = table.insertRow();
+    for (const value of values) {
+      const cell = document.createElement(cellTag);
+      cell.textContent = value ?? "";
+      tr.appendChild(cell);
+    }
+  }
+
+  function addTable(title, rows) {
+    if (!rows.length) return;
+    const columns = Object.keys(rows[0]);
+    const heading = document.createElement("h2");
+    heading.textContent = title;
+    const table = document.createElement("table");
+    addRow(table, "th", columns);
+    for (const row of rows) addRow(table, "td", columns.map(c => row[c]));
+    document.getElementById("tables").append(heading, table);
+  }
+
+  addTable("Player Metrics", report.players);
+  addTable("Ability Breakdown", report.ability_breakdown);
+
+  for (const [title, traces] of Object.entries(report.charts)) {
+    const div = document.createElement("div");
+    document.getElementById("charts").appendChild(div);
+    Plotly.newPlot(div, traces.map(t => ({x: t.x, y: t.y, name: t.name, type: "scattergl", mode: "lines"})),
+                   {title: {text: title}, xaxis: {title: {text: "Time (s)"}}});
+  }
+</script>
+"""
+
+
+def downsample_trace(x: np.ndarray, y: np.ndarray, max_points: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Min/max decimation: keeps the lowest and highest point of every bucket so spikes and HP dips survive the
+        downsampling.
+
+    """
+    if len(x) <= max_points:
+        return x, y
+
+    bucket_edges = np.linspace(0, len(x), max_points // 2 + 1).astype(np.int64)
+    keep = np.empty(2 * (len(bucket_edges) - 1), dtype=np.int64)
+    for bucket, (first, last) in enumerate(zip(bucket_edges[:-1], bucket_edges[1:])):
+        keep[2 * bucket] = first + np.argmin(y[first:last])
+        keep[2 * bucket + 1] = first + np.argmax(y[first:last])
+    keep = np.unique(keep)
+    return x[keep], y[keep]
+
+
+def build_report_payload(fight_log_json: Path, max_points_per_trace: int = 1000) -> dict:
+    report = CombatReporter(fight_log_json, show_plots=False)
+    store = report.event_store
+
+    players = set(report.player_total_damage_in_combat) | set(report.player_total_heal_in_combat) | set(report.player_total_damage_taken_in_combat)
+    player_rows = [{
+        "Player": player,
+        "Damage": report.player_total_damage_in_combat.get(player, 0),
+        "DPS": report.player_dps_in_combat.get(player, 0),
+        "Heal": report.player_total_heal_in_combat.get(player, 0),
+        "HPS": report.player_hps_in_combat.get(player, 0),
+        "Taken": report.player_total_damage_taken_in_combat.get(player, 0),
+        f"Below {report.critical_hp_threshold:g}HP (s)": report.player_time_below_20_in_combat.get(player, 0),
+        "Full HP (s)": report.player_time_at_full_hp_in_combat.get(player, 0),
+        "Near Deaths": report.player_near_death_events_in_combat.get(player, 0),
+        "Deaths": report.player_deaths_in_combat.get(player, 0),
+    } for player in sorted(players, key=lambda name: report.player_tps_in_combat.get(name, 0), reverse=True)]
+
+    hp_traces = []
+    for defender in report.player_total_damage_taken_in_combat:
+        rows = store.select(defender=defender)
+        rows = rows[store.columns["HPmax"][rows] > 0]
+        x, y = downsample_trace(store.time_s[rows], store.columns["HP"][rows], max_points_per_trace)
+        hp_traces.append({"name": defender, "x": x, "y": y})
+
+    damage_traces = []
+    for attacker in report.player_total_damage_in_combat:
+        rows = store.select(attacker=attacker, effectType="Damage")
+        x, y = downsample_trace(store.time_s[rows], np.cumsum(store.columns["value"][rows]), max_points_per_trace)
+        damage_traces.append({"name": attacker, "x": x, "y": y})
+
+    rolling_traces = []
+    rolling_window_s = report.rolling_windows_s[len(report.rolling_windows_s) // 2]
+    rolling_dps = report.rolling_dps_in_combat[report.rolling_dps_in_combat["Window (s)"] == rolling_window_s]
+    for attacker, attacker_dps in rolling_dps.groupby("attacker", sort=False):
+        if attacker not in report.player_total_damage_in_combat:
+            continue
+        x, y = downsample_trace(attacker_dps["Time (s)"].to_numpy(), attacker_dps["DPS"].to_numpy(), max_points_per_trace)
+        rolling_traces.append({"name": attacker, "x": x, "y": y})
+
+    return {
+        "metadata": report._fight_metadata.model_dump(),
+        "players": player_rows,
+        "ability_breakdown": report.ability_breakdown_in_combat.to_dict(orient="records"),
+        "charts": {
+            "HP Over Time in Combat": hp_traces,
+            "Running Total Damage in Combat": damage_traces,
+            f"Rolling {rolling_window_s}s DPS in Combat": rolling_traces,
+        },
+    }
+
+
+def _to_builtin(value):
+    # numpy scalars/arrays inside the payload
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Can't serialize {type(value)}")
+
+
+class ReportCache:
+    """
+        Report payloads cached in memory (LRU) and on disk as json. Both are keyed on the log's path, size and mtime, so a
+        report is only recomputed when its fight log changes.
+
+    """
+    def __init__(self, cache_dir: Path, max_entries: int = 16):
+        self.cache_dir: Path = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries: int = max_entries
+        self._memory: OrderedDict[tuple, str] = OrderedDict()
+
+    @staticmethod
+    def _fingerprint(fight_log_json: Path) -> tuple:
+        stat = fight_log_json.stat()
+        return str(fight_log_json.resolve()), stat.st_size, stat.st_mtime_ns
+
+    def get_json(self, fight_log_json: Path) -> str:
+        fingerprint = self._fingerprint(fight_log_json)
+
+        if fingerprint in self._memory:
+            self._memory.move_to_end(fingerprint)
+            return self._memory[fingerprint]
+
+        cache_file = self.cache_dir / f"{hashlib.sha1(fingerprint[0].encode()).hexdigest()}.json"
+        report_json = None
+        if cache_file.is_file():
+            cached = json.loads(cache_file.read_text())
+            if tuple(cached["fingerprint"]) == fingerprint:
+                report_json = cached["report_json"]
+
+        if report_json is None:
+            report_json = json.dumps(build_report_payload(fight_log_json), default=_to_builtin)
+            cache_file.write_text(json.dumps({"fingerprint": fingerprint, "report_json": report_json}))
+
+        self._memory[fingerprint] = report_json
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+        return report_json
+
+
+def _script_safe_json(report_json: str) -> str:
+    # Names come from the fight log, "</script>" in one mustn't end the script block. The escapes are still valid json
+    return report_json.replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026")
+
+
+def create_dashboard_app(logs_dir: Path, cache_dir: Path) -> Flask:
+    logs_dir = Path(logs_dir)
+    cache = ReportCache(cache_dir)
+    app = Flask(__name__)
+    plotly_js = get_plotlyjs()
+
+    def find_log(name: str) -> Path:
+        fight_log = logs_dir / name
+        # Only serves logs that sit directly in logs_dir
+        if fight_log.parent != logs_dir or not fight_log.is_file() or not is_fight_log(fight_log):
+            abort(404)
+        return fight_log
+
+    @app.route("/")
+    def index():
+        logs = sorted(find_fight_logs(logs_dir), key=lambda path: path.stat().st_mtime, reverse=True)
+        return render_template_string(INDEX_TEMPLATE, logs=logs, logs_dir=logs_dir)
+
+    @app.route("/report/<name>")
+    def report_page(name: str):
+        report_json = cache.get_json(find_log(name))
+        return render_template_string(REPORT_TEMPLATE, name=name, report=json.loads(report_json), report_json=_script_safe_json(report_json))
+
+    @app.route("/api/report/<name>")
+    def report_api(name: str):
+        return Response(cache.get_json(find_log(name)), mimetype="application/json")
+
+    @app.route("/api/logs")
+    def logs_api():
+        return jsonify([path.name for path in sorted(find_fight_logs(logs_dir))])
+
+    # Served locally so the dashboard works without network access
+    @app.route("/plotly.min.js")
+    def plotly_script():
+        return Response(plotly_js, mimetype="application/javascript", headers={"Cache-Control": "max-age=86400"})
+
+    return app
+
+
+if __name__ == '__main__':
+    logs_directory: str | Path = input("Enter the directory holding the fight logs or press ENTER to use the default directory: ")
+    if not logs_directory:
+        logs_directory: Path = Path(__file__).parent
+
+    dashboard = create_dashboard_app(Path(logs_directory), Path(logs_directory) / ".report_cache")
+    print("Open http://127.0.0.1:8050 in the browser")
+    dashboard.run(host="127.0.0.1", port=8050)
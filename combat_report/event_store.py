@@ -0,0 +1,182 @@
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+class _PostingIndex:
+    """
+        CSR style posting lists for one categorical column. Rows of the store are sorted by time, so every posting list
+        is sorted by time too and its timestamps can be binary searched for a time range.
+
+    """
+    def __init__(self, codes: np.ndarray, names: list, time_s: np.ndarray):
+        self.names: list = names
+        self.code_by_name: dict = {name: code for code, name in enumerate(names)}
+
+        # Stable sort keeps the time order inside every posting list
+        self.rows: np.ndarray = np.argsort(codes, kind="stable").astype(np.int64)
+        self.times: np.ndarray = time_s[self.rows]
+        self.offsets: np.ndarray = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(names)), out=self.offsets[1:])
+
+    def bounds(self, name, start_s: float, end_s: float) -> tuple[int, int]:
+        code = self.code_by_name.get(name)
+        if code is None:
+            return 0, 0
+
+        first, last = self.offsets[code], self.offsets[code + 1]
+        times = self.times[first:last]
+        return first + np.searchsorted(times, start_s, side="left"), first + np.searchsorted(times, end_s, side="right")
+
+
+class FightEventStore:
+    """
+        Time sorted, column oriented fight events with per attacker/defender/effectType/result/attack/crit posting lists.
+
+        A query binary searches the time range inside every filtered column's posting list and then only walks the
+        shortest one, so it costs O(log n + rows in the shortest filtered list in that time range) instead of a scan of
+        the whole log.
+
+    """
+    indexed_columns: tuple[str, ...] = ("attacker", "defender", "effectType", "result", "attack", "crit")
+
+    def __init__(self, columns: dict[str, np.ndarray]):
+        # Logs are normally written in time order already, then the columns are used as they are without a copy
+        time_s = np.asarray(columns["Time (s)"])
+        if np.all(time_s[1:] >= time_s[:-1]):
+            self.columns: dict[str, np.ndarray] = dict(columns)
+        else:
+            order = np.argsort(time_s, kind="stable")
+            self.columns: dict[str, np.ndarray] = {name: values[order] for name, values in columns.items()}
+        self.time_s: np.ndarray = self.columns["Time (s)"]
+        self.event_count: int = len(self.time_s)
+
+        self._codes: dict[str, np.ndarray] = {}
+        self._indexes: dict[str, _PostingIndex] = {}
+        for column in self.indexed_columns:
+            codes, names = pd.factorize(self.columns[column], use_na_sentinel=False)
+            self._codes[column] = codes
+            # Null attack names (NaN or None) can be queried as None
+            self._indexes[column] = _PostingIndex(codes, [None if pd.isna(name) else name for name in names], self.time_s)
+
+    @classmethod
+    def from_events_df(cls, events_df: pd.DataFrame) -> "FightEventStore":
+        # Categorical columns stay categorical, so the store only holds their codes
+        columns = {column: events_df[column].to_numpy() for column in ("Time (s)", "value", "HP", "HPmax")}
+        columns.update({column: events_df[column].array for column in cls.indexed_columns})
+        return cls(columns)
+
+    def select(self, start_s: Optional[float] = None, end_s: Optional[float] = None, **filters) -> np.ndarray:
+        """
+            Row numbers (time sorted) of the events matching every filter, e.g.
+            select(attacker="poolgoes", defender="Garub", crit=True, start_s=30, end_s=60)
+
+        """
+        unknown = set(filters) - set(self.indexed_columns)
+        if unknown:
+            raise ValueError(f"Can only filter on {self.indexed_columns}, got {sorted(unknown)}")
+
+        start_s = -np.inf if start_s is None else start_s
+        end_s = np.inf if end_s is None else end_s
+
+        if not filters:
+            return np.arange(np.searchsorted(self.time_s, start_s, side="left"), np.searchsorted(self.time_s, end_s, side="right"))
+
+        # Picks the shortest posting list inside the time range and checks the other filters on its rows only
+        ranges = {column: self._indexes[column].bounds(value, start_s, end_s) for column, value in filters.items()}
+        driver = min(ranges, key=lambda column: ranges[column][1] - ranges[column][0])
+        first, last = ranges[driver]
+        rows = self._indexes[driver].rows[first:last]
+
+        for column, value in filters.items():
+            if column == driver or len(rows) == 0:
+                continue
+            rows = rows[self._codes[column][rows] == self._indexes[column].code_by_name[value]]
+        return rows
+
+    def to_frame(self, rows: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame({name: values[rows] for name, values in self.columns.items()})
+
+    def aggregate(self, rows: np.ndarray, group_by: str = "attacker", value_column: str = "value") -> pd.DataFrame:
+        if group_by not in self._codes:
+            raise ValueError(f"Can only group by {self.indexed_columns}, got {group_by}")
+
+        # bincount over the group codes of the matched rows only
+        index = self._indexes[group_by]
+        codes = self._codes[group_by][rows]
+        values = np.asarray(self.columns[value_column][rows], dtype=np.float64)
+        counts = np.bincount(codes, minlength=len(index.names))
+        totals = np.bincount(codes, weights=values, minlength=len(index.names))
+        maxima = np.full(len(index.names), -np.inf)
+        np.maximum.at(maxima, codes, values)
+
+        present = counts > 0
+        with np.errstate(invalid="ignore"):
+            summary = pd.DataFrame({
+                group_by: np.asarray(index.names, dtype=object)[present],
+                "Count": counts[present],
+                "Total": totals[present],
+                "Average": np.round(totals[present] / counts[present], 3),
+                "Max": maxima[present],
+            })
+        return summary.sort_values("Total", ascending=False, ignore_index=True)
+
+    def query(self, start_s: Optional[float] = None, end_s: Optional[float] = None, group_by: Optional[str] = None, **filters) -> pd.DataFrame:
+        rows = self.select(start_s, end_s, **filters)
+        if group_by is None:
+            return self.to_frame(rows)
+        return self.aggregate(rows, group_by)
+
+
+def benchmark_event_store(event_count: int = 10_000_000, seed: int = 0):
+    """
+        Micro-benchmark on a synthetic log: index build time and query times against a full pandas boolean mask scan.
+
+    """
+    rng = np.random.default_rng(seed)
+    players = np.array([f"player{number}" for number in range(10)] + ["Garub", "Inachaus"], dtype=object)
+    duration_s = event_count / 50
+
+    print(f"Building synthetic log with {event_count:,} events")
+    columns = {
+        "Time (s)": np.sort(rng.uniform(0, duration_s, event_count)),
+        "attacker": players[rng.integers(0, len(players), event_count)],
+        "defender": players[rng.integers(0, len(players), event_count)],
+        "effectType": np.array(["Damage", "Heal", "None"], dtype=object)[rng.choice(3, event_count, p=[0.75, 0.24, 0.01])],
+        "result": np.array(["Hit", "Heal", "Miss"], dtype=object)[rng.choice(3, event_count, p=[0.75, 0.24, 0.01])],
+        "attack": np.array(["Unknown Skill", None], dtype=object)[rng.integers(0, 2, event_count)],
+        "crit": rng.random(event_count) < 0.1,
+        "value": rng.integers(0, 1500, event_count),
+    }
+
+    start = time.perf_counter()
+    store = FightEventStore(columns)
+    print(f"Index build: {time.perf_counter() - start:.3f}s")
+
+    events_df = pd.DataFrame(columns)
+    queries = {
+        "crits by player1 on Garub between 30 and 60s": dict(attacker="player1", defender="Garub", crit=True, start_s=30, end_s=60),
+        "all heals by player2 in the last minute": dict(attacker="player2", effectType="Heal", start_s=duration_s - 60, end_s=duration_s),
+        "all misses on Garub": dict(defender="Garub", result="Miss"),
+    }
+    for description, query in queries.items():
+        start = time.perf_counter()
+        rows = store.select(**query)
+        store_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        filters = {key: value for key, value in query.items() if key not in ("start_s", "end_s")}
+        mask = events_df["Time (s)"].between(query.get("start_s", -np.inf), query.get("end_s", np.inf))
+        for column, value in filters.items():
+            mask &= events_df[column] == value
+        scan_rows = np.nonzero(mask.to_numpy())[0]
+        scan_time = time.perf_counter() - start
+
+        assert np.array_equal(rows, scan_rows)
+        print(f"{description}: {len(rows):,} rows, index {store_time * 1000:.3f}ms vs full scan {scan_time * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    benchmark_event_store()
@@ -0,0 +1,135 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from combat_report.combat_report import CombatReporter
+from combat_report.fight_log_columns import FightEventColumns, is_fight_log, read_fight_log_columns
+
+
+def load_fight_logs_concurrently(fight_log_jsons: list[Path], workers: int | None = None) -> list[FightEventColumns]:
+    """
+        Parses the logs in up to one process per CPU through the columnar loader. Parsing is pure python and holds the
+        GIL, so processes (not threads) are what make two logs load in about the time of one, given two CPUs. Only
+        the compact column arrays are sent back to this process. With a single CPU the processes only add start up
+        and pickling on top of the same parsing, so the logs are read one after the other instead. The metrics are
+        worked out in this process either way.
+
+    """
+    workers = min(workers or os.cpu_count() or 1, len(fight_log_jsons))
+    if workers <= 1:
+        return [read_fight_log_columns(fight_log_json) for fight_log_json in fight_log_jsons]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(read_fight_log_columns, fight_log_jsons))
+
+
+class FightDiff:
+    """
+        Compares two pulls by fight relative time (seconds since each log's startTime). Deltas are always
+        candidate - baseline, so a positive DPS delta means the candidate pull did more damage per second.
+
+    """
+    def __init__(self, baseline: CombatReporter, candidate: CombatReporter):
+        self.baseline: CombatReporter = baseline
+        self.candidate: CombatReporter = candidate
+
+        # Holds metric tables
+        self.player_deltas: pd.DataFrame = self._player_deltas()
+        self.ability_deltas: pd.DataFrame = self._ability_deltas()
+        self.rolling_dps_delta: pd.DataFrame = self._rolling_dps_delta()
+
+    @staticmethod
+    def _player_metrics(report: CombatReporter) -> pd.DataFrame:
+        breakdown = report.ability_breakdown_in_combat
+        per_attacker = breakdown.groupby("attacker")[["Hits", "Crits"]].sum() if not breakdown.empty else pd.DataFrame(columns=["Hits", "Crits"])
+        crit_rate = np.round(per_attacker["Crits"] / per_attacker["Hits"].replace(0, np.nan) * 100, 3)
+
+        return pd.DataFrame({
+            "DPS": pd.Series(report.player_dps_in_combat, dtype=float),
+            "HPS": pd.Series(report.player_hps_in_combat, dtype=float),
+            "Damage Taken": pd.Series(report.player_total_damage_taken_in_combat, dtype=float),
+            "Crit Rate (%)": crit_rate.astype(float),
+            f"Below {report.critical_hp_threshold:g}HP (s)": pd.Series(report.player_time_below_20_in_combat, dtype=float),
+        })
+
+    @staticmethod
+    def _side_by_side(baseline: pd.DataFrame, candidate: pd.DataFrame, index_names: list[str]) -> pd.DataFrame:
+        # One row per key in either pull: baseline, candidate and delta columns for every metric
+        baseline, candidate = baseline.align(candidate, join="outer")
+        columns = {}
+        for metric in baseline.columns:
+            columns[f"{metric} Baseline"] = baseline[metric]
+            columns[f"{metric} Candidate"] = candidate[metric]
+            columns[f"{metric} Delta"] = np.round(candidate[metric].fillna(0) - baseline[metric].fillna(0), 3)
+        table = pd.DataFrame(columns)
+        table.index.names = index_names
+        return table.reset_index()
+
+    def _player_deltas(self) -> pd.DataFrame:
+        table = self._side_by_side(self._player_metrics(self.baseline), self._player_metrics(self.candidate), ["player"])
+        return table.sort_values("DPS Delta", ascending=False, ignore_index=True)
+
+    def _ability_deltas(self) -> pd.DataFrame:
+        def ability_metrics(report: CombatReporter) -> pd.DataFrame:
+            breakdown = report.ability_breakdown_in_combat.set_index(["attacker", "attack"])
+            duration_s = max(report._fight_metadata.durationSec, 1)
+            return pd.DataFrame({
+                "Casts": breakdown["Casts"],
+                "DPS": np.round(breakdown["Damage"] / duration_s, 3),
+                "HPS": np.round(breakdown["Heal"] / duration_s, 3),
+                "Crit Rate (%)": breakdown["Crit Rate (%)"],
+                "Average Value": breakdown["Average Value"],
+            })
+
+        table = self._side_by_side(ability_metrics(self.baseline), ability_metrics(self.candidate), ["attacker", "attack"])
+        return table.sort_values("DPS Delta", ascending=False, ignore_index=True)
+
+    def _rolling_dps_delta(self) -> pd.DataFrame:
+        keys = ["Time (s)", "attacker", "Window (s)"]
+        baseline = self.baseline.rolling_dps_in_combat.set_index(keys)["DPS"]
+        candidate = self.candidate.rolling_dps_in_combat.set_index(keys)["DPS"]
+
+        # Only the time both pulls lasted is compared, a shorter pull would otherwise look like a DPS drop to 0
+        overlap_s = min(self.baseline.rolling_dps_in_combat["Time (s)"].max(), self.candidate.rolling_dps_in_combat["Time (s)"].max())
+        baseline, candidate = baseline.align(candidate, join="outer", fill_value=0)
+        delta = pd.DataFrame({"DPS Baseline": baseline, "DPS Candidate": candidate, "DPS Delta": np.round(candidate - baseline, 3)}).reset_index()
+        return delta[delta["Time (s)"] <= overlap_s].sort_values(["Window (s)", "attacker", "Time (s)"], ignore_index=True)
+
+    def plot_rolling_dps_delta(self):
+        players = set(self.baseline.player_total_damage_in_combat) | set(self.candidate.player_total_damage_in_combat)
+        df = self.rolling_dps_delta[self.rolling_dps_delta["attacker"].isin(players)]
+        fig = px.line(df, x="Time (s)", y="DPS Delta", color="attacker", facet_row="Window (s)", title="Rolling Window DPS Delta (Candidate - Baseline)")
+        return fig
+
+
+def compare_fight_logs(baseline_json: Path, candidate_json: Path) -> FightDiff:
+    baseline_columns, candidate_columns = load_fight_logs_concurrently([Path(baseline_json), Path(candidate_json)])
+    return FightDiff(CombatReporter(baseline_columns, show_plots=False), CombatReporter(candidate_columns, show_plots=False))
+
+
+if __name__ == '__main__':
+    baseline_location = Path(input("Enter Path to the baseline fight-log.json file: "))
+    candidate_location = Path(input("Enter Path to the fight-log.json file to compare against it: "))
+    for location in (baseline_location, candidate_location):
+        if not location.is_file() or not is_fight_log(location):
+            print(f"Invalid file: {location}")
+            exit()
+
+    start = time.perf_counter()
+    diff = compare_fight_logs(baseline_location, candidate_location)
+    print(f"FIGHT DIFF ({baseline_location.name} -> {candidate_location.name}, {time.perf_counter() - start:.2f}s)")
+    print("```````````````````````````````````````````````````````````````````````````````````````````````````````````")
+    print("Player Deltas")
+    print(diff.player_deltas.to_string(index=False))
+
+    print("\n")
+    print("```````````````````````````````````````````````````````````````````````````````````````````````````````````")
+    print("Ability Deltas")
+    print(diff.ability_deltas.to_string(index=False))
+
+    diff.plot_rolling_dps_delta().show()
@@ -0,0 +1,118 @@
+import gzip
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from combat_report.fight_log_columns import EventsArrayParser, find_fight_logs, has_events_array, open_fight_log, read_fight_log_columns, zstandard
+
+COMPRESSIONS: tuple[str, ...] = ("gz", "zst")
+
+
+def _open_compressed_writer(path: Path, compression: str, level: Optional[int]) -> BinaryIO:
+    if compression == "gz":
+        return gzip.open(path, "wb", compresslevel=9 if level is None else level)
+    if compression == "zst":
+        if zstandard is None:
+            raise ImportError("Writing .zst archives needs the zstandard package (pip install zstandard)")
+        return zstandard.ZstdCompressor(level=19 if level is None else level).stream_writer(open(path, "wb"), closefd=True)
+    raise ValueError(f"Unknown compression {compression}, expected one of {COMPRESSIONS}")
+
+
+def _write_ndjson(fight_log_json: Path, output: BinaryIO, chunk_size: int = 1 << 20):
+    # The metadata line is written as soon as the header is parsed, or at the end for logs that have it after the events
+    parser = EventsArrayParser()
+    metadata_written = False
+    with open_fight_log(fight_log_json) as f:
+        while chunk := f.read(chunk_size):
+            events = parser.feed(chunk)
+            if not metadata_written and parser.in_events_array and parser.metadata() is not None:
+                output.write((json.dumps({"metadata": parser.metadata()}, separators=(",", ":")) + "\n").encode("utf-8"))
+                metadata_written = True
+            output.write("".join(json.dumps(event, separators=(",", ":")) + "\n" for event in events).encode("utf-8"))
+    if not metadata_written:
+        output.write((json.dumps({"metadata": parser.metadata()}, separators=(",", ":")) + "\n").encode("utf-8"))
+
+
+def archive_fight_log(fight_log_json: Path, compression: str = "gz", level: Optional[int] = None, ndjson: bool = False) -> Path:
+    """
+        Compresses a plain fight log next to the original (fight-log.json -> fight-log.json.gz). With ndjson the events
+        are also rewritten one per line without the pretty printing (fight-log.ndjson.gz).
+
+    """
+    fight_log_json = Path(fight_log_json)
+    stem = fight_log_json.name[:-len(".json")]
+    archive = fight_log_json.with_name(f"{stem}{'.ndjson' if ndjson else '.json'}.{compression}")
+
+    with _open_compressed_writer(archive, compression, level) as output:
+        if ndjson:
+            _write_ndjson(fight_log_json, output)
+        else:
+            with open(fight_log_json, "rb") as f:
+                shutil.copyfileobj(f, output, 1 << 20)
+    return archive
+
+
+def archive_fight_logs(logs_dir: Path, compression: str = "gz", level: Optional[int] = None, ndjson: bool = False, remove_originals: bool = False) -> list[tuple[Path, Path]]:
+    """
+        Archives every plain .json fight log in logs_dir, other json files (no events array, dotfiles) are left alone.
+        An original is only removed after its archive was read back and has the same metadata and events, every column
+        compared.
+
+    """
+    archived = []
+    for fight_log_json in sorted(find_fight_logs(logs_dir)):
+        if not fight_log_json.name.endswith(".json") or not has_events_array(fight_log_json):
+            continue
+        archive = archive_fight_log(fight_log_json, compression, level, ndjson)
+        if remove_originals:
+            if not read_fight_log_columns(fight_log_json).same_events(read_fight_log_columns(archive)):
+                raise ValueError(f"{archive} doesn't hold the same events as {fight_log_json}, kept the original")
+            fight_log_json.unlink()
+        archived.append((fight_log_json, archive))
+    return archived
+
+
+def benchmark_compressed_ingest(fight_log_json: Path, repeats: int = 3):
+    """
+        Disk size and ingest time (best of repeats) of the fight log in every supported format.
+
+    """
+    fight_log_json = Path(fight_log_json)
+    with tempfile.TemporaryDirectory() as work_dir:
+        original = Path(work_dir) / fight_log_json.name
+        shutil.copyfile(fight_log_json, original)
+
+        formats = {"json": original}
+        for compression in COMPRESSIONS:
+            if compression == "zst" and zstandard is None:
+                print("zstandard is not installed, skipping .zst")
+                continue
+            formats[f"json.{compression}"] = archive_fight_log(original, compression)
+            formats[f"ndjson.{compression}"] = archive_fight_log(original, compression, ndjson=True)
+
+        original_size = original.stat().st_size
+        for format_name, path in formats.items():
+            ingest_s = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                read_fight_log_columns(path)
+                ingest_s.append(time.perf_counter() - start)
+            size = path.stat().st_size
+            print(f"{format_name:<11} {size / 1024:>9,.1f} KB ({original_size / size:5.1f}x smaller)  ingest {min(ingest_s):.3f}s")
+
+
+if __name__ == '__main__':
+    if input("Press 1 to archive the fight logs in a directory. Press anything else to benchmark the formats: ") == "1":
+        archive_directory: str | Path = input("Enter the directory holding the fight logs or press ENTER to use the default directory: ")
+        if not archive_directory:
+            archive_directory: Path = Path(__file__).parent
+
+        archive_compression = "zst" if zstandard is not None and input("Press 1 for zstd instead of gzip: ") == "1" else "gz"
+        delete_originals = input("Press 1 to delete the original .json files once their archive is verified: ") == "1"
+        for original_json, archived_json in archive_fight_logs(Path(archive_directory), archive_compression, remove_originals=delete_originals):
+            print(f"{original_json.name} -> {archived_json.name} ({archived_json.stat().st_size / 1024:,.1f} KB)")
+    else:
+        benchmark_compressed_ingest(Path(__file__).parent / "fight-log-1758484168170.json")
@@ -0,0 +1,373 @@
+import gzip
+import io
+import json
+import re
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, TextIO
+
+import numpy as np
+import pandas as pd
+
+from pydantic import ValidationError
+
+from combat_report.fight_log_models import Event, FightLog, Metadata
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+# Pretty printed json like the game writes it, or NDJSON (one json object per line, the metadata on its own line)
+JSON_SUFFIXES: tuple[str, ...] = (".json", ".json.gz", ".json.zst")
+NDJSON_SUFFIXES: tuple[str, ...] = (".ndjson", ".ndjson.gz", ".ndjson.zst")
+FIGHT_LOG_SUFFIXES: tuple[str, ...] = JSON_SUFFIXES + NDJSON_SUFFIXES
+
+
+class EventsArrayParser:
+    """
+        Incremental parser for the "events" array of a fight log. Text can be fed in arbitrary chunks and every call
+        returns the events that are complete so far. Partially received events stay buffered for the next chunk.
+        The text before and after the array is kept so the metadata can be read from it.
+
+    """
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer: str = ""
+        self.in_events_array: bool = False
+        self.events_finished: bool = False
+        self.header: str = ""
+        self.trailer: str = ""
+
+    def feed(self, text: str) -> list[dict]:
+        if self.events_finished:
+            self.trailer += text
+            return []
+
+        self._buffer += text
+        if not self.in_events_array and not self._find_events_array():
+            return []
+
+        new_events = []
+        position = 0
+        buffer_length = len(self._buffer)
+        while True:
+            # Skips whitespace and the commas between events
+            position = _SEPARATORS.match(self._buffer, position).end()
+            if position >= buffer_length:
+                break
+
+            if self._buffer[position] == "]":
+                self.events_finished = True
+                self.trailer = self._buffer[position + 1:]
+                position = buffer_length
+                break
+
+            try:
+                event, position = self._decoder.raw_decode(self._buffer, position)
+            except json.JSONDecodeError:
+                # Trailing record is only partially received
+                break
+            new_events.append(event)
+
+        self._buffer = self._buffer[position:]
+        return new_events
+
+    def _find_events_array(self) -> bool:
+        events_key = self._buffer.find('"events"')
+        if events_key == -1:
+            return False
+
+        array_start = self._buffer.find("[", events_key)
+        if array_start == -1:
+            return False
+
+        self.header = self._buffer[:events_key]
+        self._buffer = self._buffer[array_start + 1:]
+        self.in_events_array = True
+        return True
+
+    def metadata(self) -> Optional[dict]:
+        # Metadata is normally written before the events, but some writers put it after them
+        for text in (self.header, self.trailer):
+            metadata_key = text.find('"metadata"')
+            if metadata_key == -1:
+                continue
+            try:
+                metadata, _ = self._decoder.raw_decode(text, text.index("{", metadata_key))
+                return metadata
+            except (ValueError, json.JSONDecodeError):
+                continue
+        return None
+
+
+@dataclass
+class FightEventColumns:
+    """
+        Fight events as a struct of arrays. Strings are interned into small integer codes that index the name tables,
+        values use the narrowest dtype that fits them and missing Mana/Energy/attack are stored as -1.
+
+    """
+    metadata: Metadata
+    names: list[str]  # attacker and defender share one table
+    attacks: list[str]
+    directions: list[str]
+    effect_types: list[str]
+    results: list[str]
+
+    time_s: np.ndarray  # float64, seconds since metadata.startTime
+    direction: np.ndarray  # int8
+    attacker: np.ndarray  # int16
+    defender: np.ndarray  # int16
+    attack: np.ndarray  # int16, -1 when null
+    value: np.ndarray  # int32
+    effect_type: np.ndarray  # int8
+    result: np.ndarray  # int8
+    crit: np.ndarray  # bool
+    hp: np.ndarray  # int32
+    hpmax: np.ndarray  # int32
+    shield: np.ndarray  # float32
+    mana: np.ndarray  # int32, -1 when null
+    energy: np.ndarray  # int32, -1 when null
+
+    @property
+    def event_count(self) -> int:
+        return len(self.time_s)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, column).nbytes for column in _ARRAY_COLUMNS)
+
+    def same_events(self, other: "FightEventColumns") -> bool:
+        # Strings are interned in the order they first appear, so the same events give the same tables and codes
+        if self.metadata != other.metadata:
+            return False
+        if any(getattr(self, table) != getattr(other, table) for table in ("names", "attacks", "directions", "effect_types", "results")):
+            return False
+        return all(np.array_equal(getattr(self, column), getattr(other, column)) for column in _ARRAY_COLUMNS)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+            Events df with categorical string columns (only the codes are stored per row), using the same column
+            names as the json so the rest of the reporter can keep reading it like before.
+
+        """
+        def categorical(codes: np.ndarray, table: list[str]) -> pd.Categorical:
+            return pd.Categorical.from_codes(codes, categories=pd.Index(table, dtype=object))
+
+        players = pd.Index(self.names, dtype=object)
+        return pd.DataFrame({
+            "Time (s)": self.time_s,
+            "direction": categorical(self.direction, self.directions),
+            "attacker": pd.Categorical.from_codes(self.attacker, categories=players),
+            "defender": pd.Categorical.from_codes(self.defender, categories=players),
+            "attack": categorical(self.attack, self.attacks),
+            "value": self.value,
+            "effectType": categorical(self.effect_type, self.effect_types),
+            "result": categorical(self.result, self.results),
+            "crit": self.crit,
+            "HP": self.hp,
+            "HPmax": self.hpmax,
+            "Shield": self.shield,
+            "Mana": self.mana,
+            "Energy": self.energy,
+        }, copy=False)
+
+
+_ARRAY_COLUMNS = ("time_s", "direction", "attacker", "defender", "attack", "value", "effect_type", "result", "crit", "hp", "hpmax", "shield", "mana", "energy")
+# What _ColumnBuilder stores every column as, timestamp becomes time_s once the log's startTime is known
+_CHUNK_DTYPES = {
+    "timestamp": np.int64, "direction": np.int8, "attacker": np.int16, "defender": np.int16, "attack": np.int16, "value": np.int32,
+    "effect_type": np.int8, "result": np.int8, "crit": bool, "hp": np.int32, "hpmax": np.int32, "shield": np.float32, "mana": np.int32,
+    "energy": np.int32,
+}
+
+
+@dataclass
+class _ColumnBuilder:
+    """Interns and converts events chunk by chunk so the parsed dicts never pile up for the whole log."""
+    source: str = ""  # the log, for error messages
+    event_count: int = 0
+    names: dict[str, int] = field(default_factory=dict)
+    attacks: dict[str, int] = field(default_factory=dict)
+    directions: dict[str, int] = field(default_factory=dict)
+    effect_types: dict[str, int] = field(default_factory=dict)
+    results: dict[str, int] = field(default_factory=dict)
+    chunks: dict[str, list[np.ndarray]] = field(default_factory=lambda: {column: [] for column in _CHUNK_DTYPES})
+
+    def extend(self, events: list[dict]):
+        if not events:
+            return
+
+        try:
+            chunk = self._chunk(events)
+        except (KeyError, TypeError):
+            # Events are only checked against the Event schema when the fast path fails, to name the broken field
+            for index, event in enumerate(events):
+                try:
+                    Event.model_validate(event)
+                except ValidationError as error:
+                    fields = ", ".join(".".join(map(str, detail["loc"])) or "event" for detail in error.errors())
+                    raise ValueError(f"{self.source}: event {self.event_count + index} has a missing or invalid {fields}") from error
+            raise
+        for column, values in chunk.items():
+            self.chunks[column].append(np.array(values, dtype=_CHUNK_DTYPES[column]))
+        self.event_count += len(events)
+
+    def _chunk(self, events: list[dict]) -> dict[str, list]:
+        names, attacks = self.names, self.attacks
+        resources = [event["resources"] for event in events]
+        return {
+            "timestamp": [event["timestamp"] for event in events],
+            "direction": [self.directions.setdefault(event["direction"], len(self.directions)) for event in events],
+            "attacker": [names.setdefault(event["attacker"], len(names)) for event in events],
+            "defender": [names.setdefault(event["defender"], len(names)) for event in events],
+            "attack": [-1 if event["attack"] is None else attacks.setdefault(event["attack"], len(attacks)) for event in events],
+            "value": [event["value"] for event in events],
+            "effect_type": [self.effect_types.setdefault(event["effectType"], len(self.effect_types)) for event in events],
+            "result": [self.results.setdefault(event["result"], len(self.results)) for event in events],
+            "crit": [event["crit"] for event in events],
+            "hp": [resource["HP"] for resource in resources],
+            "hpmax": [resource["HPmax"] for resource in resources],
+            "shield": [resource["Shield"] for resource in resources],
+            "mana": [-1 if resource["Mana"] is None else resource["Mana"] for resource in resources],
+            "energy": [-1 if resource["Energy"] is None else resource["Energy"] for resource in resources],
+        }
+
+    def build(self, metadata: Metadata) -> FightEventColumns:
+        arrays = {column: np.concatenate(chunks) if chunks else np.empty(0, dtype=_CHUNK_DTYPES[column]) for column, chunks in self.chunks.items()}
+        timestamps = arrays.pop("timestamp")
+        return FightEventColumns(
+            metadata=metadata,
+            names=list(self.names),
+            attacks=list(self.attacks),
+            directions=list(self.directions),
+            effect_types=list(self.effect_types),
+            results=list(self.results),
+            time_s=(timestamps - metadata.startTime) / 1000,
+            **arrays,
+        )
+
+
+def is_fight_log(path: Path) -> bool:
+    # Dotfiles are caches and editor files, never logs
+    name = Path(path).name
+    return name.endswith(FIGHT_LOG_SUFFIXES) and not name.startswith(".")
+
+
+def has_events_array(fight_log_json: Path, peek_size: int = 1 << 16) -> bool:
+    # Cheap check for other json in a logs directory: a fight log opens its events array near the start of the file
+    parser = EventsArrayParser()
+    with open_fight_log(fight_log_json) as f:
+        parser.feed(f.read(peek_size))
+    return parser.in_events_array
+
+
+def find_fight_logs(logs_dir: Path) -> list[Path]:
+    return [path for path in Path(logs_dir).iterdir() if path.is_file() and is_fight_log(path)]
+
+
+def open_fight_log(fight_log_json: Path) -> TextIO:
+    """
+        Text stream over a plain, gzip or zstd compressed fight log. Compressed logs are decompressed as they are read,
+        there is never an uncompressed copy on disk or in memory.
+
+    """
+    name = Path(fight_log_json).name
+    if name.endswith(".gz"):
+        return gzip.open(fight_log_json, "rt", encoding="utf-8")
+    if name.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError(f"Reading {name} needs the zstandard package (pip install zstandard)")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(fight_log_json, "rb"), closefd=True), encoding="utf-8")
+    return open(fight_log_json, encoding="utf-8")
+
+
+def read_fight_log_columns(fight_log_json: Path, chunk_size: int = 1 << 20) -> FightEventColumns:
+    """
+        Streams the fight log into FightEventColumns. The file is read in chunks and every chunk's events are interned
+        straight away, so the whole log never exists as python objects at the same time.
+        Accepts every suffix in FIGHT_LOG_SUFFIXES.
+
+    """
+    if Path(fight_log_json).name.endswith(NDJSON_SUFFIXES):
+        return _read_ndjson_columns(fight_log_json)
+
+    parser = EventsArrayParser()
+    builder = _ColumnBuilder(source=str(fight_log_json))
+    with open_fight_log(fight_log_json) as f:
+        while chunk := f.read(chunk_size):
+            builder.extend(parser.feed(chunk))
+
+    if not parser.events_finished:
+        raise ValueError(f"{fight_log_json} has no complete events array")
+
+    metadata = parser.metadata()
+    if metadata is None:
+        raise ValueError(f"{fight_log_json} has no metadata")
+    return builder.build(Metadata(**metadata))
+
+
+def _read_ndjson_columns(fight_log_ndjson: Path, batch_lines: int = 50_000) -> FightEventColumns:
+    # Every line is either {"metadata": {...}} or one event
+    builder = _ColumnBuilder(source=str(fight_log_ndjson))
+    metadata = None
+    events = []
+    with open_fight_log(fight_log_ndjson) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "metadata" in record:
+                metadata = record["metadata"]
+                continue
+            events.append(record)
+            if len(events) == batch_lines:
+                builder.extend(events)
+                events = []
+    builder.extend(events)
+
+    if metadata is None:
+        raise ValueError(f"{fight_log_ndjson} has no metadata line")
+    return builder.build(Metadata(**metadata))
+
+
+def benchmark_event_memory(fight_log_json: Path):
+    """
+        Bytes per event kept alive by the old reporter (pydantic events + DataFrame of dicts) and by FightEventColumns.
+
+    """
+    tracemalloc.start()
+
+    start = time.perf_counter()
+    with open(fight_log_json) as f:
+        data = json.load(f)
+    fight_events = FightLog(**data).events
+    events_df = pd.DataFrame(data["events"])
+    del data
+    before_s = time.perf_counter() - start
+    before_bytes, _ = tracemalloc.get_traced_memory()
+    event_count = len(fight_events)
+    del fight_events, events_df
+
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    columns = read_fight_log_columns(fight_log_json)
+    events_df = columns.to_frame()
+    after_s = time.perf_counter() - start
+    after_bytes = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    print(f"{fight_log_json.name}: {event_count:,} events")
+    print(f"Before (pydantic events + dict DataFrame): {before_bytes / event_count:,.0f} bytes/event, load {before_s:.3f}s")
+    print(f"After (interned columns + categorical DataFrame): {after_bytes / event_count:,.0f} bytes/event, load {after_s:.3f}s")
+    print(f"Raw column arrays: {columns.nbytes / event_count:.0f} bytes/event, DataFrame: {events_df.memory_usage(deep=True).sum() / event_count:.0f} bytes/event")
+
+
+if __name__ == '__main__':
+    benchmark_event_memory(Path(__file__).parent / "fight-log-1758484168170.json")
@@ -0,0 +1,206 @@
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from combat_report.fight_log_models import Metadata
+
+# Enough room for the metadata object with 64 bit numbers in every field, it is written last over this placeholder
+_METADATA_WIDTH = 256
+
+_EVENT_TEMPLATE = (
+    '{{"timestamp": {timestamp}, "direction": {direction}, "attacker": {attacker}, "defender": {defender}, '
+    '"attack": {attack}, "value": {value}, "effectType": {effect_type}, "result": {result}, "crit": {crit}, '
+    '"resources": {{"HP": {hp}, "HPmax": {hpmax}, "Shield": 0, "Mana": {mana}, "Energy": {energy}}}}}'
+)
+
+
+@dataclass
+class SyntheticFightSpec:
+    """
+        Settings for a generated fight log. The first player is the one who recorded the log, so the event directions
+        and the metadata totals are from their point of view like in a real log.
+
+    """
+    players: tuple[str, ...] = ("poolgoes", "BLOCKYBOY", "Mordkaiser", "ultravile", "kreaamy")
+    bosses: tuple[str, ...] = ("Serezith Brakrud", "Sedulus Rane")
+    duration_s: float = 600
+    events_per_s: float = 12.7
+    heal_fraction: float = 0.18  # player -> player heals
+    boss_attack_fraction: float = 0.05  # boss -> player damage, everything else is player -> boss damage
+    miss_fraction: float = 0.01
+    crit_fraction: float = 0.1
+    null_attack_fraction: float = 0.05
+    abilities_per_attacker: int = 4
+    player_hpmax: int = 4000
+    boss_hpmax: int = 515000
+    # Mana/Energy of the player who recorded the log, on every row like in a real log. None writes null
+    energy_regen: float | None = None  # per second, regenerated once a second
+    mana_regen: float | None = None
+    energy_max: int = 100
+    mana_max: int = 400
+    energy_cost: int = 10  # spent by every attack of the recording player that they can afford
+    mana_cost: int = 25
+    seed: int = 0
+    start_time: int = 1758483591047
+
+    @classmethod
+    def for_event_count(cls, event_count: int, **settings) -> "SyntheticFightSpec":
+        events_per_s = settings.pop("events_per_s", cls.events_per_s)
+        return cls(duration_s=event_count / events_per_s, events_per_s=events_per_s, **settings)
+
+    @property
+    def event_count(self) -> int:
+        return int(round(self.duration_s * self.events_per_s))
+
+
+class _FightState:
+    """Everything that has to carry over from one chunk of events to the next."""
+    def __init__(self, spec: SyntheticFightSpec, rng: np.random.Generator):
+        self.actors: list[str] = list(spec.players) + list(spec.bosses)
+        self.player_count: int = len(spec.players)
+        self.hpmax: list[int] = [spec.player_hpmax] * len(spec.players) + [spec.boss_hpmax] * len(spec.bosses)
+        self.hp: list[int] = list(self.hpmax)
+        self.clock_ms: float = float(spec.start_time)
+
+        # Recording player's resources, regenerated on every whole second of the fight
+        self.energy: float = float(spec.energy_max)
+        self.mana: float = float(spec.mana_max)
+        self.next_regen_ms: int = spec.start_time + 1000
+
+        # Every actor hits/heals for their own base amount so the per player metrics differ
+        self.base_damage: np.ndarray = np.concatenate((rng.integers(60, 400, len(spec.players)), rng.integers(150, 600, len(spec.bosses))))
+        self.base_heal: np.ndarray = rng.integers(10, 250, len(self.actors))
+
+        # Names are json encoded once, the writer only pastes them
+        self.actor_json: list[str] = [json.dumps(actor) for actor in self.actors]
+        self.attack_json: list[str] = [json.dumps(f"Skill#{ability}") for ability in range(spec.abilities_per_attacker)] + ["null"]
+        self.direction_json: dict[str, str] = {direction: json.dumps(direction) for direction in ("Outgoing", "Incoming", "Other")}
+
+        self.total_damage_done: int = 0
+        self.total_damage_taken: int = 0
+
+
+def _chunk_text(spec: SyntheticFightSpec, state: _FightState, rng: np.random.Generator, event_count: int) -> str:
+    # All random draws for the chunk are vectorized, only the HP bookkeeping and formatting walk the events
+    players = state.player_count
+    bosses = len(spec.bosses)
+    kind = rng.random(event_count)
+    is_heal = kind < spec.heal_fraction
+    is_boss_attack = ~is_heal & (kind < spec.heal_fraction + spec.boss_attack_fraction)
+    is_player_attack = ~is_heal & ~is_boss_attack
+
+    attacker = np.where(is_boss_attack, players + rng.integers(0, bosses, event_count), rng.integers(0, players, event_count))
+    defender = np.where(is_player_attack, players + rng.integers(0, bosses, event_count), rng.integers(0, players, event_count))
+    is_miss = ~is_heal & (rng.random(event_count) < spec.miss_fraction)
+    is_crit = ~is_miss & (rng.random(event_count) < spec.crit_fraction)
+
+    spread = rng.uniform(0.8, 1.2, event_count)
+    value = np.where(is_heal, state.base_heal[attacker], state.base_damage[attacker]) * spread
+    value = np.where(is_crit, value * 1.5, value).astype(np.int64)
+    value[is_miss] = 0
+
+    attack = rng.integers(0, spec.abilities_per_attacker, event_count)
+    attack[rng.random(event_count) < spec.null_attack_fraction] = spec.abilities_per_attacker
+
+    # Poisson arrivals at events_per_s
+    timestamps = state.clock_ms + np.cumsum(rng.exponential(1000 / spec.events_per_s, event_count))
+    state.clock_ms = float(timestamps[-1])
+    timestamps = timestamps.astype(np.int64)
+
+    hp, hpmax = state.hp, state.hpmax
+    actor_json, attack_json, direction_json = state.actor_json, state.attack_json, state.direction_json
+    lines = []
+    for index in range(event_count):
+        source, target = int(attacker[index]), int(defender[index])
+        amount = int(value[index])
+        while timestamps[index] >= state.next_regen_ms:
+            state.energy = min(state.energy + (spec.energy_regen or 0), spec.energy_max)
+            state.mana = min(state.mana + (spec.mana_regen or 0), spec.mana_max)
+            state.next_regen_ms += 1000
+        if source == 0 and not is_heal[index]:
+            if state.energy >= spec.energy_cost:
+                state.energy -= spec.energy_cost
+            if state.mana >= spec.mana_cost:
+                state.mana -= spec.mana_cost
+        if is_heal[index]:
+            # The game only logs the part of a heal that landed
+            amount = min(amount, hpmax[target] - hp[target])
+            hp[target] += amount
+            effect_type, result = '"Heal"', '"Heal"'
+        elif is_miss[index]:
+            effect_type, result = '"None"', '"Miss"'
+        else:
+            # A boss that died is pulled again at full HP
+            if target >= players and hp[target] == 0:
+                hp[target] = hpmax[target]
+            hp[target] = max(hp[target] - amount, 0)
+            effect_type, result = '"Damage"', '"Hit"'
+            if source == 0:
+                state.total_damage_done += amount
+            if target == 0:
+                state.total_damage_taken += amount
+
+        direction = "Outgoing" if source == 0 else "Incoming" if target == 0 else "Other"
+        lines.append(_EVENT_TEMPLATE.format(
+            timestamp=timestamps[index], direction=direction_json[direction], attacker=actor_json[source], defender=actor_json[target],
+            attack=attack_json[attack[index]], value=amount, effect_type=effect_type, result=result,
+            crit="true" if is_crit[index] else "false", hp=hp[target], hpmax=hpmax[target],
+            mana="null" if spec.mana_regen is None else int(state.mana), energy="null" if spec.energy_regen is None else int(state.energy)))
+    return ",\n    ".join(lines)
+
+
+def write_synthetic_fight_log(fight_log_json: Path, spec: SyntheticFightSpec, chunk_events: int = 100_000) -> Metadata:
+    """
+        Writes a fight log matching the FightLog schema, chunk by chunk so even 50M event logs never sit in memory.
+        The same spec (including the seed) and chunk_events always write the same file, the random draws are made a
+        chunk at a time so another chunk_events gives another fight.
+
+    """
+    rng = np.random.default_rng(spec.seed)
+    state = _FightState(spec, rng)
+    remaining = spec.event_count
+
+    with open(fight_log_json, "w", encoding="utf-8") as f:
+        # Totals are only known at the end, the metadata is written over a fixed width placeholder afterwards
+        f.write('{\n  "metadata": ')
+        metadata_position = f.tell()
+        f.write(" " * _METADATA_WIDTH + ',\n  "events": [\n    ')
+
+        first_chunk = True
+        while remaining > 0:
+            event_count = min(chunk_events, remaining)
+            if not first_chunk:
+                f.write(",\n    ")
+            f.write(_chunk_text(spec, state, rng, event_count))
+            first_chunk = False
+            remaining -= event_count
+        f.write("\n  ]\n}\n")
+
+        end_time = int(state.clock_ms) if spec.event_count else spec.start_time
+        metadata = Metadata(
+            startTime=spec.start_time,
+            endTime=end_time,
+            durationSec=round((end_time - spec.start_time) / 1000),
+            totalDamageDone=state.total_damage_done,
+            totalDamageTaken=state.total_damage_taken,
+            eventCount=spec.event_count,
+        )
+        f.seek(metadata_position)
+        f.write(json.dumps(metadata.model_dump()).ljust(_METADATA_WIDTH))
+    return metadata
+
+
+if __name__ == '__main__':
+    requested_events = input("Enter the number of events to generate or press ENTER for 100000: ")
+    output_location: str | Path = input("Enter the output path or press ENTER to write synthetic-fight-log.json next to this script: ")
+    if not output_location:
+        output_location: Path = Path(__file__).parent / "synthetic-fight-log.json"
+
+    fight_spec = SyntheticFightSpec.for_event_count(int(requested_events or 100_000))
+    start = time.perf_counter()
+    written_metadata = write_synthetic_fight_log(Path(output_location), fight_spec)
+    print(f"Wrote {written_metadata.eventCount:,} events ({written_metadata.durationSec}s fight) to {output_location} "
+          f"in {time.perf_counter() - start:.2f}s")
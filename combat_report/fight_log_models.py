@@ -0,0 +1,38 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class Metadata(BaseModel):
+    startTime: int
+    endTime: int
+    durationSec: int
+    totalDamageDone: int
+    totalDamageTaken: int
+    eventCount: int
+
+
+class Resources(BaseModel):
+    HP: int
+    HPmax: int
+    Shield: float
+    Mana: Optional[int]
+    Energy: Optional[int]
+
+
+class Event(BaseModel):
+    timestamp: int
+    direction: str
+    attacker: str
+    defender: str
+    attack: Optional[str]  # sometimes null
+    value: int
+    effectType: str
+    result: str
+    crit: bool
+    resources: Resources
+
+
+class FightLog(BaseModel):
+    metadata: Metadata
+    events: List[Event]
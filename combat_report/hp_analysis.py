@@ -0,0 +1,248 @@
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from combat_report.fight_log_columns import read_fight_log_columns
+
+
+@dataclass
+class HpThreshold:
+    name: str
+    value: float
+    is_percent: bool = False  # True means value is a % of HPmax instead of an absolute HP amount
+
+
+def default_hp_thresholds(critical_hp_threshold: float = 1100) -> list[HpThreshold]:
+    thresholds = [HpThreshold(name=f"Below {critical_hp_threshold:g}HP", value=critical_hp_threshold)]
+    thresholds += [HpThreshold(name=f"Below {percent}%HP", value=percent, is_percent=True) for percent in range(10, 100, 10)]
+    return thresholds
+
+
+class HpTimeline:
+    """
+        Each defender's HP timeline rebuilt from the resources.HP/HPmax columns in one vectorized pass.
+
+        Events are sorted by (defender, time) once. resources.HP is the defender's HP after the event, so the HP before an
+        event is the defender's previous HP (for their first event it is worked back from the event's own value).
+
+    """
+    def __init__(self, events_df: pd.DataFrame):
+        hp = events_df["HP"].to_numpy(dtype=np.float64)
+        hpmax = events_df["HPmax"].to_numpy(dtype=np.float64)
+
+        # Events without an HPmax don't say anything about the defender's HP
+        has_hp = hpmax > 0
+        defender_codes, defender_names = pd.factorize(events_df["defender"].array[has_hp])
+        time_s = events_df["Time (s)"].to_numpy(dtype=np.float64)[has_hp]
+
+        order = np.lexsort((time_s, defender_codes))
+        self.defender_names: list[str] = list(defender_names)
+        self.defender_codes: np.ndarray = defender_codes[order]
+        self.time_s: np.ndarray = time_s[order]
+        self.hp: np.ndarray = hp[has_hp][order]
+        self.hpmax: np.ndarray = hpmax[has_hp][order]
+        self.attacker = events_df["attacker"].array[has_hp][order]
+        self.is_heal: np.ndarray = (events_df["effectType"] == "Heal").to_numpy()[has_hp][order]
+        self.is_damage: np.ndarray = (events_df["effectType"] == "Damage").to_numpy()[has_hp][order]
+        self.value: np.ndarray = events_df["value"].to_numpy(dtype=np.float64)[has_hp][order]
+
+        self.same_defender_next: np.ndarray = np.zeros(len(self.time_s), dtype=bool)
+        self.same_defender_next[:-1] = self.defender_codes[1:] == self.defender_codes[:-1]
+        same_defender_previous = np.zeros(len(self.time_s), dtype=bool)
+        same_defender_previous[1:] = self.same_defender_next[:-1]
+
+        # First event of a defender: undo the event itself to get the HP before it
+        first_hp_before = np.where(self.is_heal, np.maximum(self.hp - self.value, 0), np.where(self.is_damage, np.minimum(self.hp + self.value, self.hpmax), self.hp))
+        self.hp_before: np.ndarray = first_hp_before
+        self.hp_before[1:] = np.where(same_defender_previous[1:], self.hp[:-1], first_hp_before[1:])
+
+    @property
+    def empty(self) -> bool:
+        return len(self.time_s) == 0
+
+    def hp_at_end(self) -> dict[str, float]:
+        last_rows = np.nonzero(~self.same_defender_next)[0]
+        hp_at_end = {self.defender_names[code]: int(hp) for code, hp in zip(self.defender_codes[last_rows], self.hp[last_rows])}
+        return dict(sorted(hp_at_end.items(), key=lambda item: item[1], reverse=True))
+
+    def heal_breakdown(self) -> pd.DataFrame:
+        """
+            Effective heal and overheal per healer/target pair.
+            A heal can only overheal when it left the target at HPmax, and then only the part above the missing HP
+            (HPmax - HP before) is overheal. Heals that leave the target at 0 HP (dead) are all overheal.
+
+        """
+        heal_rows = self.is_heal
+        value = self.value[heal_rows]
+        hp_after = self.hp[heal_rows]
+        hpmax = self.hpmax[heal_rows]
+        missing_hp = np.clip(hpmax - self.hp_before[heal_rows], 0, None)
+
+        effective = np.where(hp_after >= hpmax, np.minimum(value, missing_hp), value)
+        effective = np.where(hp_after <= 0, 0, effective)
+
+        breakdown = pd.DataFrame({
+            "healer": np.asarray(self.attacker[heal_rows], dtype=object),
+            "target": np.asarray(self.defender_names, dtype=object)[self.defender_codes[heal_rows]],
+            "Heal": value,
+            "Effective Heal": effective,
+            "Overheal": value - effective,
+        }).groupby(["healer", "target"], sort=False).sum().reset_index()
+        breakdown["Overheal (%)"] = np.round(breakdown["Overheal"] / breakdown["Heal"].replace(0, np.nan) * 100, 3)
+        return breakdown.sort_values("Heal", ascending=False, ignore_index=True)
+
+
+class HpIntervalAnalysis:
+    """
+        Run length encoded HP state intervals per defender for many thresholds at once.
+
+        Every event gives the defender's HP after the hit/heal, and that HP is held until the defender's next event (or
+        the end of the fight). Works on the (defender, time) sorted HpTimeline and every state is a column of one boolean
+        matrix, so adding thresholds only adds columns to the same vectorized pass.
+
+        States:
+            - One column per HpThreshold: alive and HP below the threshold
+            - "Full HP": HP >= HPmax
+            - "Dead": HP == 0
+
+    """
+    full_hp_state: str = "Full HP"
+    dead_state: str = "Dead"
+
+    def __init__(self, timeline: HpTimeline, fight_duration_s: float, thresholds: list[HpThreshold], near_death_percent: float = 20):
+        self.thresholds: list[HpThreshold] = thresholds
+        self.near_death_percent: float = near_death_percent
+        self.state_names: list[str] = [threshold.name for threshold in thresholds] + [self.full_hp_state, self.dead_state]
+
+        # Holds metric tables
+        self.hp_state_intervals: pd.DataFrame = pd.DataFrame(columns=["defender", "state", "Start (s)", "End (s)", "Duration (s)"])
+        self.hp_state_summary: pd.DataFrame = pd.DataFrame(columns=["defender", "state", "Time (s)", "Episodes", "Longest (s)"])
+        self.player_near_death_events_in_combat: dict[str, int] = {}
+        self.player_deaths_in_combat: dict[str, int] = {}
+
+        if timeline.empty:
+            return
+
+        self._timeline: HpTimeline = timeline
+        self._defender_names: list[str] = timeline.defender_names
+        self._set_intervals(fight_duration_s)
+
+    def _state_matrix(self, hp: np.ndarray, hpmax: np.ndarray) -> np.ndarray:
+        alive = hp > 0
+        limits = np.empty((len(hp), len(self.thresholds)))
+        for column, threshold in enumerate(self.thresholds):
+            limits[:, column] = hpmax * (threshold.value / 100) if threshold.is_percent else threshold.value
+
+        states = np.empty((len(hp), len(self.state_names)), dtype=bool)
+        np.less(hp[:, None], limits, out=states[:, :len(self.thresholds)])
+        states[:, :len(self.thresholds)] &= alive[:, None]
+        states[:, -2] = hp >= hpmax
+        states[:, -1] = ~alive
+        return states
+
+    def _set_intervals(self, fight_duration_s: float):
+        time_s = self._timeline.time_s
+        defender_codes = self._timeline.defender_codes
+        same_defender_next = self._timeline.same_defender_next
+        states = self._state_matrix(self._timeline.hp, self._timeline.hpmax)
+
+        # Each HP value is held until the defender's next event, the last one until the end of the fight
+        held_until = np.full(len(time_s), max(fight_duration_s, time_s.max()), dtype=np.float64)
+        held_until[:-1] = np.where(same_defender_next[:-1], time_s[1:], held_until[:-1])
+
+        # Run boundaries: a run starts where the state turns on (or a new defender starts) and ends where it turns off
+        previous_states = np.zeros_like(states)
+        previous_states[1:] = states[:-1] & same_defender_next[:-1, None]
+        next_states = np.zeros_like(states)
+        next_states[:-1] = states[1:] & same_defender_next[:-1, None]
+        run_starts = states & ~previous_states
+        run_ends = states & ~next_states
+
+        # Transposed nonzero walks one state column at a time, so the n-th start and n-th end belong to the same run
+        start_states, start_rows = np.nonzero(run_starts.T)
+        _, end_rows = np.nonzero(run_ends.T)
+        start_time = time_s[start_rows]
+        end_time = held_until[end_rows]
+
+        self.hp_state_intervals = pd.DataFrame({
+            "defender": np.asarray(self._defender_names, dtype=object)[defender_codes[start_rows]],
+            "state": np.asarray(self.state_names, dtype=object)[start_states],
+            "Start (s)": np.round(start_time, 3),
+            "End (s)": np.round(end_time, 3),
+            "Duration (s)": np.round(end_time - start_time, 3),
+        })
+
+        self.hp_state_summary = (
+            self.hp_state_intervals.groupby(["defender", "state"], sort=False)["Duration (s)"]
+            .agg(**{"Time (s)": "sum", "Episodes": "count", "Longest (s)": "max"})
+            .round(3)
+            .reset_index()
+        )
+
+        self._set_near_death_events(defender_codes, states, run_ends, same_defender_next)
+
+    def _set_near_death_events(self, defender_codes: np.ndarray, states: np.ndarray, run_ends: np.ndarray, same_defender_next: np.ndarray):
+        dead_column = len(self.state_names) - 1
+        near_death_column = next(
+            (column for column, threshold in enumerate(self.thresholds) if threshold.is_percent and threshold.value == self.near_death_percent), None)
+
+        # Deaths are runs of the dead state
+        death_rows = np.nonzero(run_ends[:, dead_column])[0]
+        self.player_deaths_in_combat = self._count_per_defender(defender_codes[death_rows])
+
+        if near_death_column is None:
+            return
+
+        # A near death event is a run below near_death_percent that the player survived (next event isn't a death)
+        rows = np.nonzero(run_ends[:, near_death_column])[0]
+        died_after = np.zeros(len(rows), dtype=bool)
+        has_next = rows + 1 < len(defender_codes)
+        died_after[has_next] = same_defender_next[rows[has_next]] & states[rows[has_next] + 1, dead_column]
+        self.player_near_death_events_in_combat = self._count_per_defender(defender_codes[rows[~died_after]])
+
+    def _count_per_defender(self, codes: np.ndarray) -> dict[str, int]:
+        counts = np.bincount(codes, minlength=len(self._defender_names))
+        per_defender = {name: int(count) for name, count in zip(self._defender_names, counts) if count > 0}
+        return dict(sorted(per_defender.items(), key=lambda item: item[1], reverse=True))
+
+    def time_in_state(self, state: str) -> dict[str, float]:
+        summary = self.hp_state_summary[self.hp_state_summary["state"] == state]
+        time_per_defender = dict(zip(summary["defender"], summary["Time (s)"].astype(float)))
+        return dict(sorted(time_per_defender.items(), key=lambda item: item[1], reverse=True))
+
+
+def benchmark_hp_reconstruction(fight_log_json: Path, copies: tuple[int, ...] = (1, 10, 100)):
+    """
+        Times the HP timeline, heal breakdown and interval stages on the fight log and on the log repeated back to back,
+        to check the stages grow linearly with the event count.
+
+    """
+    fight_log_columns = read_fight_log_columns(fight_log_json)
+    events_df = fight_log_columns.to_frame()
+    duration_s = fight_log_columns.metadata.durationSec
+
+    for copy_count in copies:
+        repeated_df = pd.concat([events_df] * copy_count, ignore_index=True)
+        repeated_df["Time (s)"] = repeated_df["Time (s)"].to_numpy() + np.repeat(np.arange(copy_count) * duration_s, len(events_df))
+
+        start = time.perf_counter()
+        timeline = HpTimeline(repeated_df)
+        timeline_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        timeline.heal_breakdown()
+        heal_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        HpIntervalAnalysis(timeline, duration_s * copy_count, default_hp_thresholds())
+        intervals_s = time.perf_counter() - start
+
+        print(f"{len(repeated_df):>10,} events: timeline {timeline_s * 1000:.1f}ms, heal breakdown {heal_s * 1000:.1f}ms, "
+              f"intervals {intervals_s * 1000:.1f}ms ({(timeline_s + heal_s + intervals_s) / len(repeated_df) * 1e6:.2f}us/event)")
+
+
+if __name__ == '__main__':
+    benchmark_hp_reconstruction(Path(__file__).parent / "fight-log-1758484168170.json")
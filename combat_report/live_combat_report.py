@@ -0,0 +1,225 @@
+import codecs
+import time
+from pathlib import Path
+from typing import Optional
+
+from combat_report.fight_log_columns import EventsArrayParser
+
+
+class FightLogTailer:
+    """
+        Reads a fight log that is still being written. Every poll only reads the bytes appended since the last poll
+        and returns the events that are complete. A partially written trailing record stays in the parser's buffer
+        until the rest of it lands on disk.
+
+    """
+    def __init__(self, fight_log_json: Path):
+        self._fight_log_json: Path = Path(fight_log_json)
+        self._reset()
+
+    def _reset(self):
+        self._offset: int = 0
+        self._utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._parser: EventsArrayParser = EventsArrayParser()
+        self.start_time: Optional[int] = None
+        self.file_restarted: bool = False
+
+    @property
+    def events_finished(self) -> bool:
+        return self._parser.events_finished
+
+    def poll(self) -> list[dict]:
+        if not self._fight_log_json.is_file():
+            return []
+
+        # A smaller file means the game started a new log in the same place, so everything read so far is stale
+        if self._fight_log_json.stat().st_size < self._offset:
+            self._reset()
+            self.file_restarted = True
+
+        with open(self._fight_log_json, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        self._offset += len(chunk)
+
+        # Incremental decoder keeps multibyte characters that were cut in half for the next poll
+        new_events = self._parser.feed(self._utf8_decoder.decode(chunk))
+
+        if self.start_time is None and self._parser.in_events_array:
+            # Metadata is written before the events so the real fight start time can be taken from it when it is there
+            metadata = self._parser.metadata()
+            if metadata is not None and "startTime" in metadata:
+                self.start_time = metadata["startTime"]
+            elif new_events:
+                self.start_time = new_events[0]["timestamp"]
+        return new_events
+
+
+class LiveCombatMetrics:
+    """
+        Same metrics as CombatReporter but updated one event at a time, so each poll costs O(new events).
+        Sorting only happens when the table is rendered.
+
+    """
+    def __init__(self, critical_hp_threshold: float = 1100):
+        # Holds metric info
+        self.player_total_heal_in_combat: dict[str, float] = {}
+        self.player_total_damage_in_combat: dict[str, float] = {}
+        self.player_highest_heal_in_combat: dict[str, float] = {}
+        self.player_highest_damage_in_combat: dict[str, float] = {}
+        self.player_total_damage_taken_in_combat: dict[str, float] = {}
+        self.player_time_below_20_in_combat: dict[str, float] = {}
+
+        # Used to calculate some metrics
+        self.last_hp_below_critical_threshold: dict[str, float] = {}
+        self.event_count: int = 0
+        self.start_time: Optional[int] = None
+        self.last_timestamp: Optional[int] = None
+
+        # Constants
+        self.critical_hp_threshold: float = critical_hp_threshold
+
+    @property
+    def elapsed_s(self) -> float:
+        if self.start_time is None or self.last_timestamp is None:
+            return 0
+        return (self.last_timestamp - self.start_time) / 1000
+
+    @property
+    def player_dps_in_combat(self) -> dict[str, float]:
+        return self._per_second(self.player_total_damage_in_combat)
+
+    @property
+    def player_hps_in_combat(self) -> dict[str, float]:
+        return self._per_second(self.player_total_heal_in_combat)
+
+    @property
+    def player_current_time_below_critical_hp(self) -> dict[str, float]:
+        # Closed intervals plus the intervals that are still open at the latest event
+        time_below = dict(self.player_time_below_20_in_combat)
+        for defender, start_time in self.last_hp_below_critical_threshold.items():
+            time_below[defender] = round(time_below.get(defender, 0) + self.elapsed_s - start_time, 3)
+        return time_below
+
+    def _per_second(self, totals: dict[str, float]) -> dict[str, float]:
+        if self.elapsed_s <= 0:
+            return {name: 0 for name in totals}
+        return {name: round(total / self.elapsed_s, 3) for name, total in totals.items()}
+
+    def update(self, events: list[dict], start_time: Optional[int] = None):
+        if self.start_time is None and events:
+            self.start_time = start_time if start_time is not None else events[0]["timestamp"]
+
+        for event in events:
+            self._add_event(event)
+
+    def _add_event(self, event: dict):
+        self.event_count += 1
+        self.last_timestamp = event["timestamp"]
+        value = event["value"]
+
+        if event["effectType"] == "Damage":
+            attacker = event["attacker"]
+            defender = event["defender"]
+            self.player_total_damage_in_combat[attacker] = self.player_total_damage_in_combat.get(attacker, 0) + value
+            self.player_total_damage_taken_in_combat[defender] = self.player_total_damage_taken_in_combat.get(defender, 0) + value
+            if value > self.player_highest_damage_in_combat.get(attacker, -1):
+                self.player_highest_damage_in_combat[attacker] = value
+
+        elif event["effectType"] == "Heal":
+            attacker = event["attacker"]
+            self.player_total_heal_in_combat[attacker] = self.player_total_heal_in_combat.get(attacker, 0) + value
+            if value > self.player_highest_heal_in_combat.get(attacker, -1):
+                self.player_highest_heal_in_combat[attacker] = value
+
+        self._update_time_below_critical_hp(event)
+
+    def _update_time_below_critical_hp(self, event: dict):
+        defender: str = event["defender"]
+        hp: float = event["resources"]["HP"]
+        hpmax: float = event["resources"]["HPmax"]
+        time_s: float = round((event["timestamp"] - self.start_time) / 1000, 3)
+
+        if hpmax == 0:
+            return
+
+        # If player drops below threshold and wasn't already tracked
+        if 0 < hp < self.critical_hp_threshold and defender not in self.last_hp_below_critical_threshold:
+            self.last_hp_below_critical_threshold[defender] = time_s
+
+        # If player recovers above the threshold (or dies) and was tracked
+        elif defender in self.last_hp_below_critical_threshold and (hp >= self.critical_hp_threshold or hp == 0):
+            duration = time_s - self.last_hp_below_critical_threshold[defender]
+            self.player_time_below_20_in_combat[defender] = round(self.player_time_below_20_in_combat.get(defender, 0) + duration, 3)
+            del self.last_hp_below_critical_threshold[defender]
+
+    def render_table(self) -> str:
+        dps = self.player_dps_in_combat
+        hps = self.player_hps_in_combat
+        time_below = self.player_current_time_below_critical_hp
+        players = set(self.player_total_damage_in_combat) | set(self.player_total_heal_in_combat) | set(self.player_total_damage_taken_in_combat)
+        ordered_players = sorted(players, key=lambda name: dps.get(name, 0) + hps.get(name, 0), reverse=True)
+
+        header = f"{'Player':<20}{'Damage':>10}{'DPS':>10}{'Top Hit':>10}{'Heal':>10}{'HPS':>10}{'Top Heal':>10}{'Taken':>10}{f'<{self.critical_hp_threshold:g}HP (s)':>14}"
+        lines = [
+            f"LIVE COMBAT REPORT  |  {self.elapsed_s:.1f}s elapsed  |  {self.event_count} events",
+            "```````````````````````````````````````````````````````````````````````````````````````````````````````````",
+            header,
+        ]
+        for player in ordered_players:
+            lines.append(
+                f"{player[:19]:<20}"
+                f"{self.player_total_damage_in_combat.get(player, 0):>10}"
+                f"{dps.get(player, 0):>10.1f}"
+                f"{self.player_highest_damage_in_combat.get(player, 0):>10}"
+                f"{self.player_total_heal_in_combat.get(player, 0):>10}"
+                f"{hps.get(player, 0):>10.1f}"
+                f"{self.player_highest_heal_in_combat.get(player, 0):>10}"
+                f"{self.player_total_damage_taken_in_combat.get(player, 0):>10}"
+                f"{time_below.get(player, 0):>14.1f}"
+            )
+        return "\n".join(lines)
+
+
+def follow_fight_log(fight_log_json: Path, refresh_rate_s: float = 1.0, critical_hp_threshold: float = 1100) -> LiveCombatMetrics:
+    """
+        Tails the fight log and redraws the terminal table every refresh_rate_s seconds until the log's events array
+        is closed or the user presses Ctrl+C.
+
+    """
+    tailer = FightLogTailer(fight_log_json)
+    metrics = LiveCombatMetrics(critical_hp_threshold)
+
+    try:
+        while True:
+            next_refresh = time.monotonic() + refresh_rate_s
+            new_events = tailer.poll()
+
+            if tailer.file_restarted:
+                # New fight was started in the same file
+                metrics = LiveCombatMetrics(critical_hp_threshold)
+                tailer.file_restarted = False
+
+            metrics.update(new_events, tailer.start_time)
+
+            # Clears the terminal and moves the cursor to the top left before redrawing
+            print("\033[2J\033[H" + metrics.render_table(), flush=True)
+
+            if tailer.events_finished:
+                print("\nFight log closed.")
+                break
+
+            time.sleep(max(0.0, next_refresh - time.monotonic()))
+    except KeyboardInterrupt:
+        print("\nStopped following fight log.")
+
+    return metrics
+
+
+if __name__ == '__main__':
+    json_file_location: str | Path = input("Enter Path to the fight-log.json file to follow or press ENTER to use default path: ")
+    if not json_file_location:
+        json_file_location: Path = Path(__file__).parent / "fight-log.json"
+
+    refresh_rate: str = input("Enter refresh rate in seconds or press ENTER to use 1 second: ")
+    follow_fight_log(Path(json_file_location), float(refresh_rate) if refresh_rate else 1.0)
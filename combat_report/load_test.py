@@ -0,0 +1,119 @@
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from combat_report.combat_report import CombatReporter
+from combat_report.fight_log_columns import read_fight_log_columns
+from combat_report.fight_log_generator import SyntheticFightSpec, write_synthetic_fight_log
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+DEFAULT_SIZES: tuple[int, ...] = (10_000, 100_000, 1_000_000)
+
+
+def _current_rss_bytes() -> Optional[int]:
+    # psutil works everywhere, without it Linux can still read /proc
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    if os.path.exists("/proc/self/statm"):
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    return None
+
+
+class _PeakRssSampler:
+    """Polls the process RSS from a background thread while a stage runs and keeps the highest value."""
+    def __init__(self, interval_s: float = 0.005):
+        self.interval_s: float = interval_s
+        self.peak_bytes: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while True:
+            rss = _current_rss_bytes()
+            if rss is None:
+                return
+            self.peak_bytes = rss if self.peak_bytes is None else max(self.peak_bytes, rss)
+            if self._stop.wait(self.interval_s):
+                return
+
+    def __enter__(self) -> "_PeakRssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def _run_size(event_count: int, work_dir: Path, events_per_s: float, plot_max_events: int) -> list[dict]:
+    # Runs in its own process so every size starts from a fresh heap and the RSS peaks don't leak between sizes
+    fight_log_json = work_dir / f"synthetic-{event_count}.json"
+    rows = []
+
+    def timed(stage: str, function):
+        with _PeakRssSampler() as sampler:
+            start = time.perf_counter()
+            result = function()
+            elapsed_s = time.perf_counter() - start
+        peak_mb = None if sampler.peak_bytes is None else round(sampler.peak_bytes / 2 ** 20, 1)
+        rows.append({"Events": event_count, "Stage": stage, "Time (s)": round(elapsed_s, 3), "Peak RSS (MB)": peak_mb})
+        return result
+
+    spec = SyntheticFightSpec.for_event_count(event_count, events_per_s=events_per_s)
+    timed("generate", lambda: write_synthetic_fight_log(fight_log_json, spec))
+    columns = timed("ingest", lambda: read_fight_log_columns(fight_log_json))
+    report = timed("metrics", lambda: CombatReporter(columns, show_plots=False))
+
+    # Figures with millions of points take minutes and gigabytes in plotly, so large sizes skip them
+    if event_count <= plot_max_events:
+        timed("plots", lambda: [fig.to_json() for fig in report.build_figures()])
+
+    fight_log_json.unlink()
+    return rows
+
+
+def benchmark_reporter_load(sizes: tuple[int, ...] = DEFAULT_SIZES, events_per_s: float = 1000, plot_max_events: int = 1_000_000) -> pd.DataFrame:
+    """
+        Generates a synthetic log for every size and times the reporter's stages on it:
+            - generate: writing the synthetic json
+            - ingest: streaming the json into interned columns
+            - metrics: events df, event store indexes and every CombatReporter metric
+            - plots: building and serializing the plotly figures
+
+        events_per_s sets how long the fights are, 1000/s keeps the rolling window grids of the big sizes reasonable.
+
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for event_count in sizes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                size_rows = executor.submit(_run_size, event_count, Path(work_dir), events_per_s, plot_max_events).result()
+            for row in size_rows:
+                print(f"{row['Events']:>12,} events  {row['Stage']:<9} {row['Time (s)']:>9.3f}s  peak RSS {row['Peak RSS (MB)']} MB")
+            rows += size_rows
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    requested_sizes = input("Enter comma separated event counts (up to 50000000) or press ENTER for 10000,100000,1000000: ")
+    load_test_sizes = tuple(int(size) for size in requested_sizes.split(",")) if requested_sizes else DEFAULT_SIZES
+
+    results = benchmark_reporter_load(load_test_sizes)
+    print("\n")
+    print(results.to_string(index=False))
+
+    results_csv = Path(__file__).parent / "load_test_results.csv"
+    if input(f"\nPress 1 to save the results to {results_csv}. Press anything else to exit: ") == "1":
+        results.to_csv(results_csv, index=False)
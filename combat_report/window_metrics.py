@@ -0,0 +1,135 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+class CombatWindowMetrics:
+    """
+        Sliding window DPS/HPS per attacker and a per ability breakdown, both built from one columnar pass over the
+        events df.
+
+        Rolling sums use cumulative sums over the events sorted by (attacker, time) and one searchsorted call for every
+        attacker x grid point x window, so the cost is O(n log n) for the sort and O(1) per window value after that.
+
+    """
+    def __init__(self, events_df: pd.DataFrame, windows_s: tuple[float, ...] = (5, 10, 30), grid_step_s: float = 1.0):
+        self.windows_s: tuple[float, ...] = tuple(windows_s)
+        self.grid_step_s: float = grid_step_s
+
+        # Holds metric tables
+        self.rolling_dps_in_combat: pd.DataFrame = pd.DataFrame(columns=["Time (s)", "attacker", "Window (s)", "DPS"])
+        self.rolling_hps_in_combat: pd.DataFrame = pd.DataFrame(columns=["Time (s)", "attacker", "Window (s)", "HPS"])
+        self.peak_rolling_dps_in_combat: dict[float, dict[str, float]] = {}
+        self.peak_rolling_hps_in_combat: dict[float, dict[str, float]] = {}
+        self.ability_breakdown_in_combat: pd.DataFrame = pd.DataFrame()
+
+        if events_df.empty:
+            return
+
+        # One columnar pass: every metric below reads from these arrays
+        time_s = events_df["Time (s)"].to_numpy(dtype=np.float64)
+        value = events_df["value"].to_numpy(dtype=np.float64)
+        is_damage = (events_df["effectType"] == "Damage").to_numpy()
+        is_heal = (events_df["effectType"] == "Heal").to_numpy()
+        attacker_codes, attacker_names = pd.factorize(events_df["attacker"])
+
+        self._set_rolling_rates(time_s, attacker_codes, list(attacker_names), np.where(is_damage, value, 0), np.where(is_heal, value, 0))
+        self._set_ability_breakdown(events_df, value, is_damage, is_heal)
+
+    def _set_rolling_rates(self, time_s: np.ndarray, attacker_codes: np.ndarray, attacker_names: list[str], damage: np.ndarray, heal: np.ndarray):
+        grid = np.arange(0, np.ceil(time_s.max()) + self.grid_step_s, self.grid_step_s)
+        max_window = max(self.windows_s)
+
+        # Sorting by attacker then time and offsetting each attacker by `span` puts every attacker in its own key range,
+        # so a single searchsorted answers the window bounds for all attackers at once
+        span = grid[-1] + max_window + 1
+        order = np.lexsort((time_s, attacker_codes))
+        keys = attacker_codes[order] * span + time_s[order]
+        cumulative = np.zeros((len(keys) + 1, 2))
+        np.cumsum(np.column_stack((damage[order], heal[order])), axis=0, out=cumulative[1:])
+
+        query_end = np.arange(len(attacker_names))[:, None] * span + grid[None, :]
+        end_index = np.searchsorted(keys, query_end, side="right")
+
+        dps_tables = []
+        hps_tables = []
+        for window_s in self.windows_s:
+            start_index = np.searchsorted(keys, query_end - window_s, side="right")
+            window_totals = cumulative[end_index] - cumulative[start_index]
+
+            # Windows at the start of the fight are shorter than window_s, divide by the time that actually passed
+            window_length = np.minimum(window_s, np.maximum(grid, self.grid_step_s))
+            dps = np.round(window_totals[..., 0] / window_length, 3)
+            hps = np.round(window_totals[..., 1] / window_length, 3)
+
+            dps_tables.append(self._to_long_table(grid, attacker_names, window_s, dps, "DPS"))
+            hps_tables.append(self._to_long_table(grid, attacker_names, window_s, hps, "HPS"))
+
+            self.peak_rolling_dps_in_combat[window_s] = self._peak_per_attacker(attacker_names, dps)
+            self.peak_rolling_hps_in_combat[window_s] = self._peak_per_attacker(attacker_names, hps)
+
+        self.rolling_dps_in_combat = pd.concat(dps_tables, ignore_index=True)
+        self.rolling_hps_in_combat = pd.concat(hps_tables, ignore_index=True)
+
+    @staticmethod
+    def _to_long_table(grid: np.ndarray, attacker_names: list[str], window_s: float, rates: np.ndarray, rate_name: str) -> pd.DataFrame:
+        return pd.DataFrame({
+            "Time (s)": np.tile(grid, len(attacker_names)),
+            "attacker": np.repeat(attacker_names, len(grid)),
+            "Window (s)": window_s,
+            rate_name: rates.ravel(),
+        })
+
+    @staticmethod
+    def _peak_per_attacker(attacker_names: list[str], rates: np.ndarray) -> dict[str, float]:
+        peaks = {name: float(peak) for name, peak in zip(attacker_names, rates.max(axis=1)) if peak > 0}
+        return dict(sorted(peaks.items(), key=lambda item: item[1], reverse=True))
+
+    def _set_ability_breakdown(self, events_df: pd.DataFrame, value: np.ndarray, is_damage: np.ndarray, is_heal: np.ndarray):
+        is_miss = (events_df["result"] == "Miss").to_numpy()
+        landed = ~is_miss
+
+        df = pd.DataFrame({
+            "attacker": events_df["attacker"].array,
+            "attack": events_df["attack"].array,
+            "Casts": 1,
+            "Hits": landed.astype(np.int64),
+            "Crits": events_df["crit"].to_numpy(dtype=bool).astype(np.int64),
+            "Misses": is_miss.astype(np.int64),
+            "Damage": np.where(is_damage, value, 0),
+            "Heal": np.where(is_heal, value, 0),
+            # Misses are left out of the average/max value
+            "Landed Value": np.where(landed, value, np.nan),
+        })
+
+        breakdown = df.groupby(["attacker", "attack"], sort=False, observed=True, dropna=False).agg(
+            Casts=("Casts", "sum"),
+            Hits=("Hits", "sum"),
+            Crits=("Crits", "sum"),
+            Misses=("Misses", "sum"),
+            Damage=("Damage", "sum"),
+            Heal=("Heal", "sum"),
+            **{"Average Value": ("Landed Value", "mean"), "Max Value": ("Landed Value", "max")},
+        )
+        breakdown["Crit Rate (%)"] = np.round(breakdown["Crits"] / breakdown["Hits"].replace(0, np.nan) * 100, 3)
+        breakdown["Average Value"] = breakdown["Average Value"].round(3)
+        breakdown = breakdown.reset_index()
+        breakdown["attacker"] = breakdown["attacker"].astype(object)
+        breakdown["attack"] = breakdown["attack"].astype(object).fillna("No Attack Name")
+        self.ability_breakdown_in_combat = breakdown.sort_values(["Damage", "Heal"], ascending=False, ignore_index=True)
+
+    def export_tables(self, output_dir: Path) -> list[Path]:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        tables = {
+            "rolling_dps.csv": self.rolling_dps_in_combat,
+            "rolling_hps.csv": self.rolling_hps_in_combat,
+            "ability_breakdown.csv": self.ability_breakdown_in_combat,
+        }
+        written = []
+        for file_name, table in tables.items():
+            table.to_csv(output_dir / file_name, index=False)
+            written.append(output_dir / file_name)
+        return written
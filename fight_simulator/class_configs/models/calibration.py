@@ -0,0 +1,37 @@
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+
+class AbilityCalibration(BaseModel):
+    heal: bool
+    hits: int
+    misses: int
+    crits: int
+    hit_chance_percent: float
+    crit_rate: float
+    crit_multiplier: Optional[float] = None  # average crit / average regular hit, None without crits
+    mean: float  # regular (non crit) hits
+    std: float
+    # 1st and 99th percentile of a regular hit over its mean, the simulator's 0.7/1.3. None when the log doesn't name
+    # the ability ("Unknown Skill"), different skills would be mixed into one spread
+    variance_low: Optional[float] = None
+    variance_high: Optional[float] = None
+
+
+class PlayerCalibration(BaseModel):
+    energy_regen: Optional[float] = None
+    mana_regen: Optional[float] = None
+    # The player's abilities pooled, weighted by their hits
+    hit_chance_percent: Optional[float] = None
+    crit_rate: Optional[float] = None
+    crit_multiplier: Optional[float] = None
+    variance_low: Optional[float] = None
+    variance_high: Optional[float] = None
+    abilities: Dict[str, AbilityCalibration] = {}
+
+
+class Calibration(BaseModel):
+    log_count: int
+    event_count: int
+    players: Dict[str, PlayerCalibration]
@@ -1,7 +1,11 @@
+import json
 import random
-from dataclasses import dataclass, fields
+from dataclasses import dataclass, field, fields, replace
+from pathlib import Path
+from typing import Dict, Optional
 
 from fight_simulator.class_configs.loader.character_loader import CharacterFactory
+from fight_simulator.class_configs.models.calibration import AbilityCalibration, Calibration
 from fight_simulator.class_configs.models.character import CharacterEquipment
 from fight_simulator.class_configs.models.fighter_weapons import FighterWeaponStats
 from fight_simulator.class_configs.models.healer_weapons import HealerWeaponStats
@@ -11,6 +15,21 @@ from fight_simulator.class_configs.models.shaman_weapons import ShamanWeaponStat
 from fight_simulator.class_configs.models.tank_weapons import TankWeaponStats
 from fight_simulator.class_configs.models.warlock_weapons import WarlockWeaponStats
 
+# What the per skill methods pass on top of the class configs: hits per cast, bleed ticks, extra bonus percent and
+# shields (no crit). weapon_table and damage_distribution read them from here too
+MULTIPLIERS = {
+    ("fighter", "breaker"): 4, ("fighter", "tear"): 4, ("mage", "sunfire"): 5, ("mage", "flame_rush_legacy"): 10, ("warlock", "void_hex"): 5,
+    ("shaman", "ice_totem"): 4, ("shaman", "frost_totem"): 12, ("healer", "blessing_legacy"): 5, ("healer", "blessing"): 4,
+    ("healer", "holy_barrage_legacy"): 5, ("healer", "life_burst"): 5,
+}
+BLEED_TICKS = {("fighter", "reckless_slam"): 5}
+EXTRA_BONUS_PERCENT = {("hunter", "multi_shot"): 24}
+NO_CRIT = {("healer", "eviction")}
+# Breaker on a bleeding target, the hits of the two separately rolled parts
+BREAKER_BLEEDING_HITS = (3, 2)
+# Written by fight_simulator.log_calibration
+CALIBRATION_JSON = Path(__file__).parent / "data" / "calibration.json"
+
 
 @dataclass
 class PlayerStats:
@@ -28,6 +47,77 @@ class PlayerStats:
     mana: int = 317
 
 
+def _ability_key(name: str) -> str:
+    # Weapon and logged ability names compared without case, spaces or "legacy": fire_bomb is "Fire Bomb"
+    return "".join(character for character in name.casefold().replace("legacy", "") if character.isalnum())
+
+
+@dataclass
+class SimulatorConstants:
+    """
+        The numbers the damage/heal averages and rolls use. The defaults are the original guesses, from_calibration
+        replaces them with what a player's fight logs show (see fight_simulator.log_calibration). None keeps the
+        weapon's hit chance, the ccr/cbr crit formula and the armor regen. Numbers the logs couldn't fit (the spread
+        when no ability is named) keep their defaults.
+
+        for_weapon() gives the numbers of one weapon: its own ability's fit when the logs name it, the player's pooled
+        crits and spread otherwise. The pooled hit chance is a mix of whatever abilities were logged, so a weapon
+        without a fit keeps its configured hit chance. hit_chance_percent set here overrides every weapon.
+
+    """
+    variance_low: float = 0.7
+    variance_high: float = 1.3
+    hit_chance_percent: Optional[float] = None
+    crit_rate: Optional[float] = None
+    crit_multiplier: Optional[float] = None
+    energy_regen: Optional[float] = None
+    mana_regen: Optional[float] = None
+    # Fits of the logged abilities by name, "<name> (heal)" for heals, as in PlayerCalibration
+    abilities: Dict[str, AbilityCalibration] = field(default_factory=dict)
+    _by_weapon: Dict[tuple, "SimulatorConstants"] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    @classmethod
+    def from_calibration(cls, calibration_json: Path, player: str) -> "SimulatorConstants":
+        with open(calibration_json) as f:
+            calibration = Calibration(**json.load(f))
+        if player not in calibration.players:
+            raise ValueError(f"{player} isn't a calibrated party member in {calibration_json}")
+        player_calibration = calibration.players[player]
+        constants = cls(abilities=dict(player_calibration.abilities))
+        for name in ("variance_low", "variance_high", "crit_rate", "crit_multiplier", "energy_regen", "mana_regen"):
+            value = getattr(player_calibration, name)
+            if value is not None:
+                setattr(constants, name, value)
+        return constants
+
+    def ability(self, weapon_name: str, heal: bool = False) -> AbilityCalibration | None:
+        key = _ability_key(weapon_name)
+        return next((ability for name, ability in self.abilities.items()
+                     if ability.heal == heal and ability.hits + ability.misses and _ability_key(name.removesuffix(" (heal)")) == key), None)
+
+    def for_weapon(self, weapon_name: str | None, heal: bool = False) -> "SimulatorConstants":
+        # Cached, the simulator asks on every roll
+        constants = self._by_weapon.get((weapon_name, heal))
+        if constants is None:
+            ability = None if weapon_name is None else self.ability(weapon_name, heal)
+            if ability is None:
+                constants = replace(self, abilities={})
+            else:
+                constants = replace(self, abilities={}, hit_chance_percent=ability.hit_chance_percent,
+                                    crit_rate=ability.crit_rate if ability.hits else self.crit_rate,
+                                    crit_multiplier=ability.crit_multiplier or self.crit_multiplier,
+                                    variance_low=ability.variance_low or self.variance_low, variance_high=ability.variance_high or self.variance_high)
+            self._by_weapon[(weapon_name, heal)] = constants
+        return constants
+
+
+def player_constants(player: str = "", calibration_json: Path = CALIBRATION_JSON) -> SimulatorConstants:
+    # The player's constants from the calibration file, the defaults without a player
+    if not player:
+        return SimulatorConstants()
+    return SimulatorConstants.from_calibration(calibration_json, player)
+
+
 @dataclass
 class DamageMetrics:
     average_damage: float
@@ -35,23 +125,35 @@ class DamageMetrics:
 
 
 class BasicHealDamageCalculation:
+    """
+        Averages and rolls of one cast. Every calculator has its own constants, pass the player's
+        (SimulatorConstants.from_calibration) to simulate with numbers fitted from their fight logs.
+
+    """
+    def __init__(self, constants: SimulatorConstants | None = None):
+        self.constants: SimulatorConstants = constants or SimulatorConstants()
+
     @staticmethod
-    def _average_damage(player_stats: PlayerStats, base_damage: float, wep_bonus: float) -> float:
-        wep_bonus /= 100
+    def _critical_odds(player_stats: PlayerStats, constants: SimulatorConstants) -> tuple[float, float]:
+        # Chance (0-1) and damage multiplier of a crit. Calibrated crits are the logged crit rate and multiplier
+        if constants.crit_rate is not None:
+            return constants.crit_rate, constants.crit_multiplier or 1
         # Critical chance formula
         critical_rate = 1 - 0.99 ** (player_stats.ccr / (0.5 * 1.05 ** (30 - 1)))
         critical_bonus = 0.25 + (player_stats.cbr / (0.5 * 1.05 ** (30 - 1))) / 100
+        return critical_rate, 1 + critical_bonus
+
+    def _average_damage(self, player_stats: PlayerStats, base_damage: float, wep_bonus: float, weapon_name: str | None = None) -> float:
+        wep_bonus /= 100
+        critical_rate, critical_multiplier = self._critical_odds(player_stats, self.constants.for_weapon(weapon_name))
         # Base + armor scaling
         effective_damage = base_damage + player_stats.damage * wep_bonus
         # Weighted average of crit vs non-crit
-        return (effective_damage * (1 + critical_bonus) * critical_rate) + (effective_damage * (1 - critical_rate))
+        return (effective_damage * critical_multiplier * critical_rate) + (effective_damage * (1 - critical_rate))
 
-    @staticmethod
-    def _average_heal(player_stats: PlayerStats, base_heal: float, wep_bonus: float, disable_crit: bool = False) -> float:
+    def _average_heal(self, player_stats: PlayerStats, base_heal: float, wep_bonus: float, disable_crit: bool = False, weapon_name: str | None = None) -> float:
         wep_bonus /= 100
-        # Critical chance formula
-        critical_rate = 1 - 0.99 ** (player_stats.ccr / (0.5 * 1.05 ** (30 - 1)))
-        critical_bonus = 0.25 + (player_stats.cbr / (0.5 * 1.05 ** (30 - 1))) / 100
+        critical_rate, critical_multiplier = self._critical_odds(player_stats, self.constants.for_weapon(weapon_name, heal=True))
         # Base + armor scaling
         effective_heal = base_heal + player_stats.heal * wep_bonus
 
@@ -59,44 +161,50 @@ class BasicHealDamageCalculation:
             return effective_heal
 
         # Weighted average of crit vs non-crit
-        return (effective_heal * (1 + critical_bonus) * critical_rate) + (effective_heal * (1 - critical_rate))
+        return (effective_heal * critical_multiplier * critical_rate) + (effective_heal * (1 - critical_rate))
+
+    def _hit_chance_percent(self, hit_chance_percent: float, weapon_name: str | None = None) -> float:
+        # The weapon's configured hit chance unless the constants have one for it
+        calibrated = self.constants.for_weapon(weapon_name).hit_chance_percent
+        return hit_chance_percent if calibrated is None else calibrated
 
     @staticmethod
-    def _calculate_damage(player_stats: PlayerStats, base_damage: float, wep_bonus: float, hit_chance_percent: float) -> float:
+    def _roll_crit(effective_value: float, critical_rate: float, critical_multiplier: float) -> float:
+        # Same odds as the averages: critical_rate (0-1) of the hits do critical_multiplier times the damage
+        return effective_value * critical_multiplier if random.random() < critical_rate else effective_value
+
+    def _calculate_damage(self, player_stats: PlayerStats, base_damage: float, wep_bonus: float, hit_chance_percent: float, weapon_name: str | None = None) -> float:
         wep_bonus /= 100
-        # Critical chance formula
-        critical_rate = 1 - 0.99 ** (player_stats.ccr / (0.5 * 1.05 ** (30 - 1)))
-        critical_bonus = 0.25 + (player_stats.cbr / (0.5 * 1.05 ** (30 - 1))) / 100
+        constants = self.constants.for_weapon(weapon_name)
+        critical_rate, critical_multiplier = self._critical_odds(player_stats, constants)
 
         # Base + armor scaling
-        effective_damage = (base_damage + player_stats.damage * wep_bonus) * round(random.uniform(0.7, 1.3), 3)
+        effective_damage = (base_damage + player_stats.damage * wep_bonus) * round(random.uniform(constants.variance_low, constants.variance_high), 3)
 
         # Checking if weapon hit
-        if random.randint(1, 100) <= hit_chance_percent:
+        if random.randint(1, 100) <= self._hit_chance_percent(hit_chance_percent, weapon_name):
             # Crit or non crit hit
-            return effective_damage * critical_bonus if random.randint(1, 100) <= critical_rate else effective_damage
+            return self._roll_crit(effective_damage, critical_rate, critical_multiplier)
         else:
             return 0
 
-    @staticmethod
-    def _calculate_heal(player_stats: PlayerStats, base_heal: float, wep_bonus: float, disable_crit: bool = False) -> float:
+    def _calculate_heal(self, player_stats: PlayerStats, base_heal: float, wep_bonus: float, disable_crit: bool = False, weapon_name: str | None = None) -> float:
         wep_bonus /= 100
-        # Critical chance formula
-        critical_rate = 1 - 0.99 ** (player_stats.ccr / (0.5 * 1.05 ** (30 - 1)))
-        critical_bonus = 0.25 + (player_stats.cbr / (0.5 * 1.05 ** (30 - 1))) / 100
+        constants = self.constants.for_weapon(weapon_name, heal=True)
+        critical_rate, critical_multiplier = self._critical_odds(player_stats, constants)
         # Base + armor scaling
-        effective_heal = base_heal + player_stats.heal * wep_bonus * round(random.uniform(0.7, 1.3), 3)
+        effective_heal = base_heal + player_stats.heal * wep_bonus * round(random.uniform(constants.variance_low, constants.variance_high), 3)
 
         if disable_crit:
             return effective_heal
 
-        # Weighted average of crit vs non-crit
-        return effective_heal * critical_bonus if random.randint(1, 100) <= critical_rate else effective_heal
+        # Crit or non crit heal
+        return self._roll_crit(effective_heal, critical_rate, critical_multiplier)
 
 
 class CharacterEquipArmor:
     @staticmethod
-    def _setup_player_stats(character_equipment: CharacterEquipment) -> PlayerStats:
+    def _setup_player_stats(character_equipment: CharacterEquipment, constants: SimulatorConstants | None = None) -> PlayerStats:
         player_stats = PlayerStats()
 
         # Loop over all defined stats in PlayerStats instead of hardcoding
@@ -106,29 +214,37 @@ class CharacterEquipArmor:
                 # getattr with default 0 if the attribute doesn't exist on armor_piece_stats
                 value = getattr(armor_piece_stats, name, 0)
                 setattr(player_stats, name, getattr(player_stats, name) + (value or 0))
+
+        # Regen measured in the fight logs replaces the config's
+        if constants is not None and constants.energy_regen is not None:
+            player_stats.energy_regen = constants.energy_regen
+        if constants is not None and constants.mana_regen is not None:
+            player_stats.mana_regen = constants.mana_regen
         return player_stats
 
 
 class FighterDamage(BasicHealDamageCalculation, CharacterEquipArmor):
-    def __init__(self):
+    def __init__(self, constants: SimulatorConstants | None = None):
+        super().__init__(constants)
         self.fighter_info: CharacterEquipment = CharacterFactory().get_fighter_info()
-        self.player_stats: PlayerStats = self._setup_player_stats(self.fighter_info)
+        self.player_stats: PlayerStats = self._setup_player_stats(self.fighter_info, self.constants)
 
-    def _weapon_damage_calculation(self, weapon: FighterWeaponStats, multiplier: int = 1, bleed_ticks: int = 0) -> DamageMetrics:
+    def _weapon_damage_calculation(self, weapon_name: str, multiplier: int = 1, bleed_ticks: int = 0) -> DamageMetrics:
+        weapon: FighterWeaponStats = getattr(self.fighter_info.weapons, weapon_name)
         # Average base damage between lower and higher
         base_damage = (weapon.regular_damage_lower + weapon.regular_damage_higher) / 2
 
-        avg_damage = self._average_damage(self.player_stats, base_damage, weapon.regular_damage_bonus_percent)
-        reg_damage = self._calculate_damage(self.player_stats, base_damage, weapon.regular_damage_bonus_percent, weapon.hit_chance_percent)
+        avg_damage = self._average_damage(self.player_stats, base_damage, weapon.regular_damage_bonus_percent, weapon_name)
+        reg_damage = self._calculate_damage(self.player_stats, base_damage, weapon.regular_damage_bonus_percent, weapon.hit_chance_percent, weapon_name)
 
         # Handle bleed if applicable
         total_bleed_avg_damage = 0
         total_bleed_calc_damage = 0
         if hasattr(weapon, "bleed_damage") and bleed_ticks > 0:
-            bleed_avg = self._average_damage(self.player_stats, weapon.bleed_damage, weapon.bleed_bonus)
+            bleed_avg = self._average_damage(self.player_stats, weapon.bleed_damage, weapon.bleed_bonus, weapon_name)
             total_bleed_avg_damage = bleed_avg * bleed_ticks
 
-            bleed_calc = self._calculate_damage(self.player_stats, weapon.bleed_damage, weapon.bleed_bonus, weapon.hit_chance_percent)
+            bleed_calc = self._calculate_damage(self.player_stats, weapon.bleed_damage, weapon.bleed_bonus, weapon.hit_chance_percent, weapon_name)
             total_bleed_calc_damage = bleed_calc * bleed_ticks
 
         average_damage = round(avg_damage * multiplier + total_bleed_avg_damage, 3)
@@ -138,225 +254,237 @@ class FighterDamage(BasicHealDamageCalculation, CharacterEquipArmor):
 
     # Define specific moves using the generic helper
     def repeater_damage(self) -> DamageMetrics:
-        return self._weapon_damage_calculation(self.fighter_info.weapons.repeater)
+        return self._weapon_damage_calculation("repeater")
 
     def cleaving_strike_damage(self) -> DamageMetrics:
-        return self._weapon_damage_calculation(self.fighter_info.weapons.cleaving_strike)
+        return self._weapon_damage_calculation("cleaving_strike")
 
     def reckless_slam_damage(self) -> DamageMetrics:
-        return self._weapon_damage_calculation(self.fighter_info.weapons.reckless_slam, bleed_ticks=5)
+        return self._weapon_damage_calculation("reckless_slam", bleed_ticks=BLEED_TICKS[("fighter", "reckless_slam")])
 
     def breaker_damage(self, bleed_bonus: bool = False) -> DamageMetrics:
         if bleed_bonus:
-            without_bleed = self._weapon_damage_calculation(self.fighter_info.weapons.breaker, multiplier=3)
-            with_bleed_avg = self._weapon_damage_calculation(self.fighter_info.weapons.breaker, multiplier=1).average_damage * 2
-            with_bleed_calculated = self._weapon_damage_calculation(self.fighter_info.weapons.breaker, multiplier=1).regular_damage * 2
+            without_bleed = self._weapon_damage_calculation("breaker", multiplier=BREAKER_BLEEDING_HITS[0])
+            with_bleed_avg = self._weapon_damage_calculation("breaker", multiplier=1).average_damage * BREAKER_BLEEDING_HITS[1]
+            with_bleed_calculated = self._weapon_damage_calculation("breaker", multiplier=1).regular_damage * BREAKER_BLEEDING_HITS[1]
             return DamageMetrics(average_damage=without_bleed.average_damage + with_bleed_avg, regular_damage=without_bleed.regular_damage + with_bleed_calculated)
         else:
-            return self._weapon_damage_calculation(self.fighter_info.weapons.breaker, multiplier=4)
+            return self._weapon_damage_calculation("breaker", multiplier=MULTIPLIERS[("fighter", "breaker")])
 
     def shiver_damage(self) -> DamageMetrics:
-        return self._weapon_damage_calculation(self.fighter_info.weapons.shiver)
+        return self._weapon_damage_calculation("shiver")
 
     def tear_damage(self) -> DamageMetrics:
-        return self._weapon_damage_calculation(self.fighter_info.weapons.tear, multiplier=4)
+        return self._weapon_damage_calculation("tear", multiplier=MULTIPLIERS[("fighter", "tear")])
 
     def cata_staff_damage(self) -> DamageMetrics:
-        return self._weapon_damage_calculation(self.fighter_info.weapons.cata_staff)
+        return self._weapon_damage_calculation("cata_staff")
 
 
 class MageDamage(BasicHealDamageCalculation, CharacterEquipArmor):
-    def __init__(self):
+    def __init__(self, constants: SimulatorConstants | None = None):
+        super().__init__(constants)
         self._mage_info: CharacterEquipment = CharacterFactory().get_mage_info()
-        self._player_stats: PlayerStats = self._setup_player_stats(self._mage_info)
+        self._player_stats: PlayerStats = self._setup_player_stats(self._mage_info, self.constants)
 
-    def _weapon_average_damage(self, weapon: MageWeaponStats, multiplier: int = 1) -> float:
+    def _weapon_average_damage(self, weapon_name: str, multiplier: int = 1) -> float:
+        weapon: MageWeaponStats = getattr(self._mage_info.weapons, weapon_name)
         # Average base damage between lower and higher
         base_damage = (weapon.regular_damage_lower + weapon.regular_damage_higher) / 2
-        avg_damage = self._average_damage(self._player_stats, base_damage, weapon.regular_damage_bonus_percent)
+        avg_damage = self._average_damage(self._player_stats, base_damage, weapon.regular_damage_bonus_percent, weapon_name)
         return round(avg_damage * multiplier, 3)
 
     # Define specific moves using the generic helper
     def repeater_average_damage(self) -> float:
-        return self._weapon_average_damage(self._mage_info.weapons.repeater)
+        return self._weapon_average_damage("repeater")
 
     def fireball_average_damage(self) -> float:
-        return self._weapon_average_damage(self._mage_info.weapons.fireball)
+        return self._weapon_average_damage("fireball")
 
     def flamestrike_average_damage(self) -> float:
-        return self._weapon_average_damage(self._mage_info.weapons.flamestrike)
+        return self._weapon_average_damage("flamestrike")
 
     def firebomb_average_damage(self) -> float:
-        return self._weapon_average_damage(self._mage_info.weapons.fire_bomb)
+        return self._weapon_average_damage("fire_bomb")
 
     def sunfire_average_damage(self) -> float:
-        return self._weapon_average_damage(self._mage_info.weapons.sunfire, multiplier=5)
+        return self._weapon_average_damage("sunfire", multiplier=MULTIPLIERS[("mage", "sunfire")])
 
     def flamerush_average_damage(self) -> float:
-        return self._weapon_average_damage(self._mage_info.weapons.flame_rush)
+        return self._weapon_average_damage("flame_rush")
 
     def flamerush_legacy_average_damage(self) -> float:
-        return self._weapon_average_damage(self._mage_info.weapons.flame_rush_legacy, multiplier=10)
+        return self._weapon_average_damage("flame_rush_legacy", multiplier=MULTIPLIERS[("mage", "flame_rush_legacy")])
 
 
 class TankDamage(BasicHealDamageCalculation, CharacterEquipArmor):
-    def __init__(self):
+    def __init__(self, constants: SimulatorConstants | None = None):
+        super().__init__(constants)
         self._tank_info: CharacterEquipment = CharacterFactory().get_tank_info()
-        self._player_stats: PlayerStats = self._setup_player_stats(self._tank_info)
+        self._player_stats: PlayerStats = self._setup_player_stats(self._tank_info, self.constants)
 
-    def _weapon_average_damage(self, weapon: TankWeaponStats, multiplier: int = 1) -> float:
+    def _weapon_average_damage(self, weapon_name: str, multiplier: int = 1) -> float:
+        weapon: TankWeaponStats = getattr(self._tank_info.weapons, weapon_name)
         # Average base damage between lower and higher
         base_damage = (weapon.regular_damage_lower + weapon.regular_damage_higher) / 2
-        avg_damage = self._average_damage(self._player_stats, base_damage, weapon.regular_damage_bonus_percent)
+        avg_damage = self._average_damage(self._player_stats, base_damage, weapon.regular_damage_bonus_percent, weapon_name)
         return round(avg_damage * multiplier, 3)
 
     # Define specific moves using the generic helper
     def repeater_average_damage(self) -> float:
-        return self._weapon_average_damage(self._tank_info.weapons.repeater)
+        return self._weapon_average_damage("repeater")
 
     def execute_average_damage(self) -> float:
-        return self._weapon_average_damage(self._tank_info.weapons.execute)
+        return self._weapon_average_damage("execute")
 
     def roar_average_damage(self) -> float:
-        return self._weapon_average_damage(self._tank_info.weapons.roar)
+        return self._weapon_average_damage("roar")
 
     def distract_average_damage(self) -> float:
-        return self._weapon_average_damage(self._tank_info.weapons.distract)
+        return self._weapon_average_damage("distract")
 
     def impale_average_damage(self) -> float:
-        return self._weapon_average_damage(self._tank_info.weapons.impale)
+        return self._weapon_average_damage("impale")
 
     def warstrike_average_damage(self) -> float:
-        return self._weapon_average_damage(self._tank_info.weapons.warstrike_legacy)
+        return self._weapon_average_damage("warstrike_legacy")
 
 
 class WarlockDamage(BasicHealDamageCalculation, CharacterEquipArmor):
-    def __init__(self):
+    def __init__(self, constants: SimulatorConstants | None = None):
+        super().__init__(constants)
         self._warlock_info: CharacterEquipment = CharacterFactory().get_warlock_info()
-        self._player_stats: PlayerStats = self._setup_player_stats(self._warlock_info)
+        self._player_stats: PlayerStats = self._setup_player_stats(self._warlock_info, self.constants)
 
-    def _weapon_average_damage(self, weapon: WarlockWeaponStats, multiplier: int = 1) -> float:
+    def _weapon_average_damage(self, weapon_name: str, multiplier: int = 1) -> float:
+        weapon: WarlockWeaponStats = getattr(self._warlock_info.weapons, weapon_name)
         # Average base damage between lower and higher
         base_damage = (weapon.regular_damage_lower + weapon.regular_damage_higher) / 2
-        avg_damage = self._average_damage(self._player_stats, base_damage, weapon.regular_damage_bonus_percent)
+        avg_damage = self._average_damage(self._player_stats, base_damage, weapon.regular_damage_bonus_percent, weapon_name)
         return round(avg_damage * multiplier, 3)
 
     # Define specific moves using the generic helper
     def repeater_average_damage(self) -> float:
-        return self._weapon_average_damage(self._warlock_info.weapons.repeater)
+        return self._weapon_average_damage("repeater")
 
     def void_hex_average_damage(self) -> float:
-        return self._weapon_average_damage(self._warlock_info.weapons.void_hex, multiplier=5)
+        return self._weapon_average_damage("void_hex", multiplier=MULTIPLIERS[("warlock", "void_hex")])
 
     def life_burn_average_damage(self) -> float:
-        return self._weapon_average_damage(self._warlock_info.weapons.life_burn)
+        return self._weapon_average_damage("life_burn")
 
     def sacrifice_average_damage(self) -> float:
-        return self._weapon_average_damage(self._warlock_info.weapons.sacrifice)
+        return self._weapon_average_damage("sacrifice")
 
 
 class ShamanDamage(BasicHealDamageCalculation, CharacterEquipArmor):
-    def __init__(self):
+    def __init__(self, constants: SimulatorConstants | None = None):
+        super().__init__(constants)
         self._shaman_info: CharacterEquipment = CharacterFactory().get_shaman_info()
-        self._player_stats: PlayerStats = self._setup_player_stats(self._shaman_info)
+        self._player_stats: PlayerStats = self._setup_player_stats(self._shaman_info, self.constants)
 
-    def _weapon_average_damage(self, weapon: ShamanWeaponStats, multiplier: int = 1) -> float:
+    def _weapon_average_damage(self, weapon_name: str, multiplier: int = 1) -> float:
+        weapon: ShamanWeaponStats = getattr(self._shaman_info.weapons, weapon_name)
         # Average base damage between lower and higher
         base_damage = (weapon.regular_damage_lower + weapon.regular_damage_higher) / 2
-        avg_damage = self._average_damage(self._player_stats, base_damage, weapon.regular_damage_bonus_percent)
+        avg_damage = self._average_damage(self._player_stats, base_damage, weapon.regular_damage_bonus_percent, weapon_name)
 
         backward_damage = 0
         if hasattr(weapon, "backward_damage_lower") and weapon.backward_damage_lower is not None:
             backward_base_damage = (weapon.backward_damage_lower + weapon.backward_damage_higher) / 2
-            backward_damage = self._average_damage(self._player_stats, backward_base_damage, weapon.backward_damage_bonus_percent)
+            backward_damage = self._average_damage(self._player_stats, backward_base_damage, weapon.backward_damage_bonus_percent, weapon_name)
 
         return round(avg_damage * multiplier + backward_damage, 3)
 
     # Define specific moves using the generic helper
     def repeater_average_damage(self) -> float:
-        return self._weapon_average_damage(self._shaman_info.weapons.repeater)
+        return self._weapon_average_damage("repeater")
 
     def frost_bolt_average_damage(self) -> float:
-        return self._weapon_average_damage(self._shaman_info.weapons.frost_bolt)
+        return self._weapon_average_damage("frost_bolt")
 
     def waterfall_average_damage(self) -> float:
-        return self._weapon_average_damage(self._shaman_info.weapons.waterfall)
+        return self._weapon_average_damage("waterfall")
 
     def tide_average_damage(self) -> float:
-        return self._weapon_average_damage(self._shaman_info.weapons.tide)
+        return self._weapon_average_damage("tide")
 
     def ice_totem_average_damage(self) -> float:
-        return self._weapon_average_damage(self._shaman_info.weapons.ice_totem, multiplier=4)
+        return self._weapon_average_damage("ice_totem", multiplier=MULTIPLIERS[("shaman", "ice_totem")])
 
     def frost_totem_average_damage(self) -> float:
-        return self._weapon_average_damage(self._shaman_info.weapons.frost_totem, multiplier=12)
+        return self._weapon_average_damage("frost_totem", multiplier=MULTIPLIERS[("shaman", "frost_totem")])
 
 
 class HunterDamage(BasicHealDamageCalculation, CharacterEquipArmor):
-    def __init__(self):
+    def __init__(self, constants: SimulatorConstants | None = None):
+        super().__init__(constants)
         self._hunter_info: CharacterEquipment = CharacterFactory().get_hunter_info()
-        self._player_stats: PlayerStats = self._setup_player_stats(self._hunter_info)
+        self._player_stats: PlayerStats = self._setup_player_stats(self._hunter_info, self.constants)
 
-    def _weapon_average_damage(self, weapon: HunterWeaponStats, multiplier: int = 1, bonus_percent: int = 0) -> float:
+    def _weapon_average_damage(self, weapon_name: str, multiplier: int = 1, bonus_percent: int = 0) -> float:
+        weapon: HunterWeaponStats = getattr(self._hunter_info.weapons, weapon_name)
         wep_bonus = weapon.regular_damage_bonus_percent
         if bonus_percent > 0:
             wep_bonus = weapon.regular_damage_bonus_percent + bonus_percent
 
         # Average base damage between lower and higher
         base_damage = (weapon.regular_damage_lower + weapon.regular_damage_higher) / 2
-        avg_damage = self._average_damage(self._player_stats, base_damage, wep_bonus)
+        avg_damage = self._average_damage(self._player_stats, base_damage, wep_bonus, weapon_name)
 
         return round(avg_damage * multiplier, 3)
 
     # Define specific moves using the generic helper
     def repeater_average_damage(self) -> float:
-        return self._weapon_average_damage(self._hunter_info.weapons.repeater)
+        return self._weapon_average_damage("repeater")
 
     def powerful_shot_average_damage(self) -> float:
-        return self._weapon_average_damage(self._hunter_info.weapons.powerful_shot)
+        return self._weapon_average_damage("powerful_shot")
 
     def arrow_hail_average_damage(self) -> float:
-        return self._weapon_average_damage(self._hunter_info.weapons.arrow_hail)
+        return self._weapon_average_damage("arrow_hail")
 
     def toxic_shot_average_damage(self) -> float:
-        return self._weapon_average_damage(self._hunter_info.weapons.toxic_shot)
+        return self._weapon_average_damage("toxic_shot")
 
     def multi_shot_average_damage(self) -> float:
-        return self._weapon_average_damage(self._hunter_info.weapons.multi_shot, bonus_percent=24)
+        return self._weapon_average_damage("multi_shot", bonus_percent=EXTRA_BONUS_PERCENT[("hunter", "multi_shot")])
 
 
 class HealerHeal(BasicHealDamageCalculation, CharacterEquipArmor):
-    def __init__(self):
+    def __init__(self, constants: SimulatorConstants | None = None):
+        super().__init__(constants)
         self._healer_info: CharacterEquipment = CharacterFactory().get_healer_info()
-        self._player_stats: PlayerStats = self._setup_player_stats(self._healer_info)
+        self._player_stats: PlayerStats = self._setup_player_stats(self._healer_info, self.constants)
 
-    def _weapon_average_heal(self, weapon: HealerWeaponStats, multiplier: int = 1, disable_crit: bool = False) -> float:
+    def _weapon_average_heal(self, weapon_name: str, multiplier: int = 1, disable_crit: bool = False) -> float:
+        weapon: HealerWeaponStats = getattr(self._healer_info.weapons, weapon_name)
         # Average base damage between lower and higher
         base_heal = (weapon.regular_damage_lower + weapon.regular_damage_higher) / 2
-        avg_damage = self._average_heal(self._player_stats, base_heal, weapon.regular_damage_bonus_percent, disable_crit=disable_crit)
+        avg_damage = self._average_heal(self._player_stats, base_heal, weapon.regular_damage_bonus_percent, disable_crit=disable_crit, weapon_name=weapon_name)
         return round(avg_damage * multiplier, 3)
 
     # Define specific moves using the generic helper
     def repeater_average_heal(self) -> float:
-        return self._weapon_average_heal(self._healer_info.weapons.repeater)
+        return self._weapon_average_heal("repeater")
 
     def restoration_average_heal(self) -> float:
-        return self._weapon_average_heal(self._healer_info.weapons.restoration)
+        return self._weapon_average_heal("restoration")
 
     def blessing_legacy_average_heal(self) -> float:
-        return self._weapon_average_heal(self._healer_info.weapons.blessing_legacy, multiplier=5)
+        return self._weapon_average_heal("blessing_legacy", multiplier=MULTIPLIERS[("healer", "blessing_legacy")])
 
     def blessing_average_heal(self) -> float:
-        return self._weapon_average_heal(self._healer_info.weapons.blessing, multiplier=4)
+        return self._weapon_average_heal("blessing", multiplier=MULTIPLIERS[("healer", "blessing")])
 
     def holy_barrage_legacy_average_heal(self) -> float:
-        return self._weapon_average_heal(self._healer_info.weapons.holy_barrage_legacy, multiplier=5)
+        return self._weapon_average_heal("holy_barrage_legacy", multiplier=MULTIPLIERS[("healer", "holy_barrage_legacy")])
 
     def eviction_average_heal(self) -> float:
-        return self._weapon_average_heal(self._healer_info.weapons.eviction, disable_crit=True)
+        return self._weapon_average_heal("eviction", disable_crit=("healer", "eviction") in NO_CRIT)
 
     def life_burst_average_heal(self) -> float:
-        return self._weapon_average_heal(self._healer_info.weapons.life_burst, multiplier=5)
+        return self._weapon_average_heal("life_burst", multiplier=MULTIPLIERS[("healer", "life_burst")])
 
 
 if __name__ == "__main__":
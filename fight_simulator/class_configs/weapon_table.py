@@ -0,0 +1,252 @@
+import math
+import time
+from dataclasses import dataclass, fields, replace
+from typing import Callable
+
+import numpy as np
+
+from fight_simulator.class_configs.loader.character_loader import CharacterFactory
+from fight_simulator.class_configs.models.calibration import AbilityCalibration
+from fight_simulator.class_configs.weapon_damage_calulator import (BLEED_TICKS, EXTRA_BONUS_PERCENT, MULTIPLIERS, NO_CRIT, CharacterEquipArmor, FighterDamage,
+                                                                    HealerHeal, HunterDamage, MageDamage, PlayerStats, ShamanDamage, SimulatorConstants, TankDamage,
+                                                                    WarlockDamage)
+
+CHARACTER_CLASSES = ["fighter", "mage", "tank", "warlock", "shaman", "hunter", "healer"]
+RESOURCES = ["mana", "energy"]
+HEALING_CLASSES = {"healer"}
+
+# Same crit curve as BasicHealDamageCalculation
+_CRIT_SCALE = 0.5 * 1.05 ** (30 - 1)
+
+_FLOAT_COLUMNS = ("lower", "higher", "bonus_percent", "cast_time_s", "cooldown_s", "hit_chance_percent", "resource_cost", "multiplier",
+                  "bleed_damage", "bleed_bonus_percent", "bleed_ticks", "backward_lower", "backward_higher", "backward_bonus_percent",
+                  "stat_damage", "stat_heal", "ccr", "cbr", "crit_rate", "crit_multiplier")
+
+
+@dataclass
+class WeaponMetrics:
+    average: np.ndarray  # damage (heal for the healer) of one cast, same as the *_average_damage/_average_heal methods
+    expected: np.ndarray  # average times the hit chance
+    cycle_s: np.ndarray  # one cast every max(cast time, cooldown)
+    dps: np.ndarray  # expected / cycle_s, HPS for the healer
+    per_cast_second: np.ndarray  # expected / cast time, for filling the global cooldown
+    per_resource: np.ndarray  # expected per point of mana/energy, nan for free weapons
+
+
+@dataclass
+class WeaponTable:
+    """
+        Every weapon of every class config as one struct of arrays, one row per weapon. String columns are codes into
+        CHARACTER_CLASSES/RESOURCES, the player stats of the row's class (armor of the class config) are columns too,
+        so evaluate() works out the whole table with a few array expressions instead of a method call per skill.
+        Calibrated hit chances and crits (SimulatorConstants.for_weapon) are columns as well, nan crits use the
+        ccr/cbr formula.
+
+        variants() copies rows with some columns replaced, for what-if tables of thousands of weapons.
+
+    """
+    weapon_names: list[str]
+    character_class: np.ndarray  # int8 code into CHARACTER_CLASSES
+    resource: np.ndarray  # int8 code into RESOURCES, -1 when the weapon costs nothing
+    is_heal: np.ndarray  # bool
+    crit_enabled: np.ndarray  # bool
+    lower: np.ndarray
+    higher: np.ndarray
+    bonus_percent: np.ndarray
+    cast_time_s: np.ndarray
+    cooldown_s: np.ndarray
+    hit_chance_percent: np.ndarray
+    resource_cost: np.ndarray
+    multiplier: np.ndarray
+    bleed_damage: np.ndarray
+    bleed_bonus_percent: np.ndarray
+    bleed_ticks: np.ndarray
+    backward_lower: np.ndarray
+    backward_higher: np.ndarray
+    backward_bonus_percent: np.ndarray
+    stat_damage: np.ndarray
+    stat_heal: np.ndarray
+    ccr: np.ndarray
+    cbr: np.ndarray
+    crit_rate: np.ndarray  # calibrated, nan for the ccr formula
+    crit_multiplier: np.ndarray  # calibrated, nan for the cbr formula
+
+    @classmethod
+    def from_class_configs(cls, constants: dict[str, SimulatorConstants] | None = None) -> "WeaponTable":
+        # constants by character class, the defaults for the classes without
+        rows = []
+        for class_code, character_class in enumerate(CHARACTER_CLASSES):
+            character_info = getattr(CharacterFactory(), f"get_{character_class}_info")()
+            class_constants = (constants or {}).get(character_class, SimulatorConstants())
+            player_stats = CharacterEquipArmor._setup_player_stats(character_info, class_constants)
+            for weapon_name, weapon in character_info.weapons:
+                key = (character_class, weapon_name)
+                weapon_constants = class_constants.for_weapon(weapon_name, heal=character_class in HEALING_CLASSES)
+                calibrated_crits = weapon_constants.crit_rate is not None
+                mana, energy = getattr(weapon, "mana", None), getattr(weapon, "energy", None)
+                rows.append({
+                    "weapon_names": weapon_name,
+                    "character_class": class_code,
+                    "resource": 0 if mana else 1 if energy else -1,
+                    "is_heal": character_class in HEALING_CLASSES,
+                    "crit_enabled": key not in NO_CRIT,
+                    "lower": weapon.regular_damage_lower,
+                    "higher": weapon.regular_damage_higher,
+                    "bonus_percent": weapon.regular_damage_bonus_percent + EXTRA_BONUS_PERCENT.get(key, 0),
+                    "cast_time_s": weapon.casttime_s,
+                    "cooldown_s": weapon.cooldown_s,
+                    "hit_chance_percent": weapon.hit_chance_percent if weapon_constants.hit_chance_percent is None else weapon_constants.hit_chance_percent,
+                    "resource_cost": mana or energy or 0,
+                    "multiplier": MULTIPLIERS.get(key, 1),
+                    "bleed_damage": getattr(weapon, "bleed_damage", None) or 0,
+                    "bleed_bonus_percent": getattr(weapon, "bleed_bonus", None) or 0,
+                    "bleed_ticks": BLEED_TICKS.get(key, 0),
+                    "backward_lower": getattr(weapon, "backward_damage_lower", None) or 0,
+                    "backward_higher": getattr(weapon, "backward_damage_higher", None) or 0,
+                    "backward_bonus_percent": getattr(weapon, "backward_damage_bonus_percent", None) or 0,
+                    "stat_damage": player_stats.damage,
+                    "stat_heal": player_stats.heal,
+                    "ccr": player_stats.ccr,
+                    "cbr": player_stats.cbr,
+                    "crit_rate": weapon_constants.crit_rate if calibrated_crits else np.nan,
+                    "crit_multiplier": (weapon_constants.crit_multiplier or 1) if calibrated_crits else np.nan,
+                })
+
+        columns = {"weapon_names": [row["weapon_names"] for row in rows]}
+        for column, dtype in (("character_class", np.int8), ("resource", np.int8), ("is_heal", bool), ("crit_enabled", bool)):
+            columns[column] = np.array([row[column] for row in rows], dtype=dtype)
+        for column in _FLOAT_COLUMNS:
+            columns[column] = np.array([row[column] for row in rows], dtype=np.float64)
+        return cls(**columns)
+
+    def __len__(self) -> int:
+        return len(self.weapon_names)
+
+    def rows_of(self, character_class: str) -> np.ndarray:
+        return np.flatnonzero(self.character_class == CHARACTER_CLASSES.index(character_class))
+
+    def row_of(self, character_class: str, weapon_name: str) -> int:
+        return next(row for row in self.rows_of(character_class) if self.weapon_names[row] == weapon_name)
+
+    def with_player_stats(self, character_class: str, player_stats: PlayerStats) -> "WeaponTable":
+        # Copy with other stats (gear) for one class
+        rows = self.rows_of(character_class)
+        columns = {column: getattr(self, column).copy() for column in ("stat_damage", "stat_heal", "ccr", "cbr")}
+        for column, stat in (("stat_damage", "damage"), ("stat_heal", "heal"), ("ccr", "ccr"), ("cbr", "cbr")):
+            columns[column][rows] = getattr(player_stats, stat)
+        return replace(self, **columns)
+
+    def variants(self, rows: np.ndarray, **columns: np.ndarray) -> "WeaponTable":
+        """
+            A table of the given rows (repeats allowed) with some columns replaced, e.g.
+            table.variants(np.repeat(row, 1000), bonus_percent=np.linspace(50, 250, 1000))
+
+        """
+        rows = np.asarray(rows)
+        copied = {field.name: getattr(self, field.name)[rows] for field in fields(self) if field.name != "weapon_names"}
+        for column, values in columns.items():
+            copied[column] = np.broadcast_to(np.asarray(values, dtype=copied[column].dtype), rows.shape).copy()
+        return WeaponTable([self.weapon_names[row] for row in rows], **copied)
+
+    def evaluate(self) -> WeaponMetrics:
+        # The whole table in one go, same formulas as BasicHealDamageCalculation._average_damage/_average_heal
+        calibrated = ~np.isnan(self.crit_rate)
+        critical_rate = np.where(calibrated, self.crit_rate, 1 - 0.99 ** (self.ccr / _CRIT_SCALE))
+        critical_bonus = np.where(calibrated, self.crit_multiplier - 1, 0.25 + (self.cbr / _CRIT_SCALE) / 100)
+        # (x * (1 + bonus) * rate) + (x * (1 - rate)) is x * crit_factor
+        crit_factor = np.where(self.crit_enabled, 1 + critical_bonus * critical_rate, 1.0)
+        stat = np.where(self.is_heal, self.stat_heal, self.stat_damage)
+
+        regular = ((self.lower + self.higher) / 2 + stat * self.bonus_percent / 100) * crit_factor
+        bleed = (self.bleed_damage + stat * self.bleed_bonus_percent / 100) * crit_factor * self.bleed_ticks
+        has_backward = self.backward_higher > 0
+        backward = np.where(has_backward, ((self.backward_lower + self.backward_higher) / 2 + stat * self.backward_bonus_percent / 100) * crit_factor, 0)
+        average = regular * self.multiplier + bleed + backward
+
+        expected = average * self.hit_chance_percent / 100
+        cycle_s = np.maximum(self.cast_time_s, self.cooldown_s)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dps = np.where(cycle_s > 0, expected / cycle_s, np.nan)
+            per_cast_second = np.where(self.cast_time_s > 0, expected / self.cast_time_s, np.nan)
+            per_resource = np.where(self.resource_cost > 0, expected / self.resource_cost, np.nan)
+        return WeaponMetrics(average, expected, cycle_s, dps, per_cast_second, per_resource)
+
+
+def _per_skill_methods(constants: dict[str, SimulatorConstants] | None = None) -> dict[tuple[str, str], Callable[[], float]]:
+    """
+        Every weapon's own method of weapon_damage_calulator, the way a damage table was built before. Methods are found
+        by name: breaker_damage, fireball_average_damage, firebomb_average_damage for fire_bomb, ...
+
+    """
+    calculator_classes = {"fighter": FighterDamage, "mage": MageDamage, "tank": TankDamage, "warlock": WarlockDamage, "shaman": ShamanDamage,
+                          "hunter": HunterDamage, "healer": HealerHeal}
+    methods = {}
+    for character_class, calculator_class in calculator_classes.items():
+        calculator = calculator_class((constants or {}).get(character_class))
+        character_info = getattr(CharacterFactory(), f"get_{character_class}_info")()
+        for weapon_name, _ in character_info.weapons:
+            names = [f"{name}{suffix}" for name in (weapon_name, weapon_name.replace("_", "", 1), weapon_name.removesuffix("_legacy"))
+                     for suffix in ("_damage", "_average_damage", "_average_heal")]
+            method = next(getattr(calculator, name) for name in names if hasattr(calculator, name))
+            # The fighter's methods return DamageMetrics
+            methods[(character_class, weapon_name)] = (lambda method=method: method().average_damage) if character_class == "fighter" else method
+    return methods
+
+
+def print_weapon_table(table: WeaponTable, metrics: WeaponMetrics):
+    print(f"{'Class':<8} {'Weapon':<20} {'Average':>9} {'DPS':>8} {'Per cast s':>10} {'Per resource':>12}")
+    for row in range(len(table)):
+        resource = f"{metrics.per_resource[row]:9.2f}/{RESOURCES[table.resource[row]]}" if table.resource[row] >= 0 and table.resource_cost[row] > 0 else "-"
+        print(f"{CHARACTER_CLASSES[table.character_class[row]]:<8} {table.weapon_names[row]:<20} {metrics.average[row]:9.1f} {metrics.dps[row]:8.1f} "
+              f"{metrics.per_cast_second[row]:10.1f} {resource:>12}")
+
+
+def benchmark_weapon_table(variant_count: int = 100_000, repeats: int = 20):
+    """
+        One evaluate() over every class config weapon against a method call per skill, checked to give the same
+        averages with the default and with calibrated constants, and evaluate() over variant_count what-if variants
+        of the weapons.
+
+    """
+    table = WeaponTable.from_class_configs()
+    per_skill = _per_skill_methods()
+
+    # Pooled crits for two classes and one weapon of each with its own fit
+    ability = AbilityCalibration(heal=False, hits=950, misses=50, crits=190, hit_chance_percent=95, crit_rate=0.2, crit_multiplier=1.8, mean=500, std=50)
+    calibrated = {"fighter": SimulatorConstants(crit_rate=0.1, crit_multiplier=1.5, abilities={"Breaker": ability}),
+                  "healer": SimulatorConstants(crit_rate=0.1, crit_multiplier=1.5, abilities={"Restoration (heal)": ability.model_copy(update={"heal": True})})}
+    calibrated_table = WeaponTable.from_class_configs(calibrated)
+    assert calibrated_table.hit_chance_percent[calibrated_table.row_of("fighter", "breaker")] == 95
+    for checked_table, methods in ((table, per_skill), (calibrated_table, _per_skill_methods(calibrated))):
+        metrics = checked_table.evaluate()
+        for row in range(len(checked_table)):
+            key = (CHARACTER_CLASSES[checked_table.character_class[row]], checked_table.weapon_names[row])
+            assert math.isclose(metrics.average[row], methods[key](), abs_tol=1e-3), f"{key} differs from its method"
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        [method() for method in per_skill.values()]
+    per_skill_s = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        table.evaluate()
+    table_s = (time.perf_counter() - start) / repeats
+
+    # Every weapon with its bonus percent swept from 50% to 200% of the config
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, len(table), variant_count)
+    variants = table.variants(rows, bonus_percent=table.bonus_percent[rows] * rng.uniform(0.5, 2.0, variant_count))
+    start = time.perf_counter()
+    variant_metrics = variants.evaluate()
+    variants_s = time.perf_counter() - start
+
+    print(f"{len(table)} weapons: {len(per_skill)} method calls {per_skill_s * 1e6:.0f}us, one evaluate() {table_s * 1e6:.0f}us")
+    print(f"{variant_count:,} variants in {variants_s * 1000:.1f}ms, best DPS {np.nanmax(variant_metrics.dps):.1f}")
+
+
+if __name__ == '__main__':
+    weapon_table = WeaponTable.from_class_configs()
+    print_weapon_table(weapon_table, weapon_table.evaluate())
+    print()
+    benchmark_weapon_table()
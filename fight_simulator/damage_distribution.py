@@ -0,0 +1,302 @@
+import copy
+import math
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable
+
+import numpy as np
+
+from fight_simulator.class_configs.models.fighter_weapons import FighterWeaponStats
+from fight_simulator.class_configs.weapon_damage_calulator import (BLEED_TICKS, BREAKER_BLEEDING_HITS, MULTIPLIERS, BasicHealDamageCalculation, FighterDamage,
+                                                                    PlayerStats, SimulatorConstants, player_constants)
+from fight_simulator.fight_simulator_run import Cast, Pot, cast_damage, fighter_rotation, rotation_casts, simulate_fight
+
+# _calculate_damage rolls round(uniform(low, high), 3)
+_ROLL_STEP = 0.001
+
+
+@dataclass(frozen=True)
+class DamageRoll:
+    """
+        One _calculate_damage call: effective damage times the variance roll, zero on a miss, times the crit factor
+        on a crit. scale is what the caller multiplies the single roll by (hits per cast, bleed ticks).
+
+    """
+    effective: float
+    scale: float
+    hit_probability: float
+    crit_probability: float
+    crit_factor: float
+    variance_low: float
+    variance_high: float
+
+    def point_masses(self) -> tuple[np.ndarray, np.ndarray]:
+        # Damage values and their probabilities, the rounded variance roll is discrete
+        low, high = self.variance_low, self.variance_high
+        if high > low:
+            steps = np.arange(math.floor(low / _ROLL_STEP + 0.5), math.floor(high / _ROLL_STEP + 0.5) + 1)
+            edges_low = np.maximum((steps - 0.5) * _ROLL_STEP, low)
+            edges_high = np.minimum((steps + 0.5) * _ROLL_STEP, high)
+            rolls, roll_probability = steps * _ROLL_STEP, np.maximum(edges_high - edges_low, 0) / (high - low)
+        else:
+            rolls, roll_probability = np.array([low]), np.array([1.0])
+
+        hit = self.effective * self.scale * rolls
+        values = np.concatenate(([0.0], hit, hit * self.crit_factor))
+        probability = np.concatenate(([1 - self.hit_probability],
+                                      self.hit_probability * (1 - self.crit_probability) * roll_probability,
+                                      self.hit_probability * self.crit_probability * roll_probability))
+        return values, probability
+
+
+def _roll(player_stats: PlayerStats, base_damage: float, wep_bonus: float, hit_chance_percent: float, scale: float, constants: SimulatorConstants) -> DamageRoll:
+    # Same odds as _calculate_damage/_roll_crit, the hit check randint(1, 100) <= x is true floor(x) times out of 100
+    crit_probability, crit_factor = BasicHealDamageCalculation._critical_odds(player_stats, constants)
+    if constants.hit_chance_percent is not None:
+        hit_chance_percent = constants.hit_chance_percent
+    return DamageRoll(
+        effective=base_damage + player_stats.damage * wep_bonus / 100, scale=scale,
+        hit_probability=min(max(math.floor(hit_chance_percent), 0), 100) / 100,
+        crit_probability=crit_probability, crit_factor=crit_factor, variance_low=constants.variance_low, variance_high=constants.variance_high,
+    )
+
+
+def fighter_cast_rolls(player_stats: PlayerStats, weapons_in_use: dict[str, FighterWeaponStats | Pot], cast: Cast,
+                       constants: SimulatorConstants | None = None) -> list[DamageRoll]:
+    """
+        The independent rolls of one FighterDamage cast: one roll times the hits per cast, plus one bleed roll times
+        the bleed ticks. Breaker on a bleeding target is one roll per part of BREAKER_BLEEDING_HITS. constants are
+        the fighter's, their numbers for the cast's weapon are used.
+
+    """
+    constants = (constants or SimulatorConstants()).for_weapon(cast.weapon)
+    weapon = weapons_in_use[cast.weapon]
+    base_damage = (weapon.regular_damage_lower + weapon.regular_damage_higher) / 2
+    multiplier = MULTIPLIERS.get(("fighter", cast.weapon), 1)
+    if cast.weapon == "breaker" and cast.bleed_bonus:
+        multipliers = list(BREAKER_BLEEDING_HITS)
+    else:
+        multipliers = [multiplier]
+
+    rolls = [_roll(player_stats, base_damage, weapon.regular_damage_bonus_percent, weapon.hit_chance_percent, scale, constants) for scale in multipliers]
+    bleed_ticks = BLEED_TICKS.get(("fighter", cast.weapon), 0)
+    if weapon.bleed_damage is not None and bleed_ticks > 0:
+        rolls.append(_roll(player_stats, weapon.bleed_damage, weapon.bleed_bonus, weapon.hit_chance_percent, bleed_ticks, constants))
+    return rolls
+
+
+@dataclass
+class DamageDistribution:
+    """
+        Total damage of a fight as probabilities on an even grid. mean and std are exact, the grid is only used for
+        percentiles and odds.
+
+    """
+    damage: np.ndarray  # grid points
+    probability: np.ndarray
+    duration_s: float
+    mean: float
+    std: float
+    cast_count: int
+
+    @property
+    def mean_dps(self) -> float:
+        return self.mean / self.duration_s
+
+    @property
+    def std_dps(self) -> float:
+        return self.std / self.duration_s
+
+    def cdf(self, damage: np.ndarray | float) -> np.ndarray | float:
+        return np.interp(damage, self.damage, np.cumsum(self.probability), left=0.0, right=1.0)
+
+    def percentile_dps(self, percent: float) -> float:
+        cumulative = np.cumsum(self.probability)
+        return float(self.damage[min(np.searchsorted(cumulative, percent / 100), len(cumulative) - 1)] / self.duration_s)
+
+    def probability_dps_at_least(self, dps: float) -> float:
+        return float(1 - self.cdf(dps * self.duration_s - 1e-9))
+
+
+def damage_distribution(rolls: Iterable[tuple[DamageRoll, int]], duration_s: float, bins: int = 1 << 15, window_std: float = 12.0) -> DamageDistribution:
+    """
+        Exact distribution of the sum of independent rolls, every roll given with the number of times it happens.
+        Each roll's point masses are split onto a grid (keeps its mean), the sum is the product of the rolls' FFTs,
+        raised to their counts.
+
+        The grid covers mean +- window_std standard deviations, or everything from no damage to every roll at its
+        maximum when that's smaller. Point masses outside the window wrap around (the FFT convolution is circular)
+        and land back on the right value once unwrapped, only mass further than the window from the mean is lost.
+
+    """
+    rolls = [(roll, count) for roll, count in rolls if count]
+    masses = [roll.point_masses() for roll, _ in rolls]
+    mean = sum(count * float(values @ probability) for (_, count), (values, probability) in zip(rolls, masses))
+    variance = sum(count * float((values - values @ probability) ** 2 @ probability) for (_, count), (values, probability) in zip(rolls, masses))
+    maximum = sum(count * float(values.max()) for (_, count), (values, _) in zip(rolls, masses))
+
+    std = math.sqrt(variance)
+    if maximum <= 2 * window_std * std or std == 0:
+        start, span = 0.0, max(maximum, 1.0)
+    else:
+        start, span = max(mean - window_std * std, 0.0), 2 * window_std * std
+    step = span / (bins - 1)
+
+    spectrum = np.ones(bins // 2 + 1, dtype=np.complex128)
+    for (_, count), (values, probability) in zip(rolls, masses):
+        position = values / step
+        lower = np.floor(position)
+        upper_share = position - lower
+        lower = lower.astype(np.int64)
+        pmf = np.bincount(lower % bins, probability * (1 - upper_share), minlength=bins) + np.bincount((lower + 1) % bins, probability * upper_share, minlength=bins)
+        spectrum *= np.fft.rfft(pmf) ** count
+
+    wrapped = np.maximum(np.fft.irfft(spectrum, n=bins), 0)
+    # Grid index i holds every total equal to i mod bins, the window start decides which one it is
+    first = int(math.floor(start / step))
+    probability = np.roll(wrapped, -(first % bins))
+    probability /= probability.sum()
+    damage = (first + np.arange(bins)) * step
+    return DamageDistribution(damage=damage, probability=probability, duration_s=duration_s, mean=mean, std=std, cast_count=sum(count for _, count in rolls))
+
+
+def casts_distribution(player_stats: PlayerStats, weapons_in_use: dict[str, FighterWeaponStats | Pot], casts: Iterable[Cast], duration: float,
+                       bins: int = 1 << 15, constants: SimulatorConstants | None = None) -> DamageDistribution:
+    # Each distinct cast becomes its rolls, counted as often as it was used
+    rolls = Counter()
+    for (weapon, bleed_bonus), count in Counter((cast.weapon, cast.bleed_bonus) for cast in casts).items():
+        cast = Cast(time=None, weapon=weapon, energy_left=0, mana_left=0, bleed_bonus=bleed_bonus)
+        for roll in fighter_cast_rolls(player_stats, weapons_in_use, cast, constants):
+            rolls[roll] += count
+    return damage_distribution(rolls.items(), duration, bins)
+
+
+def fighter_damage_distribution(fighter_handle: FighterDamage, weapons_in_use: dict[str, FighterWeaponStats | Pot] | None = None, duration: float = 125,
+                                tick: float = 0.1, bins: int = 1 << 15) -> DamageDistribution:
+    # The rotation decides the casts, randomness never changes them
+    weapons_in_use = weapons_in_use or fighter_rotation(fighter_handle)
+    casts = rotation_casts(fighter_handle, weapons_in_use, duration, tick)
+    return casts_distribution(fighter_handle.player_stats, weapons_in_use, casts, duration, bins, fighter_handle.constants)
+
+
+@dataclass
+class FighterSetup:
+    player_stats: PlayerStats
+    weapons_in_use: dict[str, FighterWeaponStats | Pot]
+
+
+def rank_fighter_setups(setups: Dict[str, FighterSetup], duration: float = 125, target_dps: float | None = None) -> list[tuple[str, DamageDistribution]]:
+    """
+        Gear and rotation candidates ranked by mean DPS, or by the chance to reach target_dps when given. Every
+        candidate is one rotation walk and one convolution, no Monte Carlo runs.
+
+    """
+    fighter = FighterDamage()
+    ranked = []
+    for name, setup in setups.items():
+        handle = copy.copy(fighter)
+        handle.player_stats = setup.player_stats
+        ranked.append((name, fighter_damage_distribution(handle, setup.weapons_in_use, duration)))
+
+    if target_dps is None:
+        return sorted(ranked, key=lambda entry: entry[1].mean, reverse=True)
+    return sorted(ranked, key=lambda entry: (entry[1].probability_dps_at_least(target_dps), entry[1].mean), reverse=True)
+
+
+def print_damage_distribution(distribution: DamageDistribution, target_dps: float | None = None):
+    print(f"{distribution.cast_count} casts over {distribution.duration_s:g}s: mean {distribution.mean_dps:.1f} DPS, std {distribution.std_dps:.2f}, "
+          f"5-50-95% {distribution.percentile_dps(5):.1f} / {distribution.percentile_dps(50):.1f} / {distribution.percentile_dps(95):.1f}")
+    if target_dps is not None:
+        print(f"Chance of at least {target_dps:g} DPS: {distribution.probability_dps_at_least(target_dps) * 100:.2f}%")
+
+
+def _cross_check(fighter: FighterDamage, duration: float, runs: int) -> DamageDistribution:
+    # Monte Carlo over the stochastic simulator's damage calls for the same casts
+    rotation = fighter_rotation(fighter)
+    casts = list(rotation_casts(fighter, rotation, duration))
+    start = time.perf_counter()
+    distribution = casts_distribution(fighter.player_stats, rotation, casts, duration, constants=fighter.constants)
+    analytic_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    totals = np.sort([sum(cast_damage(fighter, cast) for cast in casts) for _ in range(runs)])
+    monte_carlo_s = time.perf_counter() - start
+
+    # Mean within 5 standard errors, largest CDF gap (Kolmogorov-Smirnov) below its 0.1% critical value
+    assert abs(totals.mean() - distribution.mean) < 5 * distribution.std / math.sqrt(runs) + 1e-6, f"mean {totals.mean()} vs {distribution.mean}"
+    assert math.isclose(totals.std(), distribution.std, rel_tol=0.1, abs_tol=1e-6), f"std {totals.std()} vs {distribution.std}"
+    empirical = np.arange(1, runs + 1) / runs
+    ks = float(np.max(np.abs(empirical - distribution.cdf(totals))))
+    assert ks < 1.95 / math.sqrt(runs), f"KS distance {ks}"
+    print(f"  convolution {analytic_s * 1e3:.1f}ms vs {runs} Monte Carlo runs {monte_carlo_s:.2f}s, KS distance {ks:.4f}")
+    return distribution
+
+
+def benchmark_damage_distribution(duration: float = 125, runs: int = 2000):
+    """
+        Checks every cast's mean against the weapon table's expected damage and the convolution against runs runs
+        of the stochastic simulator, once with the simulator's own constants and once with calibrated misses, crits
+        and spread. Then ranks a few gear and rotation candidates.
+
+    """
+    from fight_simulator.class_configs.models.calibration import AbilityCalibration
+    from fight_simulator.class_configs.weapon_table import WeaponTable
+
+    fighter = FighterDamage()
+    # Pooled misses, crits and spread, plus breaker with its own fit
+    breaker = AbilityCalibration(heal=False, hits=900, misses=100, crits=270, hit_chance_percent=90, crit_rate=0.3, crit_multiplier=1.7, mean=500, std=50,
+                                 variance_low=0.9, variance_high=1.1)
+    calibrated_fighter = FighterDamage(SimulatorConstants(variance_low=0.8, variance_high=1.2, hit_chance_percent=95, crit_rate=0.1, crit_multiplier=1.5,
+                                                          abilities={"Breaker": breaker}))
+    for checked_fighter in (fighter, calibrated_fighter):
+        table = WeaponTable.from_class_configs({"fighter": checked_fighter.constants})
+        expected = table.evaluate().expected
+        for weapon_name, weapon in fighter_rotation(checked_fighter).items():
+            if isinstance(weapon, Pot):
+                continue
+            cast = Cast(time=None, weapon=weapon_name, energy_left=0, mana_left=0)
+            rolls = fighter_cast_rolls(checked_fighter.player_stats, fighter_rotation(checked_fighter), cast, checked_fighter.constants)
+            cast_mean = sum(float(values @ probability) for values, probability in (roll.point_masses() for roll in rolls))
+            table_mean = expected[table.row_of("fighter", weapon_name)]
+            assert math.isclose(cast_mean, table_mean, rel_tol=1e-9), f"{weapon_name}: {cast_mean} per cast, the weapon table expects {table_mean}"
+    rotation_counts = Counter(cast.weapon for cast in rotation_casts(fighter, fighter_rotation(fighter), duration))
+    _, weapons_count = simulate_fight(fighter, fighter_rotation(fighter), duration)
+    assert {name: count for name, count in weapons_count.items() if count} == dict(rotation_counts), "rotation differs from the simulator's"
+
+    print("Simulator constants:")
+    distribution = _cross_check(fighter, duration, runs)
+    print_damage_distribution(distribution)
+    target = distribution.percentile_dps(90)
+
+    print("Calibrated constants:")
+    print_damage_distribution(_cross_check(calibrated_fighter, duration, runs))
+
+    rotation = fighter_rotation(fighter)
+    more_damage = copy.copy(fighter.player_stats)
+    more_damage.damage += 50
+    more_regen = copy.copy(fighter.player_stats)
+    more_regen.energy_regen += 1
+    setups = {
+        "equipped": FighterSetup(fighter.player_stats, rotation),
+        "+50 damage": FighterSetup(more_damage, rotation),
+        "+1 energy regen": FighterSetup(more_regen, rotation),
+        "no cata staff": FighterSetup(fighter.player_stats, {name: weapon for name, weapon in rotation.items() if name != "cata_staff"}),
+        "tear before breaker": FighterSetup(fighter.player_stats, {name: rotation[name] for name in
+                                                                   ("repeater", "cleaving_strike", "reckless_slam", "tear", "breaker", "shiver", "cata_staff", "energy_pot")}),
+    }
+    start = time.perf_counter()
+    ranked = rank_fighter_setups(setups, duration, target_dps=target)
+    rank_s = time.perf_counter() - start
+    print(f"\n{len(setups)} setups ranked in {rank_s * 1e3:.0f}ms by the chance of at least {target:.1f} DPS:")
+    for name, setup_distribution in ranked:
+        print(f"  {name}: mean {setup_distribution.mean_dps:.1f} DPS, {setup_distribution.probability_dps_at_least(target) * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    fight_duration = float(input("Enter the fight duration in seconds or press ENTER for 125: ") or 125)
+    desired_dps = input("Enter a DPS to get the chance of reaching it or press ENTER to skip: ")
+    player_name = input("Enter your player name to use the numbers fitted from your fight logs (calibration.json) or press ENTER to skip: ")
+    print()
+
+    print_damage_distribution(fighter_damage_distribution(FighterDamage(player_constants(player_name)), duration=fight_duration), float(desired_dps) if desired_dps else None)
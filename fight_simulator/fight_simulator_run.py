@@ -1,9 +1,9 @@
 import dataclasses
 from decimal import Decimal
-from typing import Dict
+from typing import Dict, Iterator
 
 from fight_simulator.class_configs.models.fighter_weapons import FighterWeaponStats
-from fight_simulator.class_configs.weapon_damage_calulator import FighterDamage
+from fight_simulator.class_configs.weapon_damage_calulator import FighterDamage, player_constants
 
 
 @dataclasses.dataclass
@@ -21,153 +21,175 @@ class StatusEffects:
     end_time: Decimal
 
 
-fighter_handle = FighterDamage()
-
-# Simulation settings
-energy_regen_per_sec = fighter_handle.player_stats.energy_regen
-mana_regen_per_sec = fighter_handle.player_stats.mana_regen
-max_energy = fighter_handle.player_stats.energy
-max_mana = fighter_handle.player_stats.mana
-duration = 125  # simulate 20 seconds
-tick = 0.1  # tick resolution (0.1s)
-
-# Runtime state
-player_energy = max_energy
-player_mana = max_mana
-weapons_in_use: dict[str, FighterWeaponStats | Pot] = {
-    "repeater": fighter_handle.fighter_info.weapons.repeater,
-    "cleaving_strike": fighter_handle.fighter_info.weapons.cleaving_strike,
-    "reckless_slam": fighter_handle.fighter_info.weapons.reckless_slam,
-    "breaker": fighter_handle.fighter_info.weapons.breaker,
-    "tear": fighter_handle.fighter_info.weapons.tear,
-    "shiver": fighter_handle.fighter_info.weapons.shiver,
-    "cata_staff": fighter_handle.fighter_info.weapons.cata_staff,
-    "energy_pot": Pot(name="energy", resource=20, cooldown=60, cast_time=0.5),
-}
-weapons_damage: dict[str, float] = {
-    "repeater": 0,
-    "cleaving_strike": 0,
-    "reckless_slam": 0,
-    "breaker": 0,
-    "tear": 0,
-    "shiver": 0,
-    "cata_staff": 0,
-}
-weapons_count: dict[str, float] = {
-    "repeater": 0,
-    "cleaving_strike": 0,
-    "reckless_slam": 0,
-    "breaker": 0,
-    "tear": 0,
-    "shiver": 0,
-    "cata_staff": 0,
-}
-status_effects: list[StatusEffects] = []
-
-cooldowns: Dict[str, float] = {w: 0.0 for w in weapons_in_use}
-time = Decimal("0.0")
-
-print("=== Combat Simulation Start ===")
-
-while time < duration:
-    # Every second it updated mana/energy
-    if time % 1 == 0:
-        player_energy = round(min([max_energy, player_energy + energy_regen_per_sec]), 3)
-        player_mana = round(min([max_mana, player_mana + mana_regen_per_sec]), 3)
-        print(f"New energy {player_energy}")
-        print(f"New mana {player_mana}")
-
-        if len(status_effects) > 0:
-            for effect in status_effects[:]:
-                if time > effect.end_time:
-                    status_effects.remove(effect)
-
-    # try to attack (priority order)
-    for wep_name, weapon in weapons_in_use.items():
-        if cooldowns[wep_name] <= 0:
-            # Using Pot
-            if isinstance(weapon, Pot):
-                match weapon.name:
-                    case "energy":
-                        player_energy += weapon.resource
-                        player_energy = round(min(max_energy, player_energy), 3)
-                        print(f"Energy pot used. Player energy: {player_energy}")
-                    case "mana":
-                        player_mana += weapon.resource
-                        player_mana = round(min(max_mana, player_mana), 3)
-                        print(f"Mana pot used. Player mana: {player_mana}")
-
-                cooldowns[wep_name] = weapon.cooldown + weapon.cast_time
-                continue
-
-            # Controlling mana/energy
-            enough_resource_to_use_skill = False
-            if weapon.energy is not None and player_energy >= weapon.energy:
-                player_energy -= weapon.energy
-                player_energy = round(max(0, player_energy), 3)
-                enough_resource_to_use_skill = True
-            if weapon.mana is not None and player_mana >= weapon.mana:
-                player_mana -= weapon.mana
-                player_mana = round(max(0, player_mana), 3)
-                enough_resource_to_use_skill = True
-
-            if enough_resource_to_use_skill:
-                # Updating weapon cooldowns
-                cooldowns[wep_name] = weapon.cooldown_s + weapon.casttime_s
-
-                # Updating weapon damage
-                match wep_name:
-                    case "repeater":
-                        dmg = fighter_handle.repeater_damage().regular_damage
-                    case "cleaving_strike":
-                        dmg = fighter_handle.cleaving_strike_damage().regular_damage
-                    case "reckless_slam":
-                        dmg = fighter_handle.reckless_slam_damage().regular_damage
+@dataclasses.dataclass
+class Cast:
+    time: Decimal
+    weapon: str
+    energy_left: float
+    mana_left: float
+    bleed_bonus: bool = False  # breaker on a bleeding target
+
+
+def fighter_rotation(fighter_handle: FighterDamage) -> dict[str, FighterWeaponStats | Pot]:
+    # Weapons in priority order, the first one off cooldown with enough resource is used
+    return {
+        "repeater": fighter_handle.fighter_info.weapons.repeater,
+        "cleaving_strike": fighter_handle.fighter_info.weapons.cleaving_strike,
+        "reckless_slam": fighter_handle.fighter_info.weapons.reckless_slam,
+        "breaker": fighter_handle.fighter_info.weapons.breaker,
+        "tear": fighter_handle.fighter_info.weapons.tear,
+        "shiver": fighter_handle.fighter_info.weapons.shiver,
+        "cata_staff": fighter_handle.fighter_info.weapons.cata_staff,
+        "energy_pot": Pot(name="energy", resource=20, cooldown=60, cast_time=0.5),
+    }
+
+
+def rotation_casts(fighter_handle: FighterDamage, weapons_in_use: dict[str, FighterWeaponStats | Pot], duration: float = 125, tick: float = 0.1,
+                   verbose: bool = False) -> Iterator[Cast]:
+    """
+        Walks the fight tick by tick and yields every weapon use. Damage never feeds back into the resources or the
+        cooldowns, so the casts are the same from run to run, only their damage is random.
+
+    """
+    # Simulation settings
+    energy_regen_per_sec = fighter_handle.player_stats.energy_regen
+    mana_regen_per_sec = fighter_handle.player_stats.mana_regen
+    max_energy = fighter_handle.player_stats.energy
+    max_mana = fighter_handle.player_stats.mana
+
+    # Runtime state
+    player_energy = max_energy
+    player_mana = max_mana
+    status_effects: list[StatusEffects] = []
+    cooldowns: Dict[str, float] = {w: 0.0 for w in weapons_in_use}
+    time = Decimal("0.0")
+
+    while time < duration:
+        # Every second it updated mana/energy
+        if time % 1 == 0:
+            player_energy = round(min([max_energy, player_energy + energy_regen_per_sec]), 3)
+            player_mana = round(min([max_mana, player_mana + mana_regen_per_sec]), 3)
+            if verbose:
+                print(f"New energy {player_energy}")
+                print(f"New mana {player_mana}")
+
+            if len(status_effects) > 0:
+                for effect in status_effects[:]:
+                    if time > effect.end_time:
+                        status_effects.remove(effect)
+
+        # try to attack (priority order)
+        for wep_name, weapon in weapons_in_use.items():
+            if cooldowns[wep_name] <= 0:
+                # Using Pot
+                if isinstance(weapon, Pot):
+                    match weapon.name:
+                        case "energy":
+                            player_energy += weapon.resource
+                            player_energy = round(min(max_energy, player_energy), 3)
+                            if verbose:
+                                print(f"Energy pot used. Player energy: {player_energy}")
+                        case "mana":
+                            player_mana += weapon.resource
+                            player_mana = round(min(max_mana, player_mana), 3)
+                            if verbose:
+                                print(f"Mana pot used. Player mana: {player_mana}")
+
+                    cooldowns[wep_name] = weapon.cooldown + weapon.cast_time
+                    continue
+
+                # Controlling mana/energy
+                enough_resource_to_use_skill = False
+                if weapon.energy is not None and player_energy >= weapon.energy:
+                    player_energy -= weapon.energy
+                    player_energy = round(max(0, player_energy), 3)
+                    enough_resource_to_use_skill = True
+                if weapon.mana is not None and player_mana >= weapon.mana:
+                    player_mana -= weapon.mana
+                    player_mana = round(max(0, player_mana), 3)
+                    enough_resource_to_use_skill = True
+
+                if enough_resource_to_use_skill:
+                    # Updating weapon cooldowns
+                    cooldowns[wep_name] = weapon.cooldown_s + weapon.casttime_s
+
+                    bleed_bonus = wep_name == "breaker" and any(status_effect.name == "bleed" for status_effect in status_effects)
+                    if wep_name == "reckless_slam":
                         status_effects.append(StatusEffects(name="bleed", start_time=time, end_time=time + 5))
-                    case "breaker":
-                        for status_effect in status_effects:
-                            if status_effect.name == "bleed":
-                                dmg = fighter_handle.breaker_damage(bleed_bonus=True).regular_damage
-                                break
-                        else:
-                            dmg = fighter_handle.breaker_damage(bleed_bonus=False).regular_damage
-
-                    case "tear":
-                        dmg = fighter_handle.tear_damage().regular_damage
-                    case "shiver":
-                        dmg = fighter_handle.shiver_damage().regular_damage
-                    case "cata_staff":
-                        dmg = fighter_handle.cata_staff_damage().regular_damage
-                    case _:
-                        raise ValueError("Unknown Wep Name")
-                weapons_damage[wep_name] += dmg
-                weapons_count[wep_name] += 1
-                print(f"{time:4.1f}s: Used {wep_name}, dealt {dmg}, energy left {player_energy:.1f}, mana left {player_mana}")
-
-    # tick down cooldowns
-    for k in cooldowns:
-        cooldowns[k] = max([0, cooldowns[k] - 0.1])
-
-    time += Decimal(str(tick))
-
-print("\n=== COMBAT REPORT ===")
-total_dps = 0
-print(f"Fight Duration in seconds: {duration}")
-for wep, wep_damage in weapons_damage.items():
-    print(f"Weapon: {wep}")
-    dps = round(wep_damage / duration, 3)
-    total_dps += dps
-    print(f"DPS: {dps}")
-
-    if weapons_in_use[wep].energy is not None:
-        resource_cost = weapons_in_use[wep].energy
-    elif weapons_in_use[wep].mana is not None:
-        resource_cost = weapons_in_use[wep].mana
-    else:
-        resource_cost = 1
-    print(f"Wep Use Count: {weapons_count[wep]}")
-    print(f"DPS/resource_cost: {dps/(1 if resource_cost == 0 else resource_cost)}")
-    print(f"Efficiency ((DPS/Total Energy Used)*100): {(dps/(weapons_count[wep] * (1 if resource_cost == 0 else resource_cost)))*100}")
-    print("\n")
-
-print(f"TOTAL DPS: {total_dps}")
+                    yield Cast(time=time, weapon=wep_name, energy_left=player_energy, mana_left=player_mana, bleed_bonus=bleed_bonus)
+
+        # tick down cooldowns
+        for k in cooldowns:
+            cooldowns[k] = max([0, cooldowns[k] - 0.1])
+
+        time += Decimal(str(tick))
+
+
+def cast_damage(fighter_handle: FighterDamage, cast: Cast) -> float:
+    # Updating weapon damage
+    match cast.weapon:
+        case "repeater":
+            return fighter_handle.repeater_damage().regular_damage
+        case "cleaving_strike":
+            return fighter_handle.cleaving_strike_damage().regular_damage
+        case "reckless_slam":
+            return fighter_handle.reckless_slam_damage().regular_damage
+        case "breaker":
+            return fighter_handle.breaker_damage(bleed_bonus=cast.bleed_bonus).regular_damage
+        case "tear":
+            return fighter_handle.tear_damage().regular_damage
+        case "shiver":
+            return fighter_handle.shiver_damage().regular_damage
+        case "cata_staff":
+            return fighter_handle.cata_staff_damage().regular_damage
+        case _:
+            raise ValueError("Unknown Wep Name")
+
+
+def simulate_fight(fighter_handle: FighterDamage, weapons_in_use: dict[str, FighterWeaponStats | Pot], duration: float = 125, tick: float = 0.1,
+                   verbose: bool = False) -> tuple[dict[str, float], dict[str, float]]:
+    # One stochastic run, damage and use count per weapon
+    weapons_damage: dict[str, float] = {name: 0 for name, weapon in weapons_in_use.items() if not isinstance(weapon, Pot)}
+    weapons_count: dict[str, float] = dict(weapons_damage)
+    for cast in rotation_casts(fighter_handle, weapons_in_use, duration, tick, verbose):
+        dmg = cast_damage(fighter_handle, cast)
+        weapons_damage[cast.weapon] += dmg
+        weapons_count[cast.weapon] += 1
+        if verbose:
+            print(f"{cast.time:4.1f}s: Used {cast.weapon}, dealt {dmg}, energy left {cast.energy_left:.1f}, mana left {cast.mana_left}")
+    return weapons_damage, weapons_count
+
+
+def print_combat_report(weapons_in_use: dict[str, FighterWeaponStats | Pot], weapons_damage: dict[str, float], weapons_count: dict[str, float], duration: float):
+    print("\n=== COMBAT REPORT ===")
+    total_dps = 0
+    print(f"Fight Duration in seconds: {duration}")
+    for wep, wep_damage in weapons_damage.items():
+        print(f"Weapon: {wep}")
+        dps = round(wep_damage / duration, 3)
+        total_dps += dps
+        print(f"DPS: {dps}")
+
+        if weapons_in_use[wep].energy is not None:
+            resource_cost = weapons_in_use[wep].energy
+        elif weapons_in_use[wep].mana is not None:
+            resource_cost = weapons_in_use[wep].mana
+        else:
+            resource_cost = 1
+        print(f"Wep Use Count: {weapons_count[wep]}")
+        print(f"DPS/resource_cost: {dps/(1 if resource_cost == 0 else resource_cost)}")
+        print(f"Efficiency ((DPS/Total Energy Used)*100): {(dps/(weapons_count[wep] * (1 if resource_cost == 0 else resource_cost)))*100}")
+        print("\n")
+
+    print(f"TOTAL DPS: {total_dps}")
+
+
+if __name__ == '__main__':
+    player_name = input("Enter your player name to use the numbers fitted from your fight logs (calibration.json) or press ENTER to skip: ")
+    fighter = FighterDamage(player_constants(player_name))
+    rotation = fighter_rotation(fighter)
+    fight_duration = 125  # simulate 20 seconds
+
+    print("=== Combat Simulation Start ===")
+    damage_per_weapon, uses_per_weapon = simulate_fight(fighter, rotation, fight_duration, verbose=True)
+    print_combat_report(rotation, damage_per_weapon, uses_per_weapon, fight_duration)
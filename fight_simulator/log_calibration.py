@@ -0,0 +1,321 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from functools import partial
+from typing import Dict, Iterable
+
+import numpy as np
+
+from boss_dps_prediction.boss_dps_prediction import boss_name_hp_map
+from combat_report.fight_log_columns import FightEventColumns, find_fight_logs, read_fight_log_columns
+from fight_simulator.class_configs.models.calibration import AbilityCalibration, Calibration, PlayerCalibration
+from fight_simulator.class_configs.weapon_damage_calulator import CALIBRATION_JSON
+
+# Regular hits are histogrammed over their ability's mean in the same log (1/256 per bin, up to 4x), so logs with
+# different gear can be merged by adding their histograms
+_BINS_PER_MEAN = 256
+_HISTOGRAM_BINS = 4 * _BINS_PER_MEAN
+_RESOURCES = ("mana", "energy")
+# Attack names that don't identify one skill, null attacks are stored as "None"
+UNRESOLVED_ATTACKS = frozenset({"None", "Unknown Skill"})
+
+
+@dataclass
+class LogStatistics:
+    """
+        Sufficient statistics of one or more fight logs, keyed by (player, ability, heal). Everything adds up, so
+        logs are fitted on their own (in parallel) and merged afterwards.
+
+    """
+    event_count: int
+    log_count: int
+    keys: list[tuple[str, str, bool]]
+    hits: np.ndarray  # (keys,) regular hits and crits
+    misses: np.ndarray
+    crits: np.ndarray
+    regular_sum: np.ndarray
+    regular_square_sum: np.ndarray
+    crit_sum: np.ndarray
+    histogram: np.ndarray  # (keys, _HISTOGRAM_BINS) regular hits over their mean in the log
+    regen: Dict[tuple[str, str], tuple[float, float]]  # (player, resource): (gained, seconds)
+
+    def merge(self, other: "LogStatistics") -> "LogStatistics":
+        keys = list(dict.fromkeys(self.keys + other.keys))
+        index = {key: position for position, key in enumerate(keys)}
+
+        def combined(column: str) -> np.ndarray:
+            first, second = getattr(self, column), getattr(other, column)
+            merged = np.zeros((len(keys),) + first.shape[1:], dtype=first.dtype)
+            np.add.at(merged, [index[key] for key in self.keys], first)
+            np.add.at(merged, [index[key] for key in other.keys], second)
+            return merged
+
+        regen = dict(self.regen)
+        for key, (gained, seconds) in other.regen.items():
+            previous_gained, previous_seconds = regen.get(key, (0.0, 0.0))
+            regen[key] = (previous_gained + gained, previous_seconds + seconds)
+
+        return LogStatistics(
+            self.event_count + other.event_count, self.log_count + other.log_count, keys,
+            *(combined(column) for column in ("hits", "misses", "crits", "regular_sum", "regular_square_sum", "crit_sum", "histogram")),
+            regen=regen,
+        )
+
+
+def _regen_statistics(columns: FightEventColumns) -> Dict[tuple[str, str], tuple[float, float]]:
+    """
+        Every row carries the Mana/Energy of the player who recorded the log: the attacker of Outgoing rows, the
+        defender of Incoming rows (Other rows don't say who that is and are skipped). Regen comes in ticks and the
+        amounts are whole numbers, so the rate is the gain over every interval the resource didn't drop in, quiet
+        ones included. Intervals that spent something are left out together with any tick in them, and intervals
+        starting at the cap (the highest value logged) because nothing can regenerate there. A player who spends as
+        soon as a tick makes it affordable hides some ticks in spending intervals, so the rate can read a few
+        percent low.
+
+    """
+    recorder = np.full(columns.event_count, -1, dtype=np.int64)
+    for direction, side in (("Outgoing", columns.attacker), ("Incoming", columns.defender)):
+        if direction in columns.directions:
+            rows = columns.direction == columns.directions.index(direction)
+            recorder[rows] = side[rows]
+
+    regen = {}
+    for resource in _RESOURCES:
+        amount = getattr(columns, resource)
+        logged = np.flatnonzero((amount >= 0) & (recorder >= 0))
+        if len(logged) < 2:
+            continue
+        order = logged[np.lexsort((columns.time_s[logged], recorder[logged]))]
+        player, time_s, amount = recorder[order], columns.time_s[order], amount[order].astype(np.float64)
+        cap = np.zeros(len(columns.names))
+        np.maximum.at(cap, player, amount)
+        gained, seconds = np.diff(amount), np.diff(time_s)
+        regenerating = (player[1:] == player[:-1]) & (gained >= 0) & (amount[:-1] < cap[player[:-1]])
+        players = player[1:][regenerating]
+        gained_sum = np.bincount(players, gained[regenerating], minlength=len(columns.names))
+        seconds_sum = np.bincount(players, seconds[regenerating], minlength=len(columns.names))
+        for code in np.flatnonzero(seconds_sum):
+            regen[(columns.names[code], resource)] = (float(gained_sum[code]), float(seconds_sum[code]))
+    return regen
+
+
+def _party_members(columns: FightEventColumns, bosses: Iterable[str], heal: np.ndarray, attempt: np.ndarray) -> np.ndarray:
+    """
+        Party member mask over the name codes: whoever recorded the log, heals or gets healed, or attacks a boss.
+        Bosses and trash that only attacks the party are left out.
+
+    """
+    is_boss = np.isin(np.asarray(columns.names, dtype=object), list(bosses))
+    party = np.zeros(len(columns.names), dtype=bool)
+    for direction, side in (("Outgoing", columns.attacker), ("Incoming", columns.defender)):
+        if direction in columns.directions:
+            party[side[columns.direction == columns.directions.index(direction)]] = True
+    party[columns.attacker[heal]] = True
+    party[columns.defender[heal]] = True
+    party[columns.attacker[attempt & is_boss[columns.defender]]] = True
+    return party & ~is_boss
+
+
+def log_statistics(columns: FightEventColumns, bosses: Iterable[str] = boss_name_hp_map) -> LogStatistics:
+    # Party heals and party attacks on anyone outside the party (misses included), grouped by player, ability and
+    # heal with a bincount per statistic
+    heal = columns.effect_type == columns.effect_types.index("Heal") if "Heal" in columns.effect_types else np.zeros(columns.event_count, dtype=bool)
+    miss = columns.result == columns.results.index("Miss") if "Miss" in columns.results else np.zeros(columns.event_count, dtype=bool)
+    damage = columns.effect_type == columns.effect_types.index("Damage") if "Damage" in columns.effect_types else np.zeros(columns.event_count, dtype=bool)
+    attempt = (damage | miss) & ~heal
+    party = _party_members(columns, bosses, heal, attempt)
+    rows = np.flatnonzero(party[columns.attacker] & (heal | (attempt & ~party[columns.defender])))
+
+    # attack is -1 when null, shifted so it indexes ["None"] + attacks
+    attack_count = len(columns.attacks) + 1
+    combined_key = (columns.attacker[rows].astype(np.int64) * attack_count + columns.attack[rows] + 1) * 2 + heal[rows]
+    unique_keys, group = np.unique(combined_key, return_inverse=True)
+    attack_names = ["None"] + columns.attacks
+    keys = [(columns.names[key // 2 // attack_count], attack_names[key // 2 % attack_count], bool(key % 2)) for key in unique_keys.tolist()]
+
+    value = columns.value[rows].astype(np.float64)
+    row_miss, row_crit = miss[rows], columns.crit[rows] & ~miss[rows]
+    regular = ~row_miss & ~row_crit
+    groups = len(keys)
+
+    def count(mask: np.ndarray, weights: np.ndarray | None = None) -> np.ndarray:
+        return np.bincount(group[mask], None if weights is None else weights[mask], minlength=groups)
+
+    regular_count, regular_sum = count(regular), count(regular, value)
+    log_mean = regular_sum / np.maximum(regular_count, 1)
+    relative = value[regular] / np.maximum(log_mean[group[regular]], 1)
+    relative_bin = np.minimum((relative * _BINS_PER_MEAN).astype(np.int64), _HISTOGRAM_BINS - 1)
+    histogram = np.bincount(group[regular] * _HISTOGRAM_BINS + relative_bin, minlength=groups * _HISTOGRAM_BINS)
+    return LogStatistics(
+        event_count=columns.event_count, log_count=1, keys=keys,
+        hits=count(~row_miss), misses=count(row_miss), crits=count(row_crit),
+        regular_sum=regular_sum, regular_square_sum=count(regular, value * value), crit_sum=count(row_crit, value),
+        histogram=histogram.reshape(groups, _HISTOGRAM_BINS),
+        regen=_regen_statistics(columns),
+    )
+
+
+def _fight_log_statistics(fight_log_json: Path, bosses: Iterable[str] = boss_name_hp_map) -> LogStatistics:
+    return log_statistics(read_fight_log_columns(fight_log_json), bosses)
+
+
+def _histogram_quantiles(histogram: np.ndarray, quantiles: Iterable[float]) -> np.ndarray:
+    # Center of the bin the quantile falls in, as a multiple of the mean
+    cumulative = np.cumsum(histogram)
+    bins = np.searchsorted(cumulative, np.asarray(list(quantiles)) * cumulative[-1])
+    return (np.minimum(bins, _HISTOGRAM_BINS - 1) + 0.5) / _BINS_PER_MEAN
+
+
+def _ability_calibration(statistics: LogStatistics, index: int, ability: str, heal: bool) -> AbilityCalibration:
+    hits, misses, crits = int(statistics.hits[index]), int(statistics.misses[index]), int(statistics.crits[index])
+    regular = hits - crits
+    mean = statistics.regular_sum[index] / regular if regular else 0.0
+    variance = max(statistics.regular_square_sum[index] / regular - mean ** 2, 0.0) if regular else 0.0
+    low, high = _histogram_quantiles(statistics.histogram[index], (0.01, 0.99)) if regular and ability not in UNRESOLVED_ATTACKS else (None, None)
+    return AbilityCalibration(
+        heal=heal, hits=hits, misses=misses, crits=crits,
+        hit_chance_percent=100 * hits / (hits + misses) if hits + misses else 100.0,
+        crit_rate=crits / hits if hits else 0.0,
+        crit_multiplier=statistics.crit_sum[index] / crits / mean if crits and mean else None,
+        mean=mean, std=variance ** 0.5,
+        variance_low=None if low is None else float(low), variance_high=None if high is None else float(high),
+    )
+
+
+def calibration_from_statistics(statistics: LogStatistics) -> Calibration:
+    """
+        Per ability numbers, plus the player's damage abilities pooled (weighted by their hits) for the simulator,
+        which can't tell the logged ability names apart from its weapons. Heals are only logged up to missing HP,
+        so overhealing skews their spread and they are left out of the pooled numbers. The spread is only pooled
+        over named abilities, without any the simulator keeps its own.
+
+    """
+    players: Dict[str, PlayerCalibration] = {}
+    for index, (player, ability, heal) in enumerate(statistics.keys):
+        players.setdefault(player, PlayerCalibration()).abilities[f"{ability} (heal)" if heal else ability] = _ability_calibration(statistics, index, ability, heal)
+
+    for player, calibration in players.items():
+        damage = [ability for ability in calibration.abilities.values() if not ability.heal]
+        hits, misses = sum(ability.hits for ability in damage), sum(ability.misses for ability in damage)
+        if hits + misses:
+            calibration.hit_chance_percent = 100 * hits / (hits + misses)
+
+        scored = [ability for ability in damage if ability.hits and ability.mean]
+        weight = sum(ability.hits for ability in scored)
+        if weight:
+            calibration.crit_rate = sum(ability.crits for ability in scored) / weight
+            critted = [ability for ability in scored if ability.crit_multiplier is not None]
+            if critted:
+                calibration.crit_multiplier = sum(ability.crit_multiplier * ability.crits for ability in critted) / sum(ability.crits for ability in critted)
+
+        named = [ability for ability in scored if ability.variance_low is not None]
+        named_weight = sum(ability.hits for ability in named)
+        if named_weight:
+            calibration.variance_low = sum(ability.variance_low * ability.hits for ability in named) / named_weight
+            calibration.variance_high = sum(ability.variance_high * ability.hits for ability in named) / named_weight
+
+    for (player, resource), (gained, seconds) in statistics.regen.items():
+        setattr(players.setdefault(player, PlayerCalibration()), f"{resource}_regen", gained / seconds)
+
+    return Calibration(log_count=statistics.log_count, event_count=statistics.event_count, players=players)
+
+
+def fit_calibration(fight_log_jsons: list[Path], bosses: Iterable[str] = boss_name_hp_map, workers: int | None = None) -> Calibration:
+    """
+        Every log is read and reduced to its statistics in its own process (parsing holds the GIL, like
+        load_fight_logs_concurrently), only the small statistics are sent back and merged here. Only party members
+        are calibrated, bosses are the names in bosses.
+
+    """
+    if not fight_log_jsons:
+        raise ValueError("No fight logs to calibrate from")
+
+    fit = partial(_fight_log_statistics, bosses=frozenset(bosses))
+    workers = min(workers or os.cpu_count() or 1, len(fight_log_jsons))
+    if workers == 1:
+        statistics = [fit(fight_log_json) for fight_log_json in fight_log_jsons]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            statistics = list(executor.map(fit, fight_log_jsons))
+
+    merged = statistics[0]
+    for log in statistics[1:]:
+        merged = merged.merge(log)
+    return calibration_from_statistics(merged)
+
+
+def write_calibration(calibration: Calibration, calibration_json: Path = CALIBRATION_JSON):
+    calibration_json.parent.mkdir(parents=True, exist_ok=True)
+    with open(calibration_json, "w") as f:
+        json.dump(calibration.model_dump(), f, indent=2)
+
+
+def print_calibration(calibration: Calibration):
+    print(f"Calibrated from {calibration.log_count} logs, {calibration.event_count:,} events")
+    for player, player_calibration in sorted(calibration.players.items()):
+        numbers = [f"{name} {getattr(player_calibration, name):.3g}" for name in
+                   ("hit_chance_percent", "crit_rate", "crit_multiplier", "variance_low", "variance_high", "energy_regen", "mana_regen")
+                   if getattr(player_calibration, name) is not None]
+        print(f"{player}: {', '.join(numbers)}")
+
+
+def benchmark_log_calibration(log_count: int = 8, events_per_log: int = 200_000, workers: int | None = None):
+    """
+        Fits log_count synthetic logs serially and in parallel. The generator rolls 1% misses, 10% crits at 1.5x and
+        regular hits spread 0.8-1.2 around the mean and regenerates the recording player's Energy/Mana, which is what
+        the fit has to get back.
+
+    """
+    import tempfile
+
+    from combat_report.fight_log_generator import SyntheticFightSpec, write_synthetic_fight_log
+
+    regen = {"energy_regen": 2.0, "mana_regen": 3.2}
+    with tempfile.TemporaryDirectory() as logs_dir:
+        fight_log_jsons = []
+        for seed in range(log_count):
+            fight_log_json = Path(logs_dir) / f"fight-log-{seed}.json"
+            write_synthetic_fight_log(fight_log_json, SyntheticFightSpec.for_event_count(events_per_log, seed=seed, **regen))
+            fight_log_jsons.append(fight_log_json)
+
+        start = time.perf_counter()
+        serial = fit_calibration(fight_log_jsons, workers=1)
+        serial_s = time.perf_counter() - start
+        start = time.perf_counter()
+        parallel = fit_calibration(fight_log_jsons, workers=workers)
+        parallel_s = time.perf_counter() - start
+
+    assert serial == parallel, "parallel fit differs from the serial one"
+    assert set(parallel.players) == set(SyntheticFightSpec.players), f"calibrated {sorted(parallel.players)}, bosses included"
+    recorder = SyntheticFightSpec.players[0]
+    for player, calibration in parallel.players.items():
+        for resource, rate in regen.items():
+            fitted = getattr(calibration, resource)
+            if player == recorder:
+                assert fitted is not None and abs(fitted / rate - 1) < 0.1, f"{player} {resource} {fitted}"
+            else:
+                assert fitted is None, f"{player} didn't record a log but got {resource} {fitted}"
+    for player, calibration in parallel.players.items():
+        if calibration.crit_rate is None:
+            continue
+        assert abs(calibration.hit_chance_percent - 99) < 0.5, f"{player} hit chance {calibration.hit_chance_percent}"
+        assert abs(calibration.crit_rate - 0.1) < 0.01, f"{player} crit rate {calibration.crit_rate}"
+        assert abs(calibration.crit_multiplier - 1.5) < 0.02, f"{player} crit multiplier {calibration.crit_multiplier}"
+        assert abs(calibration.variance_low - 0.8) < 0.03 and abs(calibration.variance_high - 1.2) < 0.03, f"{player} variance"
+
+    print(f"{log_count} logs x {events_per_log:,} events: serial {serial_s:.2f}s, parallel {parallel_s:.2f}s ({os.cpu_count()} cpus)")
+    print_calibration(parallel)
+
+
+if __name__ == '__main__':
+    logs_directory = Path(input("Enter the fight logs directory or press ENTER for combat_report: ") or Path(__file__).parents[1] / "combat_report")
+    output_json = Path(input(f"Enter the calibration file or press ENTER for {CALIBRATION_JSON}: ") or CALIBRATION_JSON)
+    print()
+
+    fitted = fit_calibration(find_fight_logs(logs_directory))
+    print_calibration(fitted)
+    write_calibration(fitted, output_json)
+    print(f"\nSaved to {output_json}, load a player's with weapon_damage_calulator.player_constants")
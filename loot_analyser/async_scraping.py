@@ -0,0 +1,164 @@
+import asyncio
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+
+from playwright.async_api import Page, async_playwright
+from playwright.sync_api import sync_playwright
+
+from loot_analyser.dom_fixtures import INVENTORY_FIXTURE, serve_fixtures, write_inventory_fixture
+from loot_analyser.inventory_snapshots import InventorySnapshotStore
+from loot_analyser.item_store import ItemStore
+from loot_analyser.loot_items import ArmorItem, WeaponItem
+from loot_analyser.stein_inventory_scrapping import SteinLootAppraiser
+from loot_analyser.tooltip_extraction import INVENTORY_SLOT_SELECTOR, NEED_OR_GREED_SLOT_SELECTOR, READ_SLOT_FINGERPRINTS_JS, READ_SLOTS_HTML_JS, parse_tooltip_html
+
+
+class AsyncSteinLootAppraiser(SteinLootAppraiser):
+    """
+        asyncio version of the appraiser. The slots are clicked and their tooltip markup copied out of the page in
+        batches, one evaluate per batch_size slots, and the BeautifulSoup parsing of a batch runs in a thread pool
+        while the next batch is read.
+
+        There is only one tooltip in the game, so every batch holds the tooltip lock and the browser side is serial.
+        The inventory and the need-or-greed window can be captured at the same time, their batches just never
+        interleave. What overlaps is the parsing with the browser round trips.
+
+    """
+    def __init__(self, page: Page, parse_workers: int = 4, batch_size: int = 16, item_store: ItemStore | None = None,
+                 snapshot_store: InventorySnapshotStore | None = None):
+        super().__init__(None, page=page, item_store=item_store, snapshot_store=snapshot_store)
+        self.batch_size = batch_size
+        self._tooltip_lock = asyncio.Lock()
+        self._parse_pool = ThreadPoolExecutor(max_workers=parse_workers)
+
+    async def _read_slots(self, slot_selector: str, slot_indexes: list[int] | None = None) -> list[WeaponItem | ArmorItem | None]:
+        # Every slot unless slot_indexes is given
+        if slot_indexes is None:
+            slot_indexes = list(range(await self.page.locator(slot_selector).count()))
+        loop = asyncio.get_running_loop()
+        parsed = []
+        for first in range(0, len(slot_indexes), self.batch_size):
+            batch = slot_indexes[first:first + self.batch_size]
+            async with self._tooltip_lock:
+                tooltips = await self.page.evaluate(READ_SLOTS_HTML_JS, {"slotSelector": slot_selector, "slotIndexes": batch})
+            # Parsing overlaps with the next batch's round trip
+            parsed += [loop.run_in_executor(self._parse_pool, parse_tooltip_html, tooltip_html) for tooltip_html in tooltips]
+        return list(await asyncio.gather(*parsed))
+
+    async def get_item_info_from_inventory_async(self, full_rescan: bool = False) -> dict:
+        # Same steps as take_inventory_snapshot: only the slots whose fingerprint changed are read, the history gets a
+        # new version and the item store only the rows that changed
+        fingerprints = await self.page.evaluate(READ_SLOT_FINGERPRINTS_JS, INVENTORY_SLOT_SELECTOR)
+        changed = list(range(len(fingerprints))) if full_rescan else self.snapshot_store.changed_slots(fingerprints)
+        read_items = await self._read_slots(INVENTORY_SLOT_SELECTOR, changed) if changed else []
+        self.snapshot_store.commit(fingerprints, dict(zip(changed, read_items)))
+        inventory_info = self.collect_items(self.snapshot_store.items())
+        self.item_store.update(inventory_info)
+        return inventory_info
+
+    async def get_loot_information_list_async(self) -> dict:
+        return self.collect_items(await self._read_slots(NEED_OR_GREED_SLOT_SELECTOR))
+
+    async def main_application_async(self):
+        user_input = input(
+            "Press 1 to grab inventory data from inventory. Press anything else to use the last saved snapshot.")
+
+        if user_input == "1":
+            _, drop_item_info = await asyncio.gather(self.get_item_info_from_inventory_async(), self.get_loot_information_list_async())
+        else:
+            drop_item_info = await self.get_loot_information_list_async()
+
+        print(f"There are {'some' if drop_item_info else 'no'} item drops!")
+        self.compare_loot_with_inventory(self.item_store, drop_item_info)
+
+    def close(self):
+        self._parse_pool.shutdown()
+
+
+async def run_async_appraiser():
+    async with async_playwright() as p:
+        browser = await p.chromium.connect_over_cdp("http://localhost:9222")
+        appraiser = AsyncSteinLootAppraiser(browser.contexts[0].pages[0])  # Get first open tab
+        try:
+            await appraiser.main_application_async()
+        finally:
+            appraiser.close()
+
+
+def benchmark_inventory_capture(fixture_html: Path = INVENTORY_FIXTURE, repeats: int = 3):
+    """
+        End to end inventory capture on the locally served fixture: the sync slot by slot loop against the async
+        pipelined capture. Both have to return the same items. Also times an async refresh into empty stores and one
+        with nothing changed, which only fingerprints the slots.
+
+    """
+    def item_dicts(items: dict) -> dict:
+        return {name: asdict(item) for name, item in items.items()}
+
+    with serve_fixtures(fixture_html.parent) as base_url:
+        fixture_url = f"{base_url}/{fixture_html.name}"
+
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.goto(fixture_url)
+            appraiser = SteinLootAppraiser(p, page=page)
+            slots = page.locator(INVENTORY_SLOT_SELECTOR)
+
+            best_sync_s = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                tool_tips = []
+                for i in range(slots.count()):
+                    slots.nth(i).click()
+                    tool_tips.append(appraiser.parse_item_info_with_locators())
+                sync_items = appraiser.collect_items(tool_tips)
+                best_sync_s = min(best_sync_s, time.perf_counter() - start)
+            browser.close()
+
+        async def capture_async() -> tuple[float, dict]:
+            async with async_playwright() as p:
+                browser = await p.chromium.launch()
+                page = await browser.new_page()
+                await page.goto(fixture_url)
+                appraiser = AsyncSteinLootAppraiser(page)
+                best_s = float("inf")
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    items = appraiser.collect_items(await appraiser._read_slots(INVENTORY_SLOT_SELECTOR))
+                    best_s = min(best_s, time.perf_counter() - start)
+                appraiser.close()
+
+                with tempfile.TemporaryDirectory() as work_dir, ItemStore(Path(work_dir) / "inventory.sqlite3") as item_store:
+                    appraiser = AsyncSteinLootAppraiser(page, item_store=item_store, snapshot_store=InventorySnapshotStore(Path(work_dir) / "snapshots.jsonl"))
+                    start = time.perf_counter()
+                    refreshed_items = await appraiser.get_item_info_from_inventory_async()
+                    refresh_s["first refresh"] = time.perf_counter() - start
+                    start = time.perf_counter()
+                    await appraiser.get_item_info_from_inventory_async()
+                    refresh_s["unchanged refresh"] = time.perf_counter() - start
+                    assert item_dicts(refreshed_items) == item_dicts(items) and item_store.items().keys() == items.keys(), "Async refresh stored different items"
+                    appraiser.close()
+                await browser.close()
+                return best_s, items
+
+        refresh_s: dict[str, float] = {}
+        best_async_s, async_items = asyncio.run(capture_async())
+
+    assert item_dicts(async_items) == item_dicts(sync_items), "Async capture read different items than the sync loop"
+    print(f"sync slot by slot loop: {len(sync_items)} items in {best_sync_s:.3f}s")
+    print(f"async pipelined capture: {len(async_items)} items in {best_async_s:.3f}s ({best_sync_s / best_async_s:.1f}x faster)")
+    for refresh, seconds in refresh_s.items():
+        print(f"async {refresh}: {seconds * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    if input("Press 1 to benchmark against the local inventory fixture. Press anything else to appraise the loot in the game: ") == "1":
+        if not INVENTORY_FIXTURE.is_file():
+            write_inventory_fixture()
+        benchmark_inventory_capture()
+    else:
+        asyncio.run(run_async_appraiser())
@@ -0,0 +1,308 @@
+import html
+import io
+import json
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, redirect_stdout
+from dataclasses import asdict, replace
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator
+
+from playwright.sync_api import sync_playwright
+
+from loot_analyser.loot_items import LEGACY_MARKER, NO_ACTIVATION_COST_ITEM_TYPES, ArmorItem, WeaponItem, item_type_of
+from loot_analyser.tooltip_extraction import CLICK_SLOT_JS, INVENTORY_SLOT_SELECTOR, NEED_OR_GREED_SLOT_SELECTOR, parse_tooltip_html, read_slot_tooltips
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+INVENTORY_FIXTURE = FIXTURES_DIR / "inventory_fixture.html"
+NEED_OR_GREED_FIXTURE = FIXTURES_DIR / "need_or_greed_fixture.html"
+LIVE_FIXTURE = FIXTURES_DIR / "live_capture_fixture.html"
+
+# Tooltips the appraiser has to skip
+SKILL_BOOK_TOOLTIP = '<div class="stein-tooltip-item-name">Skill Book</div><div class="stein-tooltip-item-name">Fireball</div><div class="stein-tooltip-item-type">Skill book</div>'
+POTION_TOOLTIP = '<div class="stein-tooltip-item-name">Small Healing Potion</div><div class="stein-tooltip-item-type">Healing Potion</div>'
+
+ARMOR_STAT_FIELDS = ["item_armor", "item_life", "item_damage", "item_heal", "item_cbr", "item_ccr", "item_mana", "item_mana_regen", "item_life_regen", "item_energy_regen"]
+
+FIXTURE_PAGE_TEMPLATE = """<!doctype html>
+<html>
+<head>
+<title>Stein inventory fixture</title>
+<!-- The slots only hold a template, without a size they render 0px high and Playwright won't click them -->
+<style>.stein-item-inventory-slot {{ width: 48px; height: 48px; display: inline-block; }}</style>
+</head>
+<body>
+<div id="stein-inventory-slots">
+{slots}
+</div>
+{need_or_greed}<div id="stein-tooltip">No item in slot</div>
+<script>
+  // Stand-in for the game: clicking a slot renders its tooltip into div#stein-tooltip
+  const tooltip = document.querySelector("div#stein-tooltip");
+  for (const slot of document.querySelectorAll("div.stein-item-inventory-slot")) {{
+    slot.addEventListener("click", () => {{ tooltip.innerHTML = slot.querySelector("template").innerHTML; }});
+  }}
+</script>
+</body>
+</html>
+"""
+
+# The need-or-greed dialog the game opens when something drops, around the drop slots
+NEED_OR_GREED_TEMPLATE = """<div id="stein-dialog-window-container">
+<div class="stein-need-or-greed">
+<div class="stein-need-or-greed-window stein-window">
+{slots}
+</div>
+</div>
+</div>
+"""
+
+# Copies every slot of a live page: its attributes and the tooltip markup the game renders when it is clicked
+CAPTURE_SLOTS_JS = """
+async (slotSelector) => {
+    CLICK_SLOT_JS
+    const tooltip = document.querySelector("div#stein-tooltip");
+    const captured = [];
+    for (const slot of document.querySelectorAll(slotSelector)) {
+        click(slot);
+        await nextFrame();
+        captured.push({style: slot.getAttribute("style"), title: slot.getAttribute("title") || slot.innerText.trim(), tooltip: tooltip.innerHTML});
+    }
+    return captured;
+}
+""".replace("CLICK_SLOT_JS", CLICK_SLOT_JS.strip())
+
+
+def tooltip_html(item: WeaponItem | ArmorItem | str | None) -> str:
+    """Tooltip markup with the same class names the game uses, so the appraiser's selectors work on it unchanged."""
+    if item is None:
+        return "No item in slot"
+    if isinstance(item, str):
+        return item
+
+    parts = [f'<div class="stein-tooltip-item-name">{html.escape(item.item_name)}</div>']
+    if isinstance(item, ArmorItem):
+        stats = [getattr(item, field) for field in ARMOR_STAT_FIELDS if getattr(item, field) is not None]
+        parts.append(f'<div class="stein-tooltip-item-type">{item_type_of(item) or "Chest"}</div>')
+        parts.append('<ul class="stein-tooltip-item-properties">' + "".join(f"<li>{html.escape(stat)}</li>" for stat in stats) + "</ul>")
+    else:
+        parts.append(f'<div class="stein-tooltip-item-type">{html.escape(item.item_type)}</div>')
+        parts.append(f'<div class="stein-tooltip-item-effect">{html.escape(item.item_description)}</div>')
+        if item.item_type not in NO_ACTIVATION_COST_ITEM_TYPES:
+            parts.append(f'<div class="stein-tooltip-item-activation-cost">{html.escape(item.item_activation_cost or "")}</div>')
+        parts.append(f'<div class="stein-tooltip-item-casttime">{html.escape(item.item_cast_time)}</div>')
+        parts.append(f'<div class="stein-tooltip-item-cooldown">{html.escape(item.item_cooldown_time)}</div>')
+        if item.legacy:
+            parts.append(f"<div>{html.escape(LEGACY_MARKER)}</div>")
+    return "".join(parts)
+
+
+def slot_attributes(item: WeaponItem | ArmorItem | str | None) -> str:
+    # Like the game, a filled slot shows the item image through its style and the item name on hover
+    if item is None:
+        return ""
+    if isinstance(item, str):
+        item_name = re.search(r'stein-tooltip-item-name">([^<]*)<', item).group(1)
+        image = item_name
+    else:
+        item_name = item.item_name
+        image = item_type_of(item) or item.item_name
+    image_file = re.sub(r"[^a-z0-9]+", "-", image.casefold()).strip("-")
+    return f' title="{html.escape(item_name)}" style="background-image: url(&quot;items/{image_file}.png&quot;)"'
+
+
+def slot_html(tooltip: str, attributes: str = "", drop: bool = False) -> str:
+    slot_class = "stein-item-inventory-slot need-or-greed-item" if drop else "stein-item-inventory-slot"
+    return f'<div class="{slot_class}"{attributes}><template>{tooltip}</template></div>'
+
+
+def fixture_page_html(inventory_slots: list[str], drop_slots: list[str] = ()) -> str:
+    # The need-or-greed dialog is only on the page when there are drops, like in the game
+    need_or_greed = NEED_OR_GREED_TEMPLATE.format(slots="\n".join(drop_slots)) if drop_slots else ""
+    return FIXTURE_PAGE_TEMPLATE.format(slots="\n".join(inventory_slots), need_or_greed=need_or_greed)
+
+
+def build_inventory_fixture_html(items: list[WeaponItem | ArmorItem | str | None], drops: list[WeaponItem | ArmorItem] = ()) -> str:
+    return fixture_page_html([slot_html(tooltip_html(item), slot_attributes(item)) for item in items],
+                             [slot_html(tooltip_html(drop), slot_attributes(drop), drop=True) for drop in drops])
+
+
+def load_inventory_snapshot(inventory_json: Path) -> list[WeaponItem | ArmorItem]:
+    with open(inventory_json) as json_file:
+        return [WeaponItem(**item) if "item_description" in item else ArmorItem(**item) for item in json.load(json_file).values()]
+
+
+def write_inventory_fixture(inventory_json: Path = Path(__file__).parent / "inventory_data.json", fixture_html: Path = INVENTORY_FIXTURE) -> Path:
+    # The saved inventory plus a skill book, a potion and an empty slot, so the fixture covers every branch of the parsing
+    fixture_html.parent.mkdir(parents=True, exist_ok=True)
+    items = load_inventory_snapshot(inventory_json) + [SKILL_BOOK_TOOLTIP, POTION_TOOLTIP, None]
+    fixture_html.write_text(build_inventory_fixture_html(items), encoding="utf-8")
+    return fixture_html
+
+
+def need_or_greed_drops(items: list[WeaponItem | ArmorItem]) -> list[WeaponItem | ArmorItem]:
+    # A copy of an item that is already in the bag, a stronger copy, an armor piece and an item that isn't in the bag
+    weapons = [item for item in items if isinstance(item, WeaponItem) and not item.legacy]
+    armor = next(item for item in items if isinstance(item, ArmorItem))
+    stronger = replace(weapons[1], item_description=re.sub(r"\d+", lambda number: str(int(number.group(0)) * 2), weapons[1].item_description, count=2))
+    new_item = replace(weapons[2], item_name=f"{weapons[2].item_name} of the Fixture")
+    return [weapons[0], stronger, armor, new_item]
+
+
+def write_need_or_greed_fixture(inventory_json: Path = Path(__file__).parent / "inventory_data.json", fixture_html: Path = NEED_OR_GREED_FIXTURE) -> Path:
+    # The inventory fixture with a need-or-greed window of drops open
+    fixture_html.parent.mkdir(parents=True, exist_ok=True)
+    items = load_inventory_snapshot(inventory_json)
+    fixture_html.write_text(build_inventory_fixture_html(items + [SKILL_BOOK_TOOLTIP, POTION_TOOLTIP, None], need_or_greed_drops(items)), encoding="utf-8")
+    return fixture_html
+
+
+def _captured_slot_html(captured: dict, drop: bool = False) -> str:
+    attributes = "".join(f' {name}="{html.escape(captured[name])}"' for name in ("title", "style") if captured[name])
+    return slot_html(captured["tooltip"], attributes, drop)
+
+
+def capture_live_fixture(page, fixture_html: Path = LIVE_FIXTURE) -> Path:
+    """
+        Clicks through the inventory and the need-or-greed window of the running game and saves what the tooltips
+        showed as a static fixture page, so later changes can be checked and benchmarked against real markup.
+
+    """
+    inventory_slots = [_captured_slot_html(captured) for captured in page.evaluate(CAPTURE_SLOTS_JS, INVENTORY_SLOT_SELECTOR)]
+    drop_slots = [_captured_slot_html(captured, drop=True) for captured in page.evaluate(CAPTURE_SLOTS_JS, NEED_OR_GREED_SLOT_SELECTOR)]
+    fixture_html.parent.mkdir(parents=True, exist_ok=True)
+    fixture_html.write_text(fixture_page_html(inventory_slots, drop_slots), encoding="utf-8")
+    print(f"Captured {len(inventory_slots)} inventory slots and {len(drop_slots)} drops into {fixture_html}")
+    return fixture_html
+
+
+@contextmanager
+def serve_fixtures(directory: Path = FIXTURES_DIR) -> Iterator[str]:
+    """
+        Serves the fixture pages over http on a free local port (the game is served over http too, file:// pages
+        behave differently for timers and caching). Yields the base url.
+
+    """
+    class QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=str(directory)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def benchmark_tooltip_extraction(fixture_html: Path = INVENTORY_FIXTURE, repeats: int = 3):
+    """
+        Items/sec of the locator by locator reader against one evaluate per slot, the tooltip markup parsed in python
+        (what AsyncSteinLootAppraiser does) and one evaluate for the whole inventory, in headless Chromium on the
+        static fixture. Also checks they all read the same items as parse_item_info_with_locators.
+
+    """
+    # Imported here, the appraiser module pulls in the whole scraping stack
+    from loot_analyser.stein_inventory_scrapping import SteinLootAppraiser
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch()
+        page = browser.new_page()
+        page.goto(fixture_html.resolve().as_uri())
+        appraiser = SteinLootAppraiser(p, page=page)
+        slots = page.locator(INVENTORY_SLOT_SELECTOR)
+        slot_count = slots.count()
+
+        def read_slot_by_slot(parse_item_info) -> list:
+            items = []
+            for i in range(slot_count):
+                slots.nth(i).click()
+                items.append(parse_item_info())
+            return items
+
+        readers = {
+            "locator per field": lambda: read_slot_by_slot(appraiser.parse_item_info_with_locators),
+            "evaluate per slot": lambda: read_slot_by_slot(appraiser.parse_item_info),
+            "tooltip html per slot": lambda: read_slot_by_slot(lambda: parse_tooltip_html(page.inner_html("div#stein-tooltip"))),
+            "evaluate per inventory": lambda: read_slot_tooltips(page),
+        }
+        reference = None
+        for reader_name, reader in readers.items():
+            best_s = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                items = reader()
+                best_s = min(best_s, time.perf_counter() - start)
+
+            items = [None if item is None else asdict(item) for item in items]
+            reference = items if reference is None else reference
+            assert items == reference, f"{reader_name} read different items than the locator reader"
+            print(f"{reader_name:<24} {slot_count} slots in {best_s:.3f}s ({slot_count / best_s:,.0f} items/sec)")
+        browser.close()
+
+
+def benchmark_appraisal_end_to_end(fixture_html: Path = NEED_OR_GREED_FIXTURE, character_class: str = "shaman", repeats: int = 3):
+    """
+        The appraiser's whole run on the served need-or-greed fixture in headless Chromium, stage by stage: full
+        inventory capture into the item store, incremental re-capture, reading the drops and evaluating them.
+
+    """
+    # Imported here, the appraiser module pulls in the whole scraping stack
+    from loot_analyser.inventory_snapshots import InventorySnapshotStore
+    from loot_analyser.item_store import ItemStore
+    from loot_analyser.stein_inventory_scrapping import SteinLootAppraiser
+    from loot_analyser.upgrade_scoring import UpgradeScorer
+
+    stage_s: dict[str, list[float]] = {"full inventory capture": [], "incremental capture": [], "read drops": [], "evaluate drops": []}
+    with serve_fixtures(fixture_html.parent) as base_url, sync_playwright() as p, tempfile.TemporaryDirectory() as work_dir:
+        browser = p.chromium.launch()
+        page = browser.new_page()
+        page.goto(f"{base_url}/{fixture_html.name}")
+
+        for attempt in range(repeats):
+            with ItemStore(Path(work_dir) / f"inventory-{attempt}.sqlite3") as item_store:
+                appraiser = SteinLootAppraiser(p, page=page, item_store=item_store, snapshot_store=InventorySnapshotStore(Path(work_dir) / f"snapshots-{attempt}.jsonl"))
+                with redirect_stdout(io.StringIO()) as output:
+                    start = time.perf_counter()
+                    inventory_info = appraiser.get_item_info_from_inventory(full_rescan=True)
+                    stage_s["full inventory capture"].append(time.perf_counter() - start)
+
+                    start = time.perf_counter()
+                    appraiser.get_item_info_from_inventory()
+                    stage_s["incremental capture"].append(time.perf_counter() - start)
+
+                    start = time.perf_counter()
+                    drop_item_info = appraiser.get_loot_information_list()
+                    stage_s["read drops"].append(time.perf_counter() - start)
+
+                    start = time.perf_counter()
+                    appraiser.compare_loot_with_inventory(item_store, drop_item_info, UpgradeScorer(character_class, item_store.weapons(include_legacy=False)))
+                    stage_s["evaluate drops"].append(time.perf_counter() - start)
+        browser.close()
+
+    verdicts = output.getvalue().count("is an upgrade") + output.getvalue().count("is not an upgrade")
+    print(f"{len(inventory_info)} inventory items, {len(drop_item_info)} drops, {verdicts} verdicts")
+    for stage, timings in stage_s.items():
+        print(f"{stage:<23} {min(timings) * 1000:9.1f}ms")
+
+
+if __name__ == '__main__':
+    fixture_input = input("Press 1 to capture the running game into a fixture. Press 2 for the end to end benchmark. Press anything else to benchmark tooltip extraction: ")
+    if fixture_input == "1":
+        with sync_playwright() as playwright:
+            game_browser = playwright.chromium.connect_over_cdp("http://localhost:9222")
+            capture_live_fixture(game_browser.contexts[0].pages[0])  # Get first open tab
+    elif fixture_input == "2":
+        if not NEED_OR_GREED_FIXTURE.is_file():
+            write_need_or_greed_fixture()
+        benchmark_appraisal_end_to_end()
+    else:
+        if not INVENTORY_FIXTURE.is_file():
+            write_inventory_fixture()
+        benchmark_tooltip_extraction()
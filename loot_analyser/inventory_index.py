@@ -0,0 +1,75 @@
+import json
+import random
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable
+
+from loot_analyser.loot_items import ArmorItem, WeaponItem, item_type_of
+
+
+class InventoryIndex:
+    """
+        Inventory items bucketed by base item name and by item type, so a drop finds every copy of itself and every
+        item it competes with (all "Waterfall", all "Void Hex", all "Head", ...) with two dict lookups.
+        Works the same for one bag or a whole bank/stash snapshot.
+
+    """
+    def __init__(self, items: Iterable[WeaponItem | ArmorItem] = ()):
+        self.items_by_name: dict[str, list[WeaponItem | ArmorItem]] = defaultdict(list)
+        self.items_by_type: dict[str, list[WeaponItem | ArmorItem]] = defaultdict(list)
+        self.item_count: int = 0
+        for item in items:
+            self.add(item)
+
+    def add(self, item: WeaponItem | ArmorItem):
+        self.items_by_name[item.item_name].append(item)
+        self.items_by_type[item_type_of(item)].append(item)
+        self.item_count += 1
+
+    def has_name(self, item_name: str) -> bool:
+        return item_name in self.items_by_name
+
+    def same_name(self, item: WeaponItem | ArmorItem) -> list[WeaponItem | ArmorItem]:
+        return self.items_by_name.get(item.item_name, [])
+
+    def same_type(self, item: WeaponItem | ArmorItem) -> list[WeaponItem | ArmorItem]:
+        item_type = item_type_of(item)
+        # Items without a known type can only be matched by name
+        if item_type is None:
+            return self.same_name(item)
+        return self.items_by_type.get(item_type, [])
+
+
+def benchmark_inventory_lookup(inventory_json: Path = Path(__file__).parent / "inventory_data.json", stash_sizes: tuple[int, ...] = (103, 10_000, 100_000), drop_count: int = 10):
+    """
+        Matching a need-or-greed window of drops against growing stash snapshots (the saved inventory repeated):
+        the old startswith scan over every key against the index.
+
+    """
+    with open(inventory_json) as json_file:
+        saved_items = [WeaponItem(**item) if "item_description" in item else ArmorItem(**item) for item in json.load(json_file).values()]
+    drops = random.Random(0).sample(saved_items, drop_count)
+
+    for stash_size in stash_sizes:
+        stash = [saved_items[i % len(saved_items)] for i in range(stash_size)]
+        inventory_info = {f"{item.item_name}_{i}": item for i, item in enumerate(stash)}
+
+        start = time.perf_counter()
+        for drop in drops:
+            [key for key in inventory_info.keys() if key.startswith(drop.item_name)]
+        scan_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        inventory_index = InventoryIndex(stash)
+        build_s = time.perf_counter() - start
+        start = time.perf_counter()
+        for drop in drops:
+            inventory_index.same_type(drop)
+        lookup_s = time.perf_counter() - start
+
+        print(f"{stash_size:>8,} items: startswith scan {scan_s * 1000:8.3f}ms, index build {build_s * 1000:8.3f}ms + {drop_count} lookups {lookup_s * 1000:.3f}ms")
+
+
+if __name__ == '__main__':
+    benchmark_inventory_lookup()
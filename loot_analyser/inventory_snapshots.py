@@ -0,0 +1,172 @@
+import json
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator
+
+from loot_analyser.loot_items import ArmorItem, WeaponItem
+from loot_analyser.tooltip_extraction import INVENTORY_SLOT_SELECTOR, read_slot_fingerprints, read_slot_tooltips
+
+# Kept next to inventory_data.json in the loot_analyser directory, wherever the appraiser is run from
+SNAPSHOTS_FILE = Path(__file__).parent / "inventory_snapshots.jsonl"
+
+
+@dataclass
+class SlotState:
+    fingerprint: str
+    item: WeaponItem | ArmorItem | None
+
+
+def _item_to_json(item: WeaponItem | ArmorItem | None) -> dict | None:
+    return None if item is None else asdict(item)
+
+
+def _item_from_json(item_data: dict | None) -> WeaponItem | ArmorItem | None:
+    if item_data is None:
+        return None
+    return WeaponItem(**item_data) if "item_description" in item_data else ArmorItem(**item_data)
+
+
+class InventorySnapshotStore:
+    """
+        Versioned inventory snapshots in an append-only jsonl file. Every line is one version holding only the slots
+        whose fingerprint changed since the version before it (the first version holds every slot), so a refresh after
+        a dungeon writes a handful of slots instead of the whole bag. Replaying the lines gives the latest inventory.
+
+    """
+    def __init__(self, snapshots_file: Path = SNAPSHOTS_FILE, up_to_version: int | None = None):
+        self.snapshots_file = Path(snapshots_file)
+        self.version = 0
+        self.slots: list[SlotState | None] = []
+        for delta in self.deltas():
+            if up_to_version is not None and delta["version"] > up_to_version:
+                break
+            self._apply(delta)
+
+    def deltas(self) -> Iterator[dict]:
+        if not self.snapshots_file.is_file():
+            return
+        with open(self.snapshots_file) as snapshots:
+            for line in snapshots:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _apply(self, delta: dict):
+        slot_count = delta["slot_count"]
+        self.slots = self.slots[:slot_count] + [None] * (slot_count - len(self.slots))
+        for slot_index, slot in delta["slots"].items():
+            self.slots[int(slot_index)] = SlotState(slot["fingerprint"], _item_from_json(slot["item"]))
+        self.version = delta["version"]
+
+    def changed_slots(self, fingerprints: list[str]) -> list[int]:
+        return [slot_index for slot_index, fingerprint in enumerate(fingerprints)
+                if slot_index >= len(self.slots) or self.slots[slot_index] is None or self.slots[slot_index].fingerprint != fingerprint]
+
+    def commit(self, fingerprints: list[str], read_items: dict[int, WeaponItem | ArmorItem | None]) -> bool:
+        # Returns False when nothing changed, no new version is written then
+        if not read_items and len(fingerprints) == len(self.slots):
+            return False
+
+        delta = {
+            "version": self.version + 1,
+            "taken_at": time.time(),
+            "slot_count": len(fingerprints),
+            "slots": {str(slot_index): {"fingerprint": fingerprints[slot_index], "item": _item_to_json(item)} for slot_index, item in read_items.items()},
+        }
+        with open(self.snapshots_file, "a") as snapshots:
+            snapshots.write(json.dumps(delta) + "\n")
+        self._apply(delta)
+        return True
+
+    def items(self) -> list[WeaponItem | ArmorItem | None]:
+        return [None if slot is None else slot.item for slot in self.slots]
+
+    def items_at(self, version: int) -> list[WeaponItem | ArmorItem | None]:
+        # The inventory as it was after the given version
+        return InventorySnapshotStore(self.snapshots_file, up_to_version=version).items()
+
+    def compact(self):
+        # Folds every version into one full snapshot, keeping the current version number
+        delta = {
+            "version": self.version,
+            "taken_at": time.time(),
+            "slot_count": len(self.slots),
+            "slots": {str(slot_index): {"fingerprint": slot.fingerprint, "item": _item_to_json(slot.item)} for slot_index, slot in enumerate(self.slots) if slot is not None},
+        }
+        compacted = self.snapshots_file.with_name(self.snapshots_file.name + ".tmp")
+        compacted.write_text(json.dumps(delta) + "\n")
+        compacted.replace(self.snapshots_file)
+
+
+def take_inventory_snapshot(page, store: InventorySnapshotStore, slot_selector: str = INVENTORY_SLOT_SELECTOR,
+                            full_rescan: bool = False) -> list[WeaponItem | ArmorItem | None]:
+    """
+        Fingerprints every slot (one evaluate, no clicks) and clicks/reads only the slots that changed since the last
+        snapshot. full_rescan reads every slot again, for changes the fingerprint can't see.
+
+    """
+    fingerprints = read_slot_fingerprints(page, slot_selector)
+    changed = list(range(len(fingerprints))) if full_rescan else store.changed_slots(fingerprints)
+    read_items = read_slot_tooltips(page, slot_selector, changed) if changed else []
+    store.commit(fingerprints, dict(zip(changed, read_items)))
+    print(f"Inventory snapshot v{store.version}: read {len(changed)} of {len(fingerprints)} slots")
+    return store.items()
+
+
+def benchmark_incremental_snapshot(changed_slot_count: int = 5, repeats: int = 3):
+    """
+        Full rescan against an incremental snapshot after changed_slot_count slots were swapped around, in headless
+        Chromium on the inventory fixture. Also checks the incremental snapshot ends up with the same items.
+
+    """
+    # Imported here, only the benchmark needs a browser and the fixtures
+    from playwright.sync_api import sync_playwright
+
+    from loot_analyser.dom_fixtures import INVENTORY_FIXTURE, serve_fixtures, write_inventory_fixture
+
+    if not INVENTORY_FIXTURE.is_file():
+        write_inventory_fixture()
+
+    # Swaps the contents of slot i and slot i + half, the way moving items around in the bag does
+    swap_slots_js = """
+    ({slotSelector, count}) => {
+        const slots = Array.from(document.querySelectorAll(slotSelector));
+        const half = Math.floor(slots.length / 2);
+        for (let i = 0; i < count; i++) {
+            const [a, b] = [slots[i], slots[i + half]];
+            const swapped = document.createElement("div");
+            a.replaceWith(swapped);
+            b.replaceWith(a);
+            swapped.replaceWith(b);
+        }
+    }
+    """
+
+    with sync_playwright() as p, serve_fixtures() as base_url, tempfile.TemporaryDirectory() as work_dir:
+        browser = p.chromium.launch()
+        page = browser.new_page()
+        page.goto(f"{base_url}/{INVENTORY_FIXTURE.name}")
+
+        full_s, incremental_s = [], []
+        for attempt in range(repeats):
+            store = InventorySnapshotStore(Path(work_dir) / f"snapshots-{attempt}.jsonl")
+            start = time.perf_counter()
+            take_inventory_snapshot(page, store)
+            full_s.append(time.perf_counter() - start)
+
+            page.evaluate(swap_slots_js, {"slotSelector": INVENTORY_SLOT_SELECTOR, "count": changed_slot_count})
+            start = time.perf_counter()
+            incremental_items = take_inventory_snapshot(page, store)
+            incremental_s.append(time.perf_counter() - start)
+
+            rescanned = [None if item is None else asdict(item) for item in read_slot_tooltips(page)]
+            assert [None if item is None else asdict(item) for item in incremental_items] == rescanned, "incremental snapshot differs from a full rescan"
+        browser.close()
+
+    print(f"full rescan {min(full_s):.3f}s, incremental after {changed_slot_count * 2} changed slots {min(incremental_s):.3f}s "
+          f"({min(full_s) / min(incremental_s):.1f}x faster)")
+
+
+if __name__ == '__main__':
+    benchmark_incremental_snapshot()
@@ -0,0 +1,258 @@
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+
+from loot_analyser.loot_items import ArmorItem, WeaponItem
+
+# "(+65% Bonus)", the game sometimes writes "%%" and lower case "bonus"
+_BONUS = r"\(\+(?P<bonus>\d+)%%? bonus\)"
+_NUMBER = r"\d+(?:\.\d+)?"
+_COUNT_WORDS = {"two": 2, "three": 3, "four": 4, "five": 5, "six": 6}
+
+
+@dataclass
+class EffectComponent:
+    kind: str  # damage, heal, shield, reflect, self_damage, buff, resource, threat
+    min_value: float
+    max_value: float
+    bonus_percent: float | None = None
+    ticks: int = 1  # how many times the effect lands, DoT/HoT ticks or hits in a row
+    duration_s: float | None = None
+    interval_s: float | None = None
+    stat: str | None = None  # buffs/resources: which stat is raised
+    position: int = 0  # where in the description it was found, keeps e.g. Waterfall's forwards/backwards order
+
+    @property
+    def average(self) -> float:
+        return (self.min_value + self.max_value) / 2
+
+    @property
+    def average_total(self) -> float:
+        return self.average * self.ticks
+
+
+@dataclass
+class ItemStats:
+    """
+        Numbers parsed once out of an item's tooltip strings. Comparisons and scoring read these instead of running
+        regexes on the description again.
+
+    """
+    components: list[EffectComponent] = field(default_factory=list)
+    unparsed_text: str = ""  # what is left of the description after every parser ran, empty when all of it was understood
+    cast_time_s: float | None = None
+    cooldown_s: float | None = None
+    activation_cost: int | None = None
+    activation_resource: str | None = None  # Mana or Energy
+    armor_stats: dict[str, float] = field(default_factory=dict)  # ArmorItem field name -> value
+
+    def of_kind(self, kind: str) -> list[EffectComponent]:
+        return [component for component in self.components if component.kind == kind]
+
+    @property
+    def damage_components(self) -> list[EffectComponent]:
+        return self.of_kind("damage")
+
+    @property
+    def heal_components(self) -> list[EffectComponent]:
+        return self.of_kind("heal")
+
+    @property
+    def damage_range(self) -> tuple[float, float] | None:
+        damage = self.damage_components
+        return (damage[0].min_value, damage[0].max_value) if damage else None
+
+    @property
+    def damage_bonus_percent(self) -> float | None:
+        damage = self.damage_components
+        return damage[0].bonus_percent if damage else None
+
+    @property
+    def ticks(self) -> int:
+        return max((component.ticks for component in self.components), default=1)
+
+    @property
+    def duration_s(self) -> float | None:
+        return max((component.duration_s for component in self.components if component.duration_s is not None), default=None)
+
+    @property
+    def shield_amount(self) -> float:
+        return sum(component.max_value for component in self.of_kind("shield"))
+
+    @property
+    def self_damage(self) -> float:
+        return sum(component.average_total for component in self.of_kind("self_damage"))
+
+    @property
+    def average_damage(self) -> float:
+        return sum(component.average_total for component in self.damage_components)
+
+    @property
+    def average_heal(self) -> float:
+        return sum(component.average_total for component in self.heal_components)
+
+
+@dataclass(frozen=True)
+class _EffectParser:
+    kind: str
+    regex: re.Pattern
+    per_second: bool = False  # ticks once a second for the duration
+
+
+def _parser(kind: str, pattern: str, per_second: bool = False) -> _EffectParser:
+    return _EffectParser(kind, re.compile(pattern.replace("BONUS", _BONUS).replace("NUMBER", _NUMBER), re.IGNORECASE), per_second)
+
+
+# Tried in this order on every description. A match blanks out its text so a later, looser parser (e.g. the plain
+# "A-B damage" one) can't count the same effect again
+GENERIC_PARSERS: list[_EffectParser] = [
+    _parser("self_damage", r"inflicting (?P<min>\d+) damage BONUS to yourself"),
+    _parser("reflect", r"shield for (?P<duration>NUMBER) seconds against the next attack\s*which throws back up to (?P<min>\d+) damage BONUS"),
+    _parser("shield", r"shield up to (?P<min>\d+) BONUS for (?P<duration>NUMBER) seconds"),
+    _parser("heal", r"heals? (?P<min>\d+) BONUS every (?P<interval>NUMBER) sec(?:ond)?s? for (?P<duration>NUMBER) sec(?:ond)?s?"),
+    _parser("heal", r"heal buff for (?P<duration>NUMBER) seconds which heals (?P<min>\d+) BONUS every second", per_second=True),
+    _parser("heal", r"channels (?P<min>\d+)-(?P<max>\d+) heal BONUS every second"),
+    _parser("damage", r"deals (?P<min>\d+) damage BONUS every (?P<interval>NUMBER) seconds for (?P<duration>NUMBER) seconds"),
+    _parser("damage", r"over (?P<duration>NUMBER) seconds for (?P<min>\d+) damage BONUS per second", per_second=True),
+    _parser("damage", r"deals (?P<min>\d+) damage BONUS per second over (?P<duration>NUMBER) seconds", per_second=True),
+    _parser("damage", r"for (?P<duration>NUMBER) seconds and deals (?P<min>\d+) damage BONUS per second", per_second=True),
+    _parser("damage", r"for (?P<duration>NUMBER) seconds deal (?P<min>\d+)-(?P<max>\d+) damage BONUS per second", per_second=True),
+    _parser("damage", r"over (?P<duration>NUMBER) seconds deal (?P<min>\d+) BONUS damage every second", per_second=True),
+    _parser("damage", r"totem that deals (?P<min>\d+) damage BONUS every second"),
+    _parser("damage", r"deals (?P<min>\d+)-(?P<max>\d+) damage BONUS over (?P<duration>NUMBER) seconds"),
+    _parser("heal", r"heal(?: yourself for)? (?P<min>\d+)-(?P<max>\d+) (?:life )?BONUS"),
+    _parser("damage", r"(?P<min>\d+)-(?P<max>\d+) (?:\w+ )?damage BONUS"),
+    _parser("buff", r"receive \+?(?P<min>NUMBER) (?P<stat>[a-z ]+?) for (?P<duration>NUMBER) sec(?:ond)?s?"),
+    _parser("buff", r"receive (?P<min>\d+) (?P<stat>\w+ damage)"),
+    _parser("resource", r"restores (?P<min>\d+) (?P<stat>mana|energy)"),
+    _parser("threat", r"(?P<min>\d+)% threat"),
+]
+
+# Item types whose wording needs its own parser ahead of the generic ones
+ITEM_TYPE_PARSERS: dict[str, list[_EffectParser]] = {
+    "Breaker": [_parser("damage", r"(?P<count>\w+) short strikes in a row deal (?P<min>\d+)-(?P<max>\d+) damage BONUS per hit")],
+    "Waterfall": [_parser("damage", r"(?P<min>\d+)-(?P<max>\d+) damage BONUS (?P<stat>forwards|backwards)")],
+}
+
+
+def parsers_for(item_type: str | None) -> list[_EffectParser]:
+    return ITEM_TYPE_PARSERS.get(item_type, []) + GENERIC_PARSERS
+
+
+def _component(parser: _EffectParser, match: re.Match) -> EffectComponent:
+    groups = {name: value for name, value in match.groupdict().items() if value is not None}
+    min_value = float(groups["min"])
+    duration_s = float(groups["duration"]) if "duration" in groups else None
+    interval_s = float(groups["interval"]) if "interval" in groups else (1.0 if parser.per_second else None)
+
+    ticks = 1
+    if "count" in groups:
+        count = groups["count"].casefold()
+        ticks = int(count) if count.isdigit() else _COUNT_WORDS.get(count, 1)
+    elif duration_s is not None and interval_s is not None:
+        ticks = max(round(duration_s / interval_s), 1)
+
+    return EffectComponent(
+        kind=parser.kind,
+        min_value=min_value,
+        max_value=float(groups.get("max", min_value)),
+        bonus_percent=float(groups["bonus"]) if "bonus" in groups else None,
+        ticks=ticks,
+        duration_s=duration_s,
+        interval_s=interval_s,
+        stat=groups.get("stat"),
+        position=match.start(),
+    )
+
+
+@lru_cache(maxsize=4096)
+def _parse_description(item_type: str | None, description: str) -> tuple[tuple[EffectComponent, ...], str]:
+    remaining = description
+    components = []
+    for parser in parsers_for(item_type):
+        for match in parser.regex.finditer(remaining):
+            components.append(_component(parser, match))
+        # Blank out what this parser understood, the offsets stay the same for the next parsers
+        remaining = parser.regex.sub(lambda match: " " * len(match.group(0)), remaining)
+    unparsed = re.sub(r"[\s.,]+", " ", remaining).strip()
+    return tuple(sorted(components, key=lambda component: component.position)), unparsed
+
+
+def _number(text: str | None) -> float | None:
+    found = re.search(_NUMBER, text or "")
+    return float(found.group(0)) if found else None
+
+
+def parse_item_stats(item: WeaponItem | ArmorItem) -> ItemStats:
+    if isinstance(item, ArmorItem):
+        armor_stats = {name: _number(value) for name, value in vars(item).items() if name not in ("item_name", "item_type", "legacy") and isinstance(value, str)}
+        return ItemStats(armor_stats={name: value for name, value in armor_stats.items() if value is not None})
+
+    components, unparsed = _parse_description(item.item_type, item.item_description or "")
+    activation_cost = re.search(r"(\d+)\s*(Mana|Energy)", item.item_activation_cost or "")
+    return ItemStats(
+        components=list(components),
+        unparsed_text=unparsed,
+        cast_time_s=_number(item.item_cast_time),
+        cooldown_s=_number(item.item_cooldown_time),
+        activation_cost=int(activation_cost.group(1)) if activation_cost else None,
+        activation_resource=activation_cost.group(2) if activation_cost else None,
+    )
+
+
+def item_stats(item: WeaponItem | ArmorItem) -> ItemStats:
+    """
+        Parsed stats cached on the item record itself. The cache is a plain attribute, not a dataclass field, so it
+        never ends up in dataclasses.asdict of the item.
+
+    """
+    stats = getattr(item, "_parsed_stats", None)
+    if stats is None:
+        stats = parse_item_stats(item)
+        item._parsed_stats = stats
+    return stats
+
+
+def benchmark_item_stats(inventory_json: Path = Path(__file__).parent / "inventory_data.json", repeats: int = 1000):
+    """
+        Parses every item of the saved inventory: cold (no caches), then the cached path comparisons use. Also lists
+        the descriptions that still have numbers no parser understood.
+
+    """
+    with open(inventory_json) as json_file:
+        saved = json.load(json_file)
+
+    def load_items() -> list[WeaponItem | ArmorItem]:
+        return [WeaponItem(**item) if "item_description" in item else ArmorItem(**item) for item in saved.values()]
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        _parse_description.cache_clear()
+        for item in load_items():
+            parse_item_stats(item)
+    cold_s = (time.perf_counter() - start) / repeats
+
+    items = load_items()
+    for item in items:
+        item_stats(item)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for item in items:
+            item_stats(item)
+    cached_s = (time.perf_counter() - start) / repeats
+
+    weapons = [item for item in items if isinstance(item, WeaponItem)]
+    # Flavour text is expected to stay, leftover numbers are effects no parser understood
+    unparsed = {item.item_name: item_stats(item).unparsed_text for item in weapons if re.search(r"\d", item_stats(item).unparsed_text)}
+    print(f"{len(items)} items: cold parse {cold_s * 1000:.3f}ms ({cold_s / len(items) * 1e6:.1f}us/item), cached {cached_s * 1e6:.1f}us "
+          f"({cached_s / len(items) * 1e9:.0f}ns/item)")
+    print(f"{len(weapons) - len(unparsed)}/{len(weapons)} weapon descriptions with every number parsed, leftover text:")
+    for item_name, text in unparsed.items():
+        print(f"    {item_name}: {text}")
+
+
+if __name__ == '__main__':
+    benchmark_item_stats()
@@ -0,0 +1,207 @@
+import json
+import random
+import sqlite3
+import tempfile
+import time
+from dataclasses import asdict, fields
+from pathlib import Path
+
+from loot_analyser.item_stats import item_stats
+from loot_analyser.loot_items import ArmorItem, WeaponItem, item_type_of
+
+# Kept next to inventory_data.json in the loot_analyser directory, wherever the appraiser is run from
+ITEM_STORE_FILE = Path(__file__).parent / "inventory.sqlite3"
+INVENTORY_JSON = Path(__file__).parent / "inventory_data.json"
+
+WEAPON_FIELDS = [field.name for field in fields(WeaponItem)]
+ARMOR_FIELDS = [field.name for field in fields(ArmorItem)]
+# Parsed numbers stored next to the tooltip strings, see item_stats.ItemStats
+WEAPON_STAT_COLUMNS = ["damage_min", "damage_max", "damage_bonus_percent", "average_damage", "average_heal", "shield_amount", "self_damage",
+                       "ticks", "duration_s", "cast_time_s", "cooldown_s", "activation_cost", "activation_resource"]
+ARMOR_STAT_COLUMNS = ["armor", "life", "damage", "heal", "cbr", "ccr", "mana", "mana_regen", "life_regen", "energy_regen"]
+
+# Bumped when the tables change. The store is a view that every inventory refresh rebuilds, older tables are dropped
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS weapons (
+    item_key TEXT PRIMARY KEY,
+    item_name TEXT NOT NULL,
+    item_type TEXT,
+    item_description TEXT,
+    item_activation_cost TEXT,
+    item_cast_time TEXT,
+    item_cooldown_time TEXT,
+    legacy INTEGER NOT NULL,
+    damage_min REAL, damage_max REAL, damage_bonus_percent REAL, average_damage REAL, average_heal REAL, shield_amount REAL, self_damage REAL,
+    ticks INTEGER, duration_s REAL, cast_time_s REAL, cooldown_s REAL, activation_cost INTEGER, activation_resource TEXT
+);
+CREATE TABLE IF NOT EXISTS armor (
+    item_key TEXT PRIMARY KEY,
+    item_name TEXT NOT NULL,
+    item_type TEXT,
+    item_armor TEXT, item_life TEXT, item_damage TEXT, item_heal TEXT, item_cbr TEXT, item_ccr TEXT,
+    item_mana TEXT, item_mana_regen TEXT, item_life_regen TEXT, item_energy_regen TEXT,
+    legacy INTEGER NOT NULL,
+    armor REAL, life REAL, damage REAL, heal REAL, cbr REAL, ccr REAL, mana REAL, mana_regen REAL, life_regen REAL, energy_regen REAL
+);
+CREATE INDEX IF NOT EXISTS weapons_by_name ON weapons (item_name);
+CREATE INDEX IF NOT EXISTS weapons_by_type ON weapons (item_type);
+CREATE INDEX IF NOT EXISTS weapons_by_legacy ON weapons (legacy);
+CREATE INDEX IF NOT EXISTS armor_by_name ON armor (item_name);
+CREATE INDEX IF NOT EXISTS armor_by_type ON armor (item_type);
+CREATE INDEX IF NOT EXISTS armor_by_legacy ON armor (legacy);
+"""
+
+
+def _weapon_row(item_key: str, item: WeaponItem) -> tuple:
+    stats = item_stats(item)
+    damage_range = stats.damage_range or (None, None)
+    parsed = [damage_range[0], damage_range[1], stats.damage_bonus_percent, stats.average_damage, stats.average_heal, stats.shield_amount,
+              stats.self_damage, stats.ticks, stats.duration_s, stats.cast_time_s, stats.cooldown_s, stats.activation_cost, stats.activation_resource]
+    raw = [int(bool(item.legacy)) if name == "legacy" else getattr(item, name) for name in WEAPON_FIELDS]
+    return (item_key, *raw, *parsed)
+
+
+def _armor_row(item_key: str, item: ArmorItem) -> tuple:
+    armor_stats = item_stats(item).armor_stats
+    # The armor slot is stored even for older inventories that didn't have it
+    raw = [item_type_of(item) if name == "item_type" else int(bool(item.legacy)) if name == "legacy" else getattr(item, name) for name in ARMOR_FIELDS]
+    return (item_key, *raw, *[armor_stats.get(f"item_{column}") for column in ARMOR_STAT_COLUMNS])
+
+
+class ItemStore:
+    """
+        The current inventory in a local SQLite database: typed weapon and armor tables with the tooltip strings and
+        the numbers parsed out of them, indexed by name, type and legacy. update() only writes the rows that changed.
+        The history is InventorySnapshotStore's jsonl of versioned deltas, this is the indexed view of its latest
+        version.
+
+        Has the same has_name/same_name/same_type lookups as InventoryIndex, so compare_loot_with_inventory can query
+        it directly.
+
+    """
+    def __init__(self, db_path: Path | str = ITEM_STORE_FILE):
+        self.connection = sqlite3.connect(db_path)
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            with self.connection:
+                self.connection.executescript("DROP TABLE IF EXISTS weapons; DROP TABLE IF EXISTS armor; DROP TABLE IF EXISTS snapshots;")
+                self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def is_empty(self) -> bool:
+        return not any(self.connection.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() for table in ("weapons", "armor"))
+
+    def update(self, inventory_info: dict[str, WeaponItem | ArmorItem]) -> int:
+        # Makes the store hold exactly inventory_info in one transaction. Returns the number of rows written or deleted
+        changed = 0
+        with self.connection:
+            for table, item_class, to_row in (("weapons", WeaponItem, _weapon_row), ("armor", ArmorItem, _armor_row)):
+                stored = {row[0]: row for row in self.connection.execute(f"SELECT * FROM {table}")}
+                rows = [to_row(key, item) for key, item in inventory_info.items() if isinstance(item, item_class)]
+                written = [row for row in rows if stored.get(row[0]) != row]
+                removed = [(key,) for key in stored.keys() - {row[0] for row in rows}]
+                if written:
+                    self.connection.executemany(f"INSERT OR REPLACE INTO {table} VALUES ({', '.join('?' * len(written[0]))})", written)
+                if removed:
+                    self.connection.executemany(f"DELETE FROM {table} WHERE item_key = ?", removed)
+                changed += len(written) + len(removed)
+        return changed
+
+    def import_json(self, inventory_json: Path = INVENTORY_JSON) -> int:
+        # Fills the store from an inventory_data.json, the format inventories were kept in before the store
+        with open(inventory_json) as json_file:
+            saved = json.load(json_file)
+        return self.update({key: WeaponItem(**item) if "item_description" in item else ArmorItem(**item) for key, item in saved.items()})
+
+    def export_json(self, inventory_json: Path = INVENTORY_JSON):
+        # The current inventory as an inventory_data.json, the way write_inventory_info_to_json wrote it
+        with open(inventory_json, "w") as json_file:
+            json.dump({key: asdict(item) for key, item in self.items().items()}, json_file, indent=4)
+
+    def _query(self, table: str, where: str, params: tuple) -> list[tuple[str, WeaponItem | ArmorItem]]:
+        item_fields = WEAPON_FIELDS if table == "weapons" else ARMOR_FIELDS
+        item_class = WeaponItem if table == "weapons" else ArmorItem
+        rows = self.connection.execute(f"SELECT item_key, {', '.join(item_fields)} FROM {table} {where} ORDER BY rowid", params)
+        return [(row[0], item_class(**dict(zip(item_fields, row[1:])) | {"legacy": bool(row[-1])})) for row in rows]
+
+    def items(self) -> dict[str, WeaponItem | ArmorItem]:
+        return dict(self._query("weapons", "", ()) + self._query("armor", "", ()))
+
+    def weapons(self, include_legacy: bool = True) -> list[WeaponItem]:
+        where, params = ("", ()) if include_legacy else ("WHERE legacy = ?", (0,))
+        return [item for _, item in self._query("weapons", where, params)]
+
+    def has_name(self, item_name: str) -> bool:
+        return any(self.connection.execute(f"SELECT 1 FROM {table} WHERE item_name = ? LIMIT 1", (item_name,)).fetchone() for table in ("weapons", "armor"))
+
+    def same_name(self, item: WeaponItem | ArmorItem) -> list[WeaponItem | ArmorItem]:
+        table = "weapons" if isinstance(item, WeaponItem) else "armor"
+        return [found for _, found in self._query(table, "WHERE item_name = ?", (item.item_name,))]
+
+    def same_type(self, item: WeaponItem | ArmorItem) -> list[WeaponItem | ArmorItem]:
+        item_type = item_type_of(item)
+        # Items without a known type can only be matched by name
+        if item_type is None:
+            return self.same_name(item)
+        table = "weapons" if isinstance(item, WeaponItem) else "armor"
+        return [found for _, found in self._query(table, "WHERE item_type = ?", (item_type,))]
+
+
+def benchmark_item_store(inventory_json: Path = INVENTORY_JSON, refresh_count: int = 200, changed_count: int = 5, drop_count: int = 10):
+    """
+        Filling the store from the saved inventory, refreshing it refresh_count times with changed_count items
+        replaced, and the lookups for a need-or-greed window against loading inventory_data.json and scanning every
+        item like the old comparison did.
+
+    """
+    with open(inventory_json) as json_file:
+        saved = json.load(json_file)
+    inventory_info = {key: WeaponItem(**item) if "item_description" in item else ArmorItem(**item) for key, item in saved.items()}
+    rng = random.Random(0)
+    drops = rng.sample(list(inventory_info.values()), drop_count)
+
+    with tempfile.TemporaryDirectory() as work_dir, ItemStore(Path(work_dir) / "inventory.sqlite3") as store:
+        start = time.perf_counter()
+        store.update(inventory_info)
+        fill_s = time.perf_counter() - start
+
+        # Each refresh swaps a few items for others from the inventory, under new keys, like drops replacing sold items
+        changed = 0
+        start = time.perf_counter()
+        for refresh in range(refresh_count):
+            refreshed = dict(inventory_info)
+            for index, key in enumerate(rng.sample(list(inventory_info), changed_count)):
+                refreshed[f"{key} #{refresh}.{index}"] = refreshed.pop(key)
+            changed += store.update(refreshed)
+        update_s = (time.perf_counter() - start) / refresh_count
+
+        start = time.perf_counter()
+        for drop in drops:
+            store.has_name(drop.item_name)
+            store.same_type(drop)
+        store_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for drop in drops:
+            with open(inventory_json) as json_file:
+                loaded = {key: WeaponItem(**item) if "item_description" in item else ArmorItem(**item) for key, item in json.load(json_file).items()}
+            [key for key in loaded if key.startswith(drop.item_name)]
+            [item for item in loaded.values() if item_type_of(item) == item_type_of(drop)]
+        json_s = time.perf_counter() - start
+
+        print(f"fill: {fill_s * 1000:.2f}ms for {len(inventory_info)} items, {Path(work_dir, 'inventory.sqlite3').stat().st_size / 1024:,.0f} KB")
+        print(f"refresh with {changed_count} items changed: {update_s * 1000:.2f}ms, {changed / refresh_count:.1f} rows written")
+        print(f"{drop_count} drops: store lookups {store_s * 1000:.2f}ms, json load + scan {json_s * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    benchmark_item_store()
@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+from typing import Coroutine, Any
+
+ARMOR_ITEM_TYPES = ["Head", "Chest", "Legs", "Shoulders", "Hands", "Feet"]
+SKIPPED_ITEM_TYPES = ["Resource", "Trash", "Key", "Consumable", "Lumbering", "Herbalism", "Mining", "Energy Potion", "Healing Potion", "Mana Potion", "Skill book", "No item in slot"]
+NO_ACTIVATION_COST_ITEM_TYPES = ["Tool", "Vision of Darkness"]
+LEGACY_MARKER = '"Legacy of Waldenbach"'
+
+# Older snapshots don't have the armor slot as item_type, it can be worked out from the name
+ARMOR_TYPE_BY_NAME_PART = {
+    "Headguard": "Head", "Helmet": "Head", "Hat": "Head",
+    "Chestplate": "Chest", "Chest": "Chest",
+    "Legguards": "Legs",
+    "Shoulders": "Shoulders",
+    "Gauntlets": "Hands",
+    "Warboots": "Feet", "Boots": "Feet",
+}
+
+
+@dataclass
+class ArmorItem:
+    item_name: str = None
+    item_type: str = None
+    item_armor: str = None
+    item_life: str = None
+    item_damage: str = None
+    item_heal: str = None
+    item_cbr: str = None
+    item_ccr: str = None
+    item_mana: str = None
+    item_mana_regen: str = None
+    item_life_regen: str = None
+    item_energy_regen: str = None
+    legacy: bool = None
+
+
+@dataclass
+class WeaponItem:
+    item_name: Coroutine[Any, Any, str]
+    item_type: Coroutine[Any, Any, str]
+    item_description: Coroutine[Any, Any, str] | str
+    item_activation_cost: Coroutine[Any, Any, str] | None
+    item_cast_time: Coroutine[Any, Any, str]
+    item_cooldown_time: Coroutine[Any, Any, str]
+    legacy: bool
+
+
+def armor_type_from_name(item_name: str) -> str | None:
+    return next((armor_type for name_part, armor_type in ARMOR_TYPE_BY_NAME_PART.items() if name_part in item_name.split()), None)
+
+
+def item_type_of(item: WeaponItem | ArmorItem) -> str | None:
+    if isinstance(item, ArmorItem) and item.item_type is None:
+        return armor_type_from_name(item.item_name)
+    return item.item_type
+
+
+def armor_item_from_properties(item_name: str, armor_properties: list[str], item_type: str = None) -> ArmorItem:
+    item_data = ArmorItem()
+    item_data.item_name = item_name
+    item_data.item_type = item_type
+
+    for stat in armor_properties:
+        match stat.casefold():
+            case x if "armor" in x:
+                item_data.item_armor = stat
+            case x if "damage" in x:
+                item_data.item_damage = stat
+            case x if "life" in x:
+                item_data.item_life = stat
+            case x if "critical bonus rating" in x:
+                item_data.item_cbr = stat
+            case x if "critical chance rating" in x:
+                item_data.item_ccr = stat
+            case x if "heal" in x:
+                item_data.item_heal = stat
+            case x if "mana regeneration" in x:
+                item_data.item_mana_regen = stat
+            case x if "mana" in x:
+                item_data.item_mana = stat
+    return item_data
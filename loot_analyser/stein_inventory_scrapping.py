@@ -1,13 +1,16 @@
-from dataclasses import dataclass
-from dataclasses import asdict
 from typing import Coroutine, Any
 from bs4 import BeautifulSoup
 from playwright.async_api import Page
 from playwright.sync_api import sync_playwright
 
-import re
-import json
-import statistics
+from fight_simulator.class_configs.weapon_damage_calulator import player_constants
+from loot_analyser.inventory_index import InventoryIndex
+from loot_analyser.inventory_snapshots import InventorySnapshotStore, take_inventory_snapshot
+from loot_analyser.item_stats import item_stats
+from loot_analyser.item_store import INVENTORY_JSON, ItemStore
+from loot_analyser.loot_items import ArmorItem, WeaponItem
+from loot_analyser.tooltip_extraction import INVENTORY_SLOT_SELECTOR, NEED_OR_GREED_SLOT_SELECTOR, read_current_tooltip, read_slot_tooltips
+from loot_analyser.upgrade_scoring import CHARACTER_CLASSES, UpgradeScorer, print_upgrade_score
 
 # Sample commands
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -16,87 +19,99 @@ import statistics
 # tool_tip_info = page.locator("div#stein-tooltip").inner_text()
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-json_file_name = 'inventory_data.json'
-
-
-@dataclass
-class ArmorItem:
-    item_name: str = None
-    item_type: str = None
-    item_armor: str = None
-    item_life: str = None
-    item_damage: str = None
-    item_heal: str = None
-    item_cbr: str = None
-    item_ccr: str = None
-    item_mana: str = None
-    item_mana_regen: str = None
-    item_life_regen: str = None
-    item_energy_regen: str = None
-    legacy: bool = None
-
-
-@dataclass
-class WeaponItem:
-    item_name: Coroutine[Any, Any, str]
-    item_type: Coroutine[Any, Any, str]
-    item_description: Coroutine[Any, Any, str] | str
-    item_activation_cost: Coroutine[Any, Any, str] | None
-    item_cast_time: Coroutine[Any, Any, str]
-    item_cooldown_time: Coroutine[Any, Any, str]
-    legacy: bool
-
 
 class SteinLootAppraiser:
     # "C:\ProgramData\Microsoft\Windows\Start Menu\Programs\Google Chrome.lnk" --remote-debugging-port=9222 --user-data-dir="C:\temp\chrome_profile"
     #  ^|^ Always run chrome with this command in the command line for this script to work ^|^
 
-    def __init__(self, chromium_context_manager):
-        self.browser = chromium_context_manager.chromium.connect_over_cdp("http://localhost:9222")
-        self.page: Page = self.browser.contexts[0].pages[0]  # Get first open tab
+    def __init__(self, chromium_context_manager, page: Page | None = None, item_store: ItemStore | None = None,
+                 snapshot_store: InventorySnapshotStore | None = None):
+        if page is None:
+            self.browser = chromium_context_manager.chromium.connect_over_cdp("http://localhost:9222")
+            page = self.browser.contexts[0].pages[0]  # Get first open tab
+        self.page: Page = page
+        self._item_store = item_store
+        self._snapshot_store = snapshot_store
+
+    @property
+    def snapshot_store(self) -> InventorySnapshotStore:
+        # The inventory history, one version per refresh
+        if self._snapshot_store is None:
+            self._snapshot_store = InventorySnapshotStore()
+        return self._snapshot_store
+
+    @property
+    def item_store(self) -> ItemStore:
+        # Opened on first use. A new store starts from the latest snapshot, or from an existing inventory_data.json
+        if self._item_store is None:
+            self._item_store = ItemStore()
+            if self._item_store.is_empty():
+                if self.snapshot_store.version:
+                    self._item_store.update(self.collect_items(self.snapshot_store.items()))
+                elif INVENTORY_JSON.is_file():
+                    self._item_store.import_json(INVENTORY_JSON)
+        return self._item_store
 
     def main_application(self):
         user_input = input(
-            "Press 1 to grab inventory data from inventory. Press anything else to get it from the json.")
+            "Press 1 to grab inventory data from inventory (only slots that changed are read again). Press 2 to read every slot again. Press 3 to export the saved inventory to inventory_data.json. Press anything else to use the last saved snapshot.")
 
         if user_input == "1":
-            inventory_info: dict = self.get_item_info_from_inventory()
+            self.get_item_info_from_inventory()
 
-        else:
-            inventory_info: dict = self.read_inventory_info_from_json()
+        elif user_input == "2":
+            self.get_item_info_from_inventory(full_rescan=True)
+
+        elif user_input == "3":
+            self.item_store.export_json(INVENTORY_JSON)
 
         drop_item_info: dict = self.get_loot_information_list()
 
-        self.compare_loot_with_inventory(inventory_info, drop_item_info)
+        character_class = input(f"Enter your class ({', '.join(CHARACTER_CLASSES)}) to score drops with your stats or press ENTER to skip: ").casefold()
+        scorer = None
+        if character_class in CHARACTER_CLASSES:
+            player_name = input("Enter your player name to score with the numbers fitted from your fight logs (calibration.json) or press ENTER to skip: ")
+            scorer = UpgradeScorer(character_class, self.item_store.weapons(include_legacy=False), player_constants(player_name))
+
+        # The comparison queries the current inventory in the item store
+        self.compare_loot_with_inventory(self.item_store, drop_item_info, scorer)
+
+    def get_item_info_from_inventory(self, full_rescan: bool = False) -> dict:
+        # get all item in the inventory. Only the slots whose image or name changed since the last snapshot are clicked
+        # and read again, inside the page in a single evaluate call. The snapshot history gets a new version and the item
+        # store only the rows that changed
+        inventory_info = self.collect_items(take_inventory_snapshot(self.page, self.snapshot_store, INVENTORY_SLOT_SELECTOR, full_rescan))
 
-    def get_item_info_from_inventory(self) -> dict:
-        # get all item in the inventory
-        inventory_slots = self.page.locator("div#stein-inventory-slots div.stein-item-inventory-slot")
-        slot_count: int | Coroutine[Any, Any, int] = inventory_slots.count()
-        inventory_info = {}
-        for i in range(slot_count):
-            slot = inventory_slots.nth(i)
-            slot.click()
-            tool_tip_info: WeaponItem | ArmorItem | None = self.parse_item_info()
+        self.item_store.update(inventory_info)
 
+        return inventory_info
+
+    @staticmethod
+    def collect_items(tool_tips: list[WeaponItem | ArmorItem | None]) -> dict:
+        # Keys the parsed slots by item name, skipping empty and unparsed slots
+        items_info = {}
+        name_counts: dict[str, int] = {}
+        for tool_tip_info in tool_tips:
             if tool_tip_info is None:
                 continue
 
             if tool_tip_info == 'No item in slot':
                 continue
 
-            if tool_tip_info.item_name not in inventory_info.keys():
-                inventory_info[tool_tip_info.item_name] = tool_tip_info
+            # Copies of an item are stored as name, name_2, name_3, ...
+            count = name_counts.get(tool_tip_info.item_name, 0) + 1
+            name_counts[tool_tip_info.item_name] = count
+            items_info[tool_tip_info.item_name if count == 1 else f"{tool_tip_info.item_name}_{count}"] = tool_tip_info
 
-            elif tool_tip_info.item_name in inventory_info.keys():
-                count = list(inventory_info.keys()).count(tool_tip_info.item_name)
-                inventory_info[f"{tool_tip_info.item_name}_{count + 1}"] = tool_tip_info
-
-        self.write_inventory_info_to_json(inventory_info)
-
-        return inventory_info
+        return items_info
 
     def parse_item_info(self) -> WeaponItem | ArmorItem | None:
+        # Tooltip of the slot that was clicked last, read in one round trip
+        return read_current_tooltip(self.page)
+
+    def parse_item_info_with_locators(self) -> WeaponItem | ArmorItem | None:
+        # Original locator by locator reader (~10 round trips per item). Kept as the reference the batched reader is
+        # checked against
         if self.page.locator("div#stein-tooltip").inner_text() == 'No item in slot':
             return None
 
@@ -113,6 +128,7 @@ class SteinLootAppraiser:
             armor_properties = [li.get_text() for li in soup.find_all("li")]
             item_data = ArmorItem()
             item_data.item_name = item_name
+            item_data.item_type = item_type
 
             for stat in armor_properties:
                 match stat.casefold():
@@ -165,25 +181,6 @@ class SteinLootAppraiser:
 
         return item_data
 
-    @staticmethod
-    def write_inventory_info_to_json(inventory_info: dict):
-        serializable_data = {key: asdict(value) for key, value in inventory_info.items()}
-        with open('inventory_data.json', 'w') as fp:
-            json.dump(serializable_data, fp, indent=4)
-
-    @staticmethod
-    def read_inventory_info_from_json() -> dict:
-        def deserialize_item(item_data: dict):
-            if "item_description" in item_data:  # If description exists, it's a WeaponItem
-                return WeaponItem(**item_data)
-            else:  # Otherwise, it's an ArmorItem
-                return ArmorItem(**item_data)
-
-        with open(json_file_name) as json_file:
-            inventory_info = json.load(json_file)
-            parsed_data = {key: deserialize_item(value) for key, value in inventory_info.items()}
-            return parsed_data
-
     def get_loot_information_list(self) -> dict:
         dropped_item = self.page.locator("div#stein-dialog-window-container div.stein-need-or-greed")
         dropped_item_count = dropped_item.count()
@@ -193,63 +190,57 @@ class SteinLootAppraiser:
         else:
             print("There are no item drops!")
 
-        drop_item_info = {}
-        for i in range(dropped_item_count):
-            slot = dropped_item.nth(i).locator(
-                "div.stein-need-or-greed-window.stein-window div.stein-item-inventory-slot.need-or-greed-item")
-            slot.click()
-            tool_tip_info = self.parse_item_info()
-
-            if tool_tip_info is None:
-                continue
+        return self.collect_items(read_slot_tooltips(self.page, NEED_OR_GREED_SLOT_SELECTOR))
 
-            if tool_tip_info == 'No item in slot':
-                continue
-
-            if tool_tip_info.item_name not in drop_item_info.keys():
-                drop_item_info[tool_tip_info.item_name] = tool_tip_info
-
-            elif tool_tip_info.item_name in drop_item_info.keys():
-                count = list(drop_item_info.keys()).count(tool_tip_info.item_name)
-                drop_item_info[f"{tool_tip_info.item_name}_{count + 1}"] = tool_tip_info
-
-        return drop_item_info
-
-    def compare_loot_with_inventory(self, inventory_info: dict[str, WeaponItem | ArmorItem], dropped_items_dict: dict[str, WeaponItem | ArmorItem]):
+    def compare_loot_with_inventory(self, inventory_info: dict[str, WeaponItem | ArmorItem] | InventoryIndex | ItemStore, dropped_items_dict: dict[str, WeaponItem | ArmorItem],
+                                    scorer: UpgradeScorer | None = None):
         # dropped_items_dict = {'Aries': WeaponItem(item_name='Aries', item_type='Waterfall', item_description='Deals 185-344 damage (+65% Bonus) forwardsand 168-313 damage (+85% Bonus) backwards', item_activation_cost=' 56 Mana', item_cast_time='Casttime: 0.80 sec', item_cooldown_time='Cooldown: 6.40 sec')}
-        for item_name, stats in dropped_items_dict.items():
-            inventory_item_match = [key for key in inventory_info.keys() if key.startswith(item_name)]
-            if len(inventory_item_match) > 0:
+        inventory_index = inventory_info if isinstance(inventory_info, (InventoryIndex, ItemStore)) else InventoryIndex(inventory_info.values())
+        for stats in dropped_items_dict.values():
+            if inventory_index.has_name(stats.item_name):
                 print("Item exists in the inventory")
-                for inventory_item in inventory_item_match:
-                    if isinstance(stats, WeaponItem):
-                        if inventory_info[inventory_item].legacy:
-                            print("Unable to compare item with legacy version")
-                            continue
-                        self.loot_analysis_weaoon(inventory_info[inventory_item], stats)
-                    if isinstance(stats, ArmorItem):
-                        # TODO: Add function here for analyzing the armor drops
-                        pass
             else:
                 print("This is a new Item!")
 
+            # With the character's stats the armor drop is scored against the equipped piece of its slot
+            if isinstance(stats, ArmorItem):
+                if scorer is None:
+                    print(f"Pass a character class to score armor drops ({stats.item_name})")
+                    continue
+                armor_score = scorer.score_armor(stats)
+                if armor_score is not None:
+                    print_upgrade_score(armor_score)
+                continue
+
+            # Every inventory item of the same type (all Waterfalls, all Heads, ...) is compared with the drop
+            for inventory_item in inventory_index.same_type(stats):
+                if isinstance(stats, WeaponItem):
+                    if inventory_item.legacy:
+                        print(f"Unable to compare item with legacy version ({inventory_item.item_name})")
+                        continue
+                    print(f"Compared with {inventory_item.item_name}:")
+                    if scorer is not None:
+                        print_upgrade_score(scorer.score_weapon(stats, inventory_item))
+                    else:
+                        self.loot_analysis_weaoon(inventory_item, stats)
+
     @staticmethod
     def loot_analysis_weaoon(inv_item: WeaponItem, drop_item: WeaponItem):
-        inv_description = inv_item.item_description
-        drop_description = drop_item.item_description
+        # Numbers come from the parsed stats cached on each item, the descriptions are only parsed once
+        inv_stats = item_stats(inv_item)
+        drop_stats = item_stats(drop_item)
+        inv_damage = inv_stats.damage_components
+        drop_damage = drop_stats.damage_components
         try:
             match inv_item.item_type:
                 case "Void Hex":
-                    inv_get_match = re.findall(r"(\d+) damage", inv_description)
-                    drop_get_match = re.findall(r"(\d+) damage", drop_description)
-
-                    if None in [drop_get_match, inv_get_match]:
+                    if not inv_damage or not drop_damage:
                         return
 
-                    inv_damage_done = int(inv_get_match[0])
-                    inv_damage_inflict = int(inv_get_match[1])
-                    drop_damage_done = int(drop_get_match[0])
-                    drop_damage_inflict = int(drop_get_match[1])
+                    inv_damage_done = inv_damage[0].min_value
+                    inv_damage_inflict = inv_stats.self_damage
+                    drop_damage_done = drop_damage[0].min_value
+                    drop_damage_inflict = drop_stats.self_damage
 
                     if drop_damage_done > inv_damage_done:
                         if drop_damage_inflict < inv_damage_inflict or drop_damage_inflict == inv_damage_inflict:
@@ -263,45 +254,21 @@ class SteinLootAppraiser:
                             print("This is not an upgrade")
 
                 case "Reckless Slam":
-                    inv_range_damage_match = re.search(r"(\d+)-(\d+) damage", inv_description)
-                    inv_bleed_damage_match = re.findall(r"bleed that deals (\d+) damage", inv_description)
-                    drop_range_damage_match = re.search(r"(\d+)-(\d+) damage", drop_description)
-                    drop_bleed_damage_match = re.findall(r"bleed that deals (\d+) damage", drop_description)
-
-                    if None in [inv_range_damage_match, inv_bleed_damage_match, drop_bleed_damage_match, drop_range_damage_match]:
+                    # Hit plus the bleed, the bleed component already counts its ticks
+                    if len(inv_damage) < 2 or len(drop_damage) < 2:
                         return
 
-                    inv_range_damage_lower, inv_range_damage_higher = int(inv_range_damage_match.group(1)), int(inv_range_damage_match.group(2))
-                    inv_bleed_damage = int(inv_bleed_damage_match[0])
-                    inv_average = statistics.mean([inv_range_damage_lower, inv_range_damage_higher])
-
-                    drop_range_damage_lower, drop_range_damage_higher = int(drop_range_damage_match.group(1)), int(drop_range_damage_match.group(2))
-                    drop_bleed_damage = int(drop_bleed_damage_match[0])
-                    drop_average = statistics.mean([drop_range_damage_lower, drop_range_damage_higher])
-
-                    if (drop_average + drop_bleed_damage * 5) > (inv_average + inv_bleed_damage * 5):
+                    if (drop_damage[0].average + drop_damage[1].average_total) > (inv_damage[0].average + inv_damage[1].average_total):
                         print("This is an upgrade")
                     else:
                         print("This is not an upgrade")
 
                 case "Waterfall":
-                    inv_range_damage = re.findall(r"(\d+)-(\d+) damage", inv_description)
-                    drop_range_damage = re.findall(r"(\d+)-(\d+) damage", drop_description)
-
-                    if None in [inv_range_damage, drop_range_damage]:
+                    if len(inv_damage) < 2 or len(drop_damage) < 2:
                         return
 
-                    inv_front_damage = inv_range_damage[0]
-                    inv_front_damage_avg = statistics.mean([int(num) for num in inv_front_damage]) * 0.65
-                    inv_back_damage = inv_range_damage[1]
-                    inv_back_damage_avg = statistics.mean([int(num) for num in inv_back_damage]) * 0.85
-                    inv_avg_damage = inv_front_damage_avg + inv_back_damage_avg
-
-                    drop_front_damage = drop_range_damage[0]
-                    drop_front_damage_avg = statistics.mean([int(num) for num in drop_front_damage]) * 0.65
-                    drop_back_damage = drop_range_damage[1]
-                    drop_back_damage_avg = statistics.mean([int(num) for num in drop_back_damage]) * 0.85
-                    drop_avg_damage = drop_front_damage_avg + drop_back_damage_avg
+                    inv_avg_damage = inv_damage[0].average * 0.65 + inv_damage[1].average * 0.85
+                    drop_avg_damage = drop_damage[0].average * 0.65 + drop_damage[1].average * 0.85
 
                     if drop_avg_damage > inv_avg_damage:
                         print("This is an upgrade")
@@ -309,18 +276,10 @@ class SteinLootAppraiser:
                         print("This is not an upgrade")
 
                 case _:
-                    inv_get_match = re.search(r"(\d+)-(\d+) (?:\w+ )?damage", inv_description)
-                    drop_get_match = re.search(r"(\d+)-(\d+) (?:\w+ )?damage", drop_description)
-                    if inv_get_match is None or drop_get_match is None:
+                    if inv_stats.damage_range is None or drop_stats.damage_range is None:
                         return
 
-                    inv_lower_damage = int(inv_get_match.group(1))
-                    inv_higher_damage = int(inv_get_match.group(2))
-                    drop_lower_damage = int(drop_get_match.group(1))
-                    drop_higher_damage = int(drop_get_match.group(2))
-
-                    if ((drop_lower_damage + drop_higher_damage) / 2) > (
-                            (inv_lower_damage + inv_higher_damage) / 2):
+                    if drop_damage[0].average > inv_damage[0].average:
                         print("This is an upgrade")
                     else:
                         print("This is not an upgrade")
@@ -328,7 +287,6 @@ class SteinLootAppraiser:
         except Exception as err:
             print(str(err))
 
-
 if __name__ == '__main__':
     with sync_playwright() as p:
         appraiser = SteinLootAppraiser(p)
@@ -0,0 +1,170 @@
+from bs4 import BeautifulSoup
+
+from loot_analyser.loot_items import (ARMOR_ITEM_TYPES, LEGACY_MARKER, NO_ACTIVATION_COST_ITEM_TYPES, SKIPPED_ITEM_TYPES, ArmorItem, WeaponItem,
+                                     armor_item_from_properties)
+
+INVENTORY_SLOT_SELECTOR = "div#stein-inventory-slots div.stein-item-inventory-slot"
+NEED_OR_GREED_SLOT_SELECTOR = "div#stein-dialog-window-container div.stein-need-or-greed div.stein-need-or-greed-window.stein-window div.stein-item-inventory-slot.need-or-greed-item"
+
+# Reads every field parse_item_info needs from the tooltip in one go. Fields that aren't in the tooltip come back as null
+# instead of waiting for a locator to time out
+READ_TOOLTIP_JS = """
+() => {
+    const tooltip = document.querySelector("div#stein-tooltip");
+    if (tooltip === null) {
+        return null;
+    }
+    const texts = (selector) => Array.from(tooltip.querySelectorAll(selector), element => element.innerText);
+    const firstText = (selector) => {
+        const element = tooltip.querySelector(selector);
+        return element === null ? null : element.innerText;
+    };
+    return {
+        text: tooltip.innerText,
+        names: texts("div.stein-tooltip-item-name"),
+        type: firstText("div.stein-tooltip-item-type"),
+        properties: Array.from(tooltip.querySelectorAll("ul.stein-tooltip-item-properties li"), li => li.textContent),
+        effects: texts("div.stein-tooltip-item-effect"),
+        activation_cost: firstText("div.stein-tooltip-item-activation-cost"),
+        cast_time: firstText("div.stein-tooltip-item-casttime"),
+        cooldown: firstText("div.stein-tooltip-item-cooldown"),
+        legacy: texts("div").includes(LEGACY_MARKER),
+    };
+}
+""".replace("LEGACY_MARKER", repr(LEGACY_MARKER))
+
+# Clicking a slot the way a real click does. The tooltip is re-rendered by the game after the click, so every read waits
+# for the next frame (or 50ms when the tab is in the background and frames are throttled)
+CLICK_SLOT_JS = """
+    const click = (element) => {
+        const options = {bubbles: true, cancelable: true, view: window};
+        for (const type of ["pointerdown", "mousedown", "pointerup", "mouseup", "click"]) {
+            const EventType = type.startsWith("pointer") ? PointerEvent : MouseEvent;
+            element.dispatchEvent(new EventType(type, options));
+        }
+    };
+    const nextFrame = () => Promise.race([
+        new Promise(resolve => requestAnimationFrame(() => resolve())),
+        new Promise(resolve => setTimeout(resolve, 50)),
+    ]);
+"""
+
+# Clicks every slot matching the selector (or only the given slot indexes) and reads its tooltip, all inside the page.
+# The whole inventory costs one CDP round trip instead of ~10 per slot
+READ_SLOTS_JS = """
+async ({slotSelector, slotIndexes}) => {
+    const readTooltip = READ_TOOLTIP_JS;
+    CLICK_SLOT_JS
+    const slots = Array.from(document.querySelectorAll(slotSelector));
+    const tooltips = [];
+    for (const slot of slotIndexes === null ? slots : slotIndexes.map(index => slots[index])) {
+        click(slot);
+        await nextFrame();
+        tooltips.push(readTooltip());
+    }
+    return tooltips;
+}
+""".replace("READ_TOOLTIP_JS", READ_TOOLTIP_JS.strip()).replace("CLICK_SLOT_JS", CLICK_SLOT_JS.strip())
+
+# Same clicks as READ_SLOTS_JS, but copies the tooltip markup out of the page for parsing in python
+READ_SLOTS_HTML_JS = """
+async ({slotSelector, slotIndexes}) => {
+    CLICK_SLOT_JS
+    const slots = Array.from(document.querySelectorAll(slotSelector));
+    const tooltip = document.querySelector("div#stein-tooltip");
+    const tooltips = [];
+    for (const index of slotIndexes) {
+        click(slots[index]);
+        await nextFrame();
+        tooltips.push(tooltip.innerHTML);
+    }
+    return tooltips;
+}
+""".replace("CLICK_SLOT_JS", CLICK_SLOT_JS.strip())
+
+# Cheap per slot fingerprint without clicking anything: the item image (set through the style attribute) plus the name
+# the slot shows on hover. A slot is only read again when this changes
+READ_SLOT_FINGERPRINTS_JS = """
+(slotSelector) => Array.from(document.querySelectorAll(slotSelector), slot => (slot.getAttribute("style") || "") + "|" + (slot.getAttribute("title") || slot.innerText || "").trim())
+"""
+
+
+def tooltip_fields_to_item(fields: dict | None) -> WeaponItem | ArmorItem | None:
+    """
+        Same rules as SteinLootAppraiser.parse_item_info, applied to the fields READ_TOOLTIP_JS returned.
+
+    """
+    if fields is None or fields["text"] == 'No item in slot':
+        return None
+
+    if len(fields["names"]) != 1:  # Skipping skill books. They have two item names in them because of book name and skill name
+        return None
+
+    item_name = fields["names"][0]
+    item_type = fields["type"]
+
+    if item_type in ARMOR_ITEM_TYPES:
+        return armor_item_from_properties(item_name, fields["properties"], item_type)
+
+    if item_type in SKIPPED_ITEM_TYPES:
+        return None
+
+    return WeaponItem(item_name=item_name,
+                      item_type=item_type,
+                      item_description=". ".join(fields["effects"]),
+                      item_activation_cost=None if item_type in NO_ACTIVATION_COST_ITEM_TYPES else fields["activation_cost"],
+                      item_cast_time=fields["cast_time"],
+                      item_cooldown_time=fields["cooldown"],
+                      legacy=fields["legacy"])
+
+
+def read_current_tooltip(page) -> WeaponItem | ArmorItem | None:
+    # One round trip for the tooltip that is open right now
+    return tooltip_fields_to_item(page.evaluate(READ_TOOLTIP_JS))
+
+
+def read_slot_tooltips(page, slot_selector: str = INVENTORY_SLOT_SELECTOR, slot_indexes: list[int] | None = None) -> list[WeaponItem | ArmorItem | None]:
+    # One round trip for every slot (or just the slots in slot_indexes), the parsing happens here in python
+    tooltips = page.evaluate(READ_SLOTS_JS, {"slotSelector": slot_selector, "slotIndexes": slot_indexes})
+    return [tooltip_fields_to_item(fields) for fields in tooltips]
+
+
+def read_slot_fingerprints(page, slot_selector: str = INVENTORY_SLOT_SELECTOR) -> list[str]:
+    return page.evaluate(READ_SLOT_FINGERPRINTS_JS, slot_selector)
+
+
+def tooltip_html_to_fields(tooltip_html: str) -> dict:
+    """
+        Python side version of READ_TOOLTIP_JS for tooltip markup that was already copied out of the page, so the
+        parsing can run off the browser's round trip path. innerText is approximated by collapsing the whitespace.
+
+    """
+    soup = BeautifulSoup(tooltip_html, "html.parser")
+
+    def inner_text(element) -> str:
+        # innerText of a block element: whitespace runs collapsed and trimmed, like the browser renders it
+        return " ".join(element.get_text().split())
+
+    def texts(selector: str) -> list[str]:
+        return [inner_text(element) for element in soup.select(selector)]
+
+    def first_text(selector: str) -> str | None:
+        element = soup.select_one(selector)
+        return None if element is None else inner_text(element)
+
+    return {
+        "text": inner_text(soup),
+        "names": texts("div.stein-tooltip-item-name"),
+        "type": first_text("div.stein-tooltip-item-type"),
+        # textContent in READ_TOOLTIP_JS too
+        "properties": [element.get_text() for element in soup.select("ul.stein-tooltip-item-properties li")],
+        "effects": texts("div.stein-tooltip-item-effect"),
+        "activation_cost": first_text("div.stein-tooltip-item-activation-cost"),
+        "cast_time": first_text("div.stein-tooltip-item-casttime"),
+        "cooldown": first_text("div.stein-tooltip-item-cooldown"),
+        "legacy": LEGACY_MARKER in texts("div"),
+    }
+
+
+def parse_tooltip_html(tooltip_html: str) -> WeaponItem | ArmorItem | None:
+    return tooltip_fields_to_item(tooltip_html_to_fields(tooltip_html))
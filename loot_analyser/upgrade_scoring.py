@@ -0,0 +1,182 @@
+import json
+import time
+from dataclasses import dataclass, fields, replace
+from pathlib import Path
+from typing import Iterable
+
+from fight_simulator.class_configs.loader.character_loader import CharacterFactory
+from fight_simulator.class_configs.weapon_damage_calulator import BasicHealDamageCalculation, CharacterEquipArmor, PlayerStats, SimulatorConstants
+from loot_analyser.item_stats import ItemStats, item_stats
+from loot_analyser.loot_items import ArmorItem, WeaponItem, item_type_of
+
+CHARACTER_CLASSES = ["fighter", "mage", "tank", "warlock", "shaman", "hunter", "healer"]
+
+# Armor item type -> slot in the class configs
+ARMOR_SLOT_BY_ITEM_TYPE = {"Head": "head", "Chest": "chest", "Legs": "legs", "Shoulders": "shoulders", "Hands": "gloves", "Feet": "boots"}
+# ArmorItem field -> PlayerStats field
+PLAYER_STAT_BY_ARMOR_FIELD = {
+    "item_armor": "armor", "item_life": "life", "item_damage": "damage", "item_heal": "heal", "item_cbr": "cbr", "item_ccr": "ccr",
+    "item_mana": "mana", "item_mana_regen": "mana_regen", "item_life_regen": "life_regen", "item_energy_regen": "energy_regen",
+}
+
+
+def weapon_slot_of(item_type: str) -> str:
+    # "Fire Bomb" -> fire_bomb, "Multi-Shot" -> multi_shot. Tools are the repeater
+    return "repeater" if item_type == "Tool" else item_type.casefold().replace(" ", "_").replace("-", "_")
+
+
+@dataclass
+class ItemOutput:
+    damage_per_cast: float
+    heal_per_cast: float
+    cycle_s: float  # one cast every max(cast time, cooldown)
+
+    @property
+    def dps(self) -> float:
+        return self.damage_per_cast / self.cycle_s
+
+    @property
+    def hps(self) -> float:
+        return self.heal_per_cast / self.cycle_s
+
+
+@dataclass
+class UpgradeScore:
+    slot: str
+    compared_with: str | None
+    dps_delta: float
+    hps_delta: float
+
+    @property
+    def is_upgrade(self) -> bool:
+        return self.dps_delta > 0 or (self.dps_delta == 0 and self.hps_delta > 0)
+
+
+class UpgradeScorer(BasicHealDamageCalculation, CharacterEquipArmor):
+    """
+        Expected DPS/HPS change of equipping a drop, with the character's PlayerStats and the same _average_damage /
+        _average_heal math the fight simulator uses. The equipped armor comes from the class config, the equipped
+        weapons are the best inventory item for every weapon slot of the class. constants (the player's calibration)
+        give the crits and hit chance of every weapon slot, damage is counted times the slot's hit chance.
+
+        The baseline (player stats, output of every inventory weapon) is worked out once and cached. Scoring a weapon
+        drop only evaluates the drop, an armor drop swaps one piece in the cached stats.
+
+    """
+    def __init__(self, character_class: str, inventory_items: Iterable[WeaponItem | ArmorItem] = (), constants: SimulatorConstants | None = None):
+        super().__init__(constants)
+        self.character_class = character_class
+        self.character_info = getattr(CharacterFactory(), f"get_{character_class}_info")()
+        self.player_stats: PlayerStats = self._setup_player_stats(self.character_info, self.constants)
+        self.weapon_slots: list[str] = list(type(self.character_info.weapons).model_fields)
+        self._outputs: dict[tuple, ItemOutput] = {}  # (type, description, cast time, cooldown) -> output with the baseline stats
+        self.loadout: dict[str, WeaponItem] = {}
+        for item in inventory_items:
+            self.equip_if_better(item)
+
+    def output(self, item: WeaponItem, player_stats: PlayerStats | None = None) -> ItemOutput:
+        if player_stats is not None:
+            return self._output(item_stats(item), player_stats, self.slot_of(item))
+        key = (item.item_type, item.item_description, item.item_cast_time, item.item_cooldown_time)
+        output = self._outputs.get(key)
+        if output is None:
+            output = self._outputs[key] = self._output(item_stats(item), self.player_stats, self.slot_of(item))
+        return output
+
+    def _output(self, stats: ItemStats, player_stats: PlayerStats, slot: str | None) -> ItemOutput:
+        damage = sum(self._average_damage(player_stats, component.average, component.bonus_percent or 0, slot) * component.ticks
+                     for component in stats.damage_components)
+        # The class config's hit chance of the slot unless the calibration has one
+        configured = getattr(self.character_info.weapons, slot).hit_chance_percent if slot is not None else 100
+        damage *= self._hit_chance_percent(configured, slot) / 100
+        heal = sum(self._average_heal(player_stats, component.average, component.bonus_percent or 0, weapon_name=slot) * component.ticks
+                   for component in stats.heal_components)
+        # Shields don't crit, same as eviction_average_heal
+        heal += sum(self._average_heal(player_stats, component.average, component.bonus_percent or 0, disable_crit=True)
+                    for component in stats.of_kind("shield"))
+        cycle_s = max(stats.cast_time_s or 0, stats.cooldown_s or 0) or 1.0
+        return ItemOutput(damage, heal, cycle_s)
+
+    def slot_of(self, weapon: WeaponItem) -> str | None:
+        slot = weapon_slot_of(weapon.item_type)
+        for candidate in (slot, f"{slot}_legacy"):
+            if candidate in self.weapon_slots:
+                return candidate
+        return None
+
+    def equip_if_better(self, item: WeaponItem | ArmorItem):
+        if not isinstance(item, WeaponItem) or item.legacy:
+            return
+        slot = self.slot_of(item)
+        if slot is None:
+            return
+        equipped = self.loadout.get(slot)
+        if equipped is None or (self.output(item).dps, self.output(item).hps) > (self.output(equipped).dps, self.output(equipped).hps):
+            self.loadout[slot] = item
+
+    def loadout_output(self, player_stats: PlayerStats | None = None) -> tuple[float, float]:
+        outputs = [self.output(weapon, player_stats) for weapon in self.loadout.values()]
+        return sum(output.dps for output in outputs), sum(output.hps for output in outputs)
+
+    def score_weapon(self, drop: WeaponItem, compared_with: WeaponItem) -> UpgradeScore:
+        drop_output, current_output = self.output(drop), self.output(compared_with)
+        return UpgradeScore(self.slot_of(drop) or drop.item_type, compared_with.item_name, drop_output.dps - current_output.dps, drop_output.hps - current_output.hps)
+
+    def stats_with_armor(self, drop: ArmorItem) -> PlayerStats:
+        # Baseline stats minus the equipped piece of the drop's slot plus the drop
+        slot = ARMOR_SLOT_BY_ITEM_TYPE[item_type_of(drop)]
+        equipped_piece = getattr(self.character_info.armor, slot)
+        drop_stats = {PLAYER_STAT_BY_ARMOR_FIELD[name]: value for name, value in item_stats(drop).armor_stats.items()}
+        swapped = {}
+        for stat in fields(PlayerStats):
+            swapped[stat.name] = getattr(self.player_stats, stat.name) - (getattr(equipped_piece, stat.name, 0) or 0) + drop_stats.get(stat.name, 0)
+        return replace(self.player_stats, **swapped)
+
+    def score_armor(self, drop: ArmorItem) -> UpgradeScore | None:
+        if item_type_of(drop) not in ARMOR_SLOT_BY_ITEM_TYPE:
+            return None
+        baseline_dps, baseline_hps = self.loadout_output()
+        dps, hps = self.loadout_output(self.stats_with_armor(drop))
+        return UpgradeScore(ARMOR_SLOT_BY_ITEM_TYPE[item_type_of(drop)], "equipped", dps - baseline_dps, hps - baseline_hps)
+
+
+def print_upgrade_score(score: UpgradeScore):
+    verdict = "This is an upgrade" if score.is_upgrade else "This is not an upgrade"
+    print(f"{verdict} ({score.slot}): expected DPS {score.dps_delta:+.1f}, HPS {score.hps_delta:+.1f}")
+
+
+def benchmark_upgrade_scoring(inventory_json: Path = Path(__file__).parent / "inventory_data.json", character_class: str = "warlock", repeats: int = 100):
+    """
+        Scores every saved item as if it dropped (a need-or-greed window holds a handful, this is the whole bag) against
+        the inventory items of its type, with the baseline cached.
+
+    """
+    with open(inventory_json) as json_file:
+        saved_items = [WeaponItem(**item) if "item_description" in item else ArmorItem(**item) for item in json.load(json_file).values()]
+
+    start = time.perf_counter()
+    scorer = UpgradeScorer(character_class, saved_items)
+    baseline_s = time.perf_counter() - start
+
+    drops = [replace(item) for item in saved_items]  # copies, so the parsed stats aren't already cached on them
+    same_type = {}
+    for item in saved_items:
+        same_type.setdefault(item_type_of(item), []).append(item)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for drop in drops:
+            if isinstance(drop, ArmorItem):
+                scorer.score_armor(drop)
+            else:
+                for inventory_item in same_type[item_type_of(drop)]:
+                    scorer.score_weapon(drop, inventory_item)
+    scoring_s = (time.perf_counter() - start) / repeats
+
+    baseline_dps, baseline_hps = scorer.loadout_output()
+    print(f"{character_class} loadout ({', '.join(scorer.loadout)}): {baseline_dps:.1f} DPS, {baseline_hps:.1f} HPS, baseline in {baseline_s * 1000:.1f}ms")
+    print(f"{len(drops)} drops scored in {scoring_s * 1000:.2f}ms ({scoring_s / len(drops) * 1e6:.1f}us/drop)")
+
+
+if __name__ == '__main__':
+    benchmark_upgrade_scoring()
@@ -0,0 +1,19 @@
+import json
+import shutil
+from pathlib import Path
+
+from combat_report.fight_log_archive import archive_fight_logs
+from combat_report.fight_log_columns import find_fight_logs
+
+REFERENCE_LOG = Path(__file__).parent.parent / "combat_report" / "fight-log.json"
+
+
+def test_archive_skips_other_json(tmp_path: Path):
+    shutil.copyfile(REFERENCE_LOG, tmp_path / "fight-log.json")
+    (tmp_path / ".cache.json").write_text(json.dumps({"logs": {}}))
+    (tmp_path / "roster.json").write_text(json.dumps({"Player1": {"tank": {"dps": 250}}}))
+
+    archived = archive_fight_logs(tmp_path, remove_originals=True)
+    assert archived == [(tmp_path / "fight-log.json", tmp_path / "fight-log.json.gz")]
+    assert sorted(path.name for path in tmp_path.iterdir()) == [".cache.json", "fight-log.json.gz", "roster.json"]
+    assert tmp_path / ".cache.json" not in find_fight_logs(tmp_path)
@@ -0,0 +1,33 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from combat_report.combat_report import CombatReporter
+from combat_report.fight_log_archive import archive_fight_log
+from combat_report.fight_log_columns import _ARRAY_COLUMNS, read_fight_log_columns
+from combat_report.fight_log_generator import SyntheticFightSpec, write_synthetic_fight_log
+
+REFERENCE_LOG = Path(__file__).parent.parent / "combat_report" / "fight-log.json"
+
+
+def test_empty_fight_log(tmp_path: Path):
+    # A log without events reads as empty columns with the dtypes of a real log, plain and as an ndjson archive
+    empty_json = tmp_path / "fight-log-empty.json"
+    write_synthetic_fight_log(empty_json, SyntheticFightSpec.for_event_count(0))
+    reference = read_fight_log_columns(REFERENCE_LOG)
+    for fight_log in (empty_json, archive_fight_log(empty_json, ndjson=True)):
+        columns = read_fight_log_columns(fight_log)
+        assert columns.event_count == 0
+        for column in _ARRAY_COLUMNS:
+            assert getattr(columns, column).dtype == getattr(reference, column).dtype, f"{fight_log.name} {column}"
+        CombatReporter(columns, show_plots=False)
+
+
+def test_event_missing_field(tmp_path: Path):
+    fight_log = json.loads(REFERENCE_LOG.read_text())
+    del fight_log["events"][3]["crit"]
+    broken_json = tmp_path / "fight-log-broken.json"
+    broken_json.write_text(json.dumps(fight_log))
+    with pytest.raises(ValueError, match=r"fight-log-broken\.json: event 3 has a missing or invalid crit"):
+        read_fight_log_columns(broken_json)
@@ -0,0 +1,21 @@
+import json
+from pathlib import Path
+
+from loot_analyser.item_store import INVENTORY_JSON, ItemStore
+
+
+def test_update_writes_only_changes(tmp_path: Path):
+    with ItemStore(tmp_path / "inventory.sqlite3") as store:
+        assert store.is_empty()
+        assert store.import_json(INVENTORY_JSON) == len(json.loads(INVENTORY_JSON.read_text()))
+
+        inventory_info = store.items()
+        assert store.update(inventory_info) == 0
+
+        sold_key = next(iter(inventory_info))
+        inventory_info[f"{sold_key}_2"] = inventory_info.pop(sold_key)
+        assert store.update(inventory_info) == 2
+        assert sold_key not in store.items()
+
+        store.export_json(tmp_path / "inventory_data.json")
+        assert json.loads((tmp_path / "inventory_data.json").read_text()).keys() == inventory_info.keys()
@@ -0,0 +1,25 @@
+import shutil
+from pathlib import Path
+
+from boss_dps_prediction.boss_dps_prediction import boss_name_hp_map
+from boss_dps_prediction.kill_time_prediction import PlayerLogStatsCache
+from combat_report.fight_log_archive import archive_fight_logs
+from combat_report.fight_log_columns import find_fight_logs
+
+REFERENCE_LOG = Path(__file__).parent.parent / "combat_report" / "fight-log.json"
+
+
+def test_refresh_after_archive(tmp_path: Path):
+    # The stats cache stays out of the fight logs, so archiving the directory and refreshing again only sees the logs
+    shutil.copyfile(REFERENCE_LOG, tmp_path / "fight-log.json")
+    cache = PlayerLogStatsCache(tmp_path, boss_name_hp_map)
+    assert cache.refresh() == [tmp_path / "fight-log.json"]
+    fight_dps = {name: stats.fight_dps.tolist() for name, stats in cache.player_stats().items()}
+    assert fight_dps
+    assert find_fight_logs(tmp_path) == [tmp_path / "fight-log.json"]
+
+    archive_fight_logs(tmp_path, remove_originals=True)
+    reloaded = PlayerLogStatsCache(tmp_path, boss_name_hp_map)
+    assert reloaded.refresh() == [tmp_path / "fight-log.json.gz"]
+    assert {name: stats.fight_dps.tolist() for name, stats in reloaded.player_stats().items()} == fight_dps
+    assert reloaded.refresh() == []
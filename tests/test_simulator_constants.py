@@ -0,0 +1,22 @@
+import json
+from pathlib import Path
+
+from fight_simulator.class_configs.models.calibration import AbilityCalibration, Calibration, PlayerCalibration
+from fight_simulator.class_configs.weapon_damage_calulator import FighterDamage, SimulatorConstants
+
+
+def test_weapon_fit_falls_back_to_pooled(tmp_path: Path):
+    breaker = AbilityCalibration(heal=False, hits=90, misses=10, crits=27, hit_chance_percent=90, crit_rate=0.3, crit_multiplier=1.7, mean=500, std=50)
+    player = PlayerCalibration(energy_regen=2.5, hit_chance_percent=80, crit_rate=0.1, crit_multiplier=1.5, abilities={"Breaker": breaker})
+    calibration_json = tmp_path / "calibration.json"
+    calibration_json.write_text(json.dumps(Calibration(log_count=1, event_count=100, players={"poolgoes": player}).model_dump()))
+
+    constants = SimulatorConstants.from_calibration(calibration_json, "poolgoes")
+    assert (constants.for_weapon("breaker").hit_chance_percent, constants.for_weapon("breaker").crit_rate) == (90, 0.3)
+    # The pooled hit chance doesn't replace the configured one of weapons without a fit
+    assert (constants.for_weapon("tear").hit_chance_percent, constants.for_weapon("tear").crit_rate) == (None, 0.1)
+
+    calibrated, default = FighterDamage(constants), FighterDamage()
+    assert calibrated.player_stats.energy_regen == 2.5 != default.player_stats.energy_regen
+    assert default.constants == SimulatorConstants()
+    assert calibrated.tear_damage().average_damage != default.tear_damage().average_damage